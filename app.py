@@ -3,11 +3,25 @@ import pandas as pd
 import networkx as nx
 import os
 import re
-from kg_builder import KnowledgeGraphBuilder
-from entropy_model import EntropyBoundaryDetector
+import hashlib
+import tempfile
+import io
+from kg_builder import KnowledgeGraphBuilder, copy_graph
+from components import get_component_index
+from node_ranking import StartNodeSelector, get_start_node_selector
+from node_index import get_node_index
+from entropy_model import DEFAULT_WEIGHTS, EntropyBoundaryDetector
 from traversal import GraphTraverser
-from visualizer import GraphVisualizer
 from nlp_utils import TextProcessor
+from sentence_splitter import SentenceSplitter
+from jobs import JobRunner
+from pipeline import NLPPipeline
+from embeddings import NodeEmbeddings, get_node_embeddings
+from graph_cache import get_cached
+from weight_tuning import WalkTrace
+from results_store import EXPORT_FORMATS, ResultStore
+from offset_index import get_offset_index
+from shared_resources import get_resource_pool
 from styles import apply_custom_styles
 
 st.set_page_config(page_title="Sentence Boundary Detection via Entropy", layout="wide")
@@ -34,9 +48,11 @@ def extract_book_chapter_info(text):
     # If no pattern found, return a truncated version of the text
     return text[:50] + "..." if len(text) > 50 else text
 
+BOOK_CSV_PATH = "src/war_and_peace_full_chapters.csv"
+
 def load_book_data():
     """Load book data from CSV file"""
-    csv_path = "src/war_and_peace_full_chapters.csv"
+    csv_path = BOOK_CSV_PATH
     if os.path.exists(csv_path):
         try:
             df = pd.read_csv(csv_path)
@@ -55,15 +71,217 @@ def load_book_data():
         st.warning("Book data file (src/war_and_peace_full_chapters.csv) not found. Please run the data extraction notebook first.")
         return None
 
+@st.cache_resource
+def get_job_runner():
+    return JobRunner(max_workers=4)
+
+PREVIEW_PAGE_SIZE = 50
+
+def live_fragment(kind):
+    """Re-run the panel every second while its job runs, so progress shows up
+    without user input. Idle panels don't poll; finishing a job reruns the app,
+    which switches the panel back to the idle fragment."""
+    def wrap(fn):
+        if not hasattr(st, 'fragment'):
+            return fn
+        polling, idle = st.fragment(run_every=1.0)(fn), st.fragment(fn)
+        
+        def panel():
+            job = st.session_state.jobs.get(kind)
+            return (polling if job is not None and not job.finished else idle)()
+        return panel
+    return wrap
+
+def preview_page(items, key):
+    """Slice of items on the page picked below the preview, PREVIEW_PAGE_SIZE at a time"""
+    pages = max(1, -(-len(items) // PREVIEW_PAGE_SIZE))
+    page = 1
+    if pages > 1:
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key=key)
+    start = (page - 1) * PREVIEW_PAGE_SIZE
+    return range(start, min(start + PREVIEW_PAGE_SIZE, len(items)))
+
+def graph_key(text, backend='nltk', backend_options=None, splitter='punkt'):
+    """Key of a built graph in the process-wide resource pool"""
+    digest = hashlib.sha1(text.encode('utf-8')).hexdigest()
+    return ('graph', digest, backend, tuple(sorted((backend_options or {}).items())), splitter)
+
+def session_resource(name):
+    """Value behind this session's handle on a shared resource"""
+    handle = st.session_state.get(f'{name}_handle')
+    return None if handle is None else handle.value
+
+def set_session_resource(name, handle):
+    previous = st.session_state.get(f'{name}_handle')
+    st.session_state[f'{name}_handle'] = handle
+    if previous is not None and previous is not handle:
+        previous.release()
+
+def current_kg():
+    return session_resource('kg')
+
+def current_sentences():
+    kg = current_kg()
+    return kg.graph['sentences'] if kg is not None else []
+
+def result_walks(results):
+    return ((r['start_node'], r['boundary_nodes'], r['entropies']) for r in results)
+
+def book_data():
+    return session_resource('book_data')
+
+def run_build_job(job, text_input, backend='nltk', backend_options=None, pipeline_workers=None,
+                  splitter='punkt'):
+    key = graph_key(text_input, backend, backend_options, splitter)
+    handle = get_resource_pool().get(key)
+    if handle is not None:
+        # Another session already built this exact graph; the handle pins it
+        return {'handle': handle, 'text': text_input, 'graph_key': key}
+    
+    if pipeline_workers:
+        pipeline = NLPPipeline(backend, backend_options, workers=pipeline_workers, splitter=splitter)
+        kg = pipeline.run(text_input, progress=lambda done, total: job.report(
+            done, total, f"Inserted {done} of {total} sentences split so far"))
+        get_component_index(kg)
+        return {'kg': kg, 'text': text_input, 'graph_key': key, 'stages': pipeline.stage_report()}
+    
+    processor = TextProcessor(splitter)
+    builder = KnowledgeGraphBuilder(backend, **(backend_options or {}))
+    
+    job.report(message="Splitting sentences...")
+    sents, spans = processor.extract_sentence_spans(text_input)
+    kg = builder.build_from_sentences(
+        sents,
+        progress=lambda done, total: job.report(done, total, f"Processed {done}/{total} sentences"),
+        text=text_input, spans=spans)
+    get_component_index(kg)
+    
+    return {'kg': kg, 'text': text_input, 'graph_key': key}
+
+def run_append_job(job, kg, text_input, backend='nltk', backend_options=None, splitter='punkt'):
+    processor = TextProcessor(splitter)
+    builder = KnowledgeGraphBuilder(backend, **(backend_options or {}))
+    
+    job.report(message="Splitting sentences...")
+    sents, spans = processor.extract_sentence_spans(text_input)
+    try:
+        new_sents = builder.new_sentences(kg, sents)
+    except ValueError:
+        # Earlier text was edited, so the graph can't just be extended
+        return run_build_job(job, text_input, backend, backend_options, splitter=splitter)
+    
+    # Only tagging runs here; the shared graph is mutated on the script thread
+    triplets = builder.extract_triplets(
+        new_sents,
+        progress=lambda done, total: job.report(done, total, f"Processed {done}/{total} new sentences"))
+    
+    return {'appended': True, 'text': text_input, 'new_sentences': new_sents, 'triplets': triplets,
+            'spans': spans[len(spans) - len(new_sents):],
+            'graph_key': graph_key(text_input, backend, backend_options, splitter)}
+
+def run_detect_job(job, store, kg, start_nodes, entropy_threshold, max_depth, 
+                   embedding_mode=None, sentences=None, weights=DEFAULT_WEIGHTS, window_size=3):
+    embeddings = None
+    if embedding_mode:
+        job.report(message="Encoding nodes (cached after the first run)...")
+        embeddings = get_node_embeddings(kg, mode=embedding_mode, sentences=sentences)
+    
+    alpha, beta, gamma = weights
+    detector = EntropyBoundaryDetector(threshold=entropy_threshold, window_size=window_size,
+                                       embeddings=embeddings, alpha=alpha, beta=beta, gamma=gamma)
+    traverser = GraphTraverser(kg, detector)
+    
+    # The session already holds store, so finished traversals show up (in
+    # completion order) while the rest run, and survive a cancel
+    def on_progress(done, total, completed):
+        store.extend(completed)
+        job.report(done, total, f"Traversed {done}/{total} starting nodes")
+    
+    job.report(0, len(start_nodes), f"Traversing {len(start_nodes)} starting nodes...")
+    traverser.traverse_many(start_nodes, max_depth, progress=on_progress)
+    return store
+
+def get_walk_trace(kg, config):
+    """Full walks for the last detection's start nodes, recombined on every slider change"""
+    embedding_mode = config['embedding_mode']
+    key = ('walk_trace', tuple(config['start_nodes']), config['max_depth'], embedding_mode,
+           config['window'] if embedding_mode else None)
+    
+    def build(g):
+        embeddings = None
+        if embedding_mode:
+            embeddings = get_node_embeddings(g, mode=embedding_mode, sentences=g.graph['sentences'])
+        return WalkTrace(g, config['start_nodes'], config['max_depth'], embeddings, config['window'])
+    
+    return get_cached(kg, key, build)
+
+def publish_job(kind, job):
+    """Copy a finished job's result into the session exactly once"""
+    if st.session_state.published_jobs.get(kind) == job.id:
+        return False
+    st.session_state.published_jobs[kind] = job.id
+    
+    if job.status == 'done' and kind == 'build':
+        pool = get_resource_pool()
+        key = job.result['graph_key']
+        if job.result.get('appended'):
+            # Grows in place only if no other session holds the graph, else a
+            # private copy does; decided and done atomically under the pool lock
+            def append(kg):
+                KnowledgeGraphBuilder().apply_triplets(kg, job.result['new_sentences'], job.result['triplets'],
+                                                       job.result['text'], job.result['spans'])
+            set_session_resource('kg', pool.update(st.session_state.kg_handle, key, append, copy_graph))
+        elif job.result.get('handle'):
+            set_session_resource('kg', job.result['handle'])
+        else:
+            set_session_resource('kg', pool.put(key, job.result['kg']))
+        st.session_state.text = job.result['text']
+        # Results and the re-weighting trace belong to the previous graph; its
+        # start nodes may not exist in this one
+        st.session_state.results = ResultStore()
+        st.session_state.pop('detect_config', None)
+        detect_job = st.session_state.jobs.get('detect')
+        if detect_job is not None and not detect_job.finished:
+            detect_job.cancel()
+        # The pool owns the graph now; the job only keeps what the status panel shows
+        job.result = {k: v for k, v in job.result.items() if k not in ('kg', 'handle', 'triplets', 'spans')}
+        get_job_runner().forget(job.id)
+    return True
+
+def job_status(kind):
+    job = st.session_state.jobs.get(kind)
+    if job is None:
+        return None
+    
+    if not job.finished:
+        st.progress(job.progress, text=f"🔄 {job.message or 'Starting...'} ({job.elapsed:.0f}s)")
+        if st.button("⛔ Cancel", key=f"cancel_{kind}"):
+            job.cancel()
+    elif publish_job(kind, job):
+        st.rerun()
+    elif job.status == 'cancelled':
+        st.warning(f"⛔ Cancelled after {job.done}/{job.total} ({job.elapsed:.1f}s)")
+    elif job.status == 'failed':
+        st.error(f"❌ {job.name} failed: {job.error}")
+    return job
+
 def init_session():
-    if 'kg' not in st.session_state:
-        st.session_state.kg = None
+    if 'kg_handle' not in st.session_state:
+        st.session_state.kg_handle = None
     if 'text' not in st.session_state:
         st.session_state.text = ""
     if 'results' not in st.session_state:
-        st.session_state.results = []
-    if 'book_data' not in st.session_state:
-        st.session_state.book_data = load_book_data()
+        st.session_state.results = ResultStore()
+    if 'jobs' not in st.session_state:
+        st.session_state.jobs = {}
+    if 'published_jobs' not in st.session_state:
+        st.session_state.published_jobs = {}
+    if 'picked_nodes' not in st.session_state:
+        st.session_state.picked_nodes = []
+    if 'book_data_handle' not in st.session_state:
+        # One copy of the corpus per process, not per browser session
+        st.session_state.book_data_handle = get_resource_pool().acquire(('corpus', BOOK_CSV_PATH),
+                                                                        load_book_data)
 
 def main():
     init_session()
@@ -72,19 +290,22 @@ def main():
     st.title("📚 Sentence Boundary Detection in Knowledge Graphs")
     st.caption("Detecting sentence boundaries using entropy-based graph traversal")
     
-    tab1, tab2, tab3, tab4 = st.tabs(["🔨 Build KG", "🎯 Detect Boundaries", "📊 Visualize", "📈 Results"])
-    
-    with tab1:
-        build_kg_interface()
+    # Jobs may finish while their view isn't shown
+    for kind, job in st.session_state.jobs.items():
+        if job.finished:
+            publish_job(kind, job)
     
-    with tab2:
-        detect_boundaries_interface()
+    # Unlike st.tabs, only the selected view runs on each rerun
+    views = {
+        "🔨 Build KG": build_kg_interface,
+        "🎯 Detect Boundaries": detect_boundaries_interface,
+        "📊 Visualize": visualize_interface,
+        "📈 Results": results_interface,
+    }
+    active_view = st.radio("View", list(views), horizontal=True, 
+                           label_visibility="collapsed", key="active_view")
     
-    with tab3:
-        visualize_interface()
-    
-    with tab4:
-        results_interface()
+    views[active_view]()
 
 def build_kg_interface():
     st.header("🏗️ Knowledge Graph Construction")
@@ -109,8 +330,8 @@ def build_kg_interface():
             st.text_area("Selected text:", value=text_input, height=100, disabled=True)
         
         else:  # Books option
-            if st.session_state.book_data is not None:
-                df = st.session_state.book_data
+            if book_data() is not None:
+                df = book_data()
                 
                 # Create selection options using display names
                 selection_options = {}
@@ -145,38 +366,56 @@ def build_kg_interface():
                 st.error("📚 Book data not available. Please check the CSV file path and format.")
                 text_input = ""
         
-        if st.button("🚀 Build Knowledge Graph", type="primary"):
-            if text_input:
-                with st.spinner("🔄 Processing text and building KG..."):
-                    try:
-                        processor = TextProcessor()
-                        builder = KnowledgeGraphBuilder()
-                        
-                        sents = processor.extract_sentences(text_input)
-                        kg = builder.build_from_sentences(sents)
-                        
-                        st.session_state.kg = kg
-                        st.session_state.text = text_input
-                        
-                        st.success(f"✅ Built KG with {len(kg.nodes)} nodes and {len(kg.edges)} edges")
-                        
-                        with st.expander("👁️ View extracted sentences"):
-                            for i, sent in enumerate(sents):
-                                st.write(f"{i+1}. {sent}")
-                    except Exception as e:
-                        st.error(f"❌ Error building knowledge graph: {str(e)}")
-            else:
+        backend = st.selectbox("🧠 Extraction backend:", ["nltk", "lookup", "spacy"],
+                               format_func={"nltk": "NLTK (POS heuristics)", 
+                                            "lookup": "Lookup tagger (fast POS heuristics)",
+                                            "spacy": "spaCy (dependency parse)"}.get)
+        backend_options = {}
+        if backend == "spacy":
+            backend_options['n_process'] = st.number_input("⚙️ spaCy processes:", 1, os.cpu_count() or 1, 1)
+        
+        splitter = st.selectbox("✂️ Sentence splitter:", list(SentenceSplitter.TIERS),
+                                format_func=SentenceSplitter.TIERS.get)
+        
+        pipeline_workers = None
+        if st.checkbox("⚡ Pipelined build (overlap splitting, tagging and insertion)"):
+            pipeline_workers = st.number_input("⚙️ Tagging workers:", 1, os.cpu_count() or 1, 
+                                               max(1, (os.cpu_count() or 2) - 1))
+        
+        build_job = st.session_state.jobs.get('build')
+        building = build_job is not None and not build_job.finished
+        
+        build_col, append_col = st.columns(2)
+        with build_col:
+            build_clicked = st.button("🚀 Build Knowledge Graph", type="primary", disabled=building)
+        with append_col:
+            append_clicked = st.button("➕ Append to current graph", 
+                                       disabled=building or current_kg() is None,
+                                       help="Only sentences not already in the graph are processed")
+        
+        if build_clicked or append_clicked:
+            if not text_input:
                 st.error("⚠️ Please enter text or select a book chapter")
+            elif append_clicked:
+                st.session_state.jobs['build'] = get_job_runner().submit(
+                    "Knowledge graph append", run_append_job, 
+                    current_kg(), text_input, backend, backend_options, splitter)
+            else:
+                st.session_state.jobs['build'] = get_job_runner().submit(
+                    "Knowledge graph build", run_build_job, text_input, backend, backend_options,
+                    pipeline_workers, splitter)
+        
+        build_status_panel()
     
     with col2:
         st.markdown("### 📊 Graph Statistics")
-        if st.session_state.kg:
-            st.metric("🔵 Nodes", len(st.session_state.kg.nodes))
-            st.metric("🔗 Edges", len(st.session_state.kg.edges))
-            st.metric("📝 Sentences", len(TextProcessor().extract_sentences(st.session_state.text)))
+        if current_kg() is not None:
+            st.metric("🔵 Nodes", len(current_kg().nodes))
+            st.metric("🔗 Edges", len(current_kg().edges))
+            st.metric("📝 Sentences", len(current_sentences()))
             
             if st.checkbox("📈 Show detailed statistics"):
-                kg = st.session_state.kg
+                kg = current_kg()
                 
                 density = nx.density(kg)
                 avg_degree = sum(dict(kg.degree()).values()) / len(kg.nodes) if len(kg.nodes) > 0 else 0
@@ -184,10 +423,17 @@ def build_kg_interface():
                 st.write(f"**Density:** {density:.3f}")
                 st.write(f"**Avg Degree:** {avg_degree:.2f}")
                 
-                if nx.is_connected(kg.to_undirected()):
+                components = get_component_index(kg)
+                if components.is_connected():
                     st.write("**Connected:** ✅ Yes")
                 else:
                     st.write("**Connected:** ❌ No")
+                st.write(f"**Components:** {components.count}")
+                if components.count:
+                    sizes = components.sizes
+                    st.write(f"**Largest Component:** {sizes[0]} nodes")
+                    st.write(f"**Component Sizes:** {', '.join(str(size) for size in sizes[:10])}"
+                             + (" ..." if len(sizes) > 10 else ""))
                     
                 # Show node degree distribution
                 degrees = dict(kg.degree())
@@ -199,9 +445,9 @@ def build_kg_interface():
             st.info("🔨 Build a graph to see statistics")
             
         # Show data preview if book data is loaded
-        if st.session_state.book_data is not None:
+        if book_data() is not None:
             st.markdown("### 📚 Dataset Info")
-            df = st.session_state.book_data
+            df = book_data()
             st.metric("📖 Total Chapters", len(df))
             
             if len(df) > 0:
@@ -212,10 +458,14 @@ def build_kg_interface():
                 if total_words > 0:
                     st.write(f"**Total Words:** {total_words:,}")
 
+        pool = get_resource_pool().stats()
+        st.caption(f"🗄️ Shared cache: {pool['total_mb']} / {pool['max_mb']} MB, {pool['entries']} entries "
+                   f"({pool['pinned']} in use), {pool['hits']} hits, {pool['evictions']} evictions")
+
 def detect_boundaries_interface():
     st.header("🎯 Boundary Detection")
     
-    if not st.session_state.kg:
+    if current_kg() is None:
         st.warning("⚠️ Build a knowledge graph first")
         return
     
@@ -223,80 +473,140 @@ def detect_boundaries_interface():
     
     with col1:
         st.markdown("### ⚙️ Configuration")
-        nodes = list(st.session_state.kg.nodes())
+        selector = get_start_node_selector(current_kg())
         
         # Filter nodes to show only meaningful ones (not too short)
-        meaningful_nodes = [node for node in nodes if len(str(node)) > 2]
+        meaningful_nodes = selector.candidates
         
-        # Add "Select All" option
-        all_nodes = ["Select All"] + meaningful_nodes
+        selection_mode = st.radio("🧭 Start node selection:", 
+                                  ["Manual", "Top-ranked", "Cover all sentences"],
+                                  horizontal=True)
         
-        selected_options = st.multiselect(
-            "🎯 Select starting nodes:", 
-            all_nodes, 
-            max_selections=20,
-            format_func=lambda x: "All nodes" if x == "Select All" else x
-        )
-        
-        # Handle "Select All" selection
-        if "Select All" in selected_options:
-            start_nodes = meaningful_nodes  
-            st.info("Showing ALL nodes in the graph. This may take longer to process.")
+        if selection_mode == "Manual":
+            # Only search matches are sent to the widget; picked nodes are kept
+            # as options so they survive a change of query
+            node_index = get_node_index(current_kg())
+            query = st.text_input("🔎 Search nodes:", placeholder=f"Type to search {len(node_index)} nodes...")
+            picked = [node for node in st.session_state.picked_nodes
+                      if node == "Select All" or node in current_kg()]
+            matches = [node for node in node_index.search(query, limit=50) if node not in picked]
+            
+            # Add "Select All" option
+            all_nodes = ["Select All"] + [node for node in picked if node != "Select All"] + matches
+            
+            selected_options = st.multiselect(
+                "🎯 Select starting nodes:", 
+                all_nodes, 
+                default=picked,
+                max_selections=20,
+                format_func=lambda x: "All nodes" if x == "Select All" else x
+            )
+            st.session_state.picked_nodes = selected_options
+            
+            # Handle "Select All" selection
+            if "Select All" in selected_options:
+                start_nodes = meaningful_nodes  
+                st.info("Showing ALL nodes in the graph. This may take longer to process.")
+            else:
+                start_nodes = selected_options
+        elif selection_mode == "Top-ranked":
+            ranking = st.selectbox("📊 Rank nodes by:", list(StartNodeSelector.RANKINGS),
+                                   format_func=StartNodeSelector.RANKINGS.get)
+            top_k = st.number_input("🔢 Number of starting nodes:", 1, max(1, len(meaningful_nodes)),
+                                    min(20, max(1, len(meaningful_nodes))))
+            start_nodes = selector.top_k(int(top_k), ranking)
         else:
-            start_nodes = selected_options
+            start_nodes = selector.covering_set()
+        
+        if selection_mode != "Manual" and start_nodes:
+            st.info(f"Using {len(start_nodes)} of {len(meaningful_nodes)} nodes, "
+                    f"covering {selector.coverage(start_nodes):.0%} of sentences.")
+            with st.expander("👁️ View starting nodes"):
+                st.write(", ".join(str(node) for node in start_nodes))
         
         entropy_threshold = st.slider("🌡️ Entropy threshold:", 0.1, 2.0, 0.8, 0.1)
         max_depth = st.slider("🔍 Max traversal depth:", 3, 20, 10)
         
-        if st.button("🔍 Detect Boundaries", type="primary"):
+        with st.expander("⚖️ Entropy weights (S = α·H_local + β·H_struct + γ·D)"):
+            alpha = st.slider("α local entropy:", 0.0, 1.0, DEFAULT_WEIGHTS[0], 0.05)
+            beta = st.slider("β structural entropy:", 0.0, 1.0, DEFAULT_WEIGHTS[1], 0.05)
+            gamma = st.slider("γ semantic divergence:", 0.0, 1.0, DEFAULT_WEIGHTS[2], 0.05)
+            window = st.slider("🪟 Semantic window:", 1, 8, 3)
+        
+        embedding_mode = None
+        if st.checkbox("🧬 Embedding-based semantic divergence"):
+            embedding_mode = st.selectbox("📐 Embed:", list(NodeEmbeddings.MODES),
+                                          format_func=NodeEmbeddings.MODES.get)
+        
+        detect_job = st.session_state.jobs.get('detect')
+        detecting = detect_job is not None and not detect_job.finished
+        
+        if st.button("🔍 Detect Boundaries", type="primary", disabled=detecting):
             if start_nodes:
-                try:
-                    detector = EntropyBoundaryDetector(threshold=entropy_threshold)
-                    traverser = GraphTraverser(st.session_state.kg, detector)
-                    
-                    results = []
-                    progress_bar = st.progress(0)
-                    
-                    for i, node in enumerate(start_nodes):
-                        with st.spinner(f"🔄 Processing {node}..."):
-                            path, entropies = traverser.traverse_with_entropy(node, max_depth)
-                            results.append({
-                                'start_node': node,
-                                'boundary_nodes': path,
-                                'entropies': entropies
-                            })
-                        progress_bar.progress((i + 1) / len(start_nodes))
-                    
-                    st.session_state.results = results
-                    st.success(f"✅ Processed {len(start_nodes)} starting nodes")
-                    
-                except Exception as e:
-                    st.error(f"❌ Error during boundary detection: {str(e)}")
+                st.session_state.results = ResultStore()
+                st.session_state.detect_config = {
+                    'start_nodes': list(start_nodes), 'max_depth': max_depth, 'embedding_mode': embedding_mode,
+                    'alpha': alpha, 'beta': beta, 'gamma': gamma, 'threshold': entropy_threshold,
+                    'window': window}
+                st.session_state.jobs['detect'] = get_job_runner().submit(
+                    "Boundary detection", run_detect_job, st.session_state.results,
+                    current_kg(), list(start_nodes), entropy_threshold, max_depth,
+                    embedding_mode, current_sentences(), (alpha, beta, gamma), window)
             else:
                 st.error("⚠️ Please select at least one starting node")
     
     with col2:
-        st.markdown("### 📋 Results Preview")
-        if st.session_state.results:
-            for i, result in enumerate(st.session_state.results):
-                with st.expander(f"📊 Result {i+1}: {result['start_node']}"):
-                    st.write(f"🔵 Boundary nodes: {len(result['boundary_nodes'])}")
-                    if result['entropies']:
-                        st.write(f"📈 Max entropy: {max(result['entropies']):.3f}")
-                        st.write(f"📉 Min entropy: {min(result['entropies']):.3f}")
-                        st.write(f"📊 Avg entropy: {sum(result['entropies'])/len(result['entropies']):.3f}")
-                    else:
-                        st.write("📊 No entropy data available")
+        detect_status_panel()
+
+@live_fragment('build')
+def build_status_panel():
+    job = job_status('build')
+    if job is not None and job.status == 'done':
+        kg = current_kg()
+        if job.result.get('appended'):
+            st.success(f"✅ Appended {len(job.result['new_sentences'])} sentences; KG now has "
+                       f"{len(kg.nodes)} nodes and {len(kg.edges)} edges ({job.elapsed:.1f}s)")
         else:
-            st.info("🔍 Run detection to see results")
+            st.success(f"✅ Built KG with {len(kg.nodes)} nodes and {len(kg.edges)} edges ({job.elapsed:.1f}s)")
+        
+        if job.result.get('stages'):
+            with st.expander("⚡ Pipeline stage throughput"):
+                st.dataframe(pd.DataFrame(job.result['stages']), use_container_width=True)        
+        with st.expander("👁️ View extracted sentences"):
+            sentences = current_sentences()
+            for i in preview_page(sentences, 'sentences_page'):
+                st.write(f"{i+1}. {sentences[i]}")
+
+@live_fragment('detect')
+def detect_status_panel():
+    job = job_status('detect')
+    if job is not None and job.status == 'done':
+        st.success(f"✅ Processed {len(job.result)} starting nodes ({job.elapsed:.1f}s)")
+    
+    st.markdown("### 📋 Results Preview")
+    results = st.session_state.results
+    if results:
+        for i in preview_page(results, 'results_page'):
+            result = results[i]
+            with st.expander(f"📊 Result {i+1}: {result['start_node']}"):
+                st.write(f"🔵 Boundary nodes: {len(result['boundary_nodes'])}")
+                if result['entropies']:
+                    st.write(f"📈 Max entropy: {max(result['entropies']):.3f}")
+                    st.write(f"📉 Min entropy: {min(result['entropies']):.3f}")
+                    st.write(f"📊 Avg entropy: {sum(result['entropies'])/len(result['entropies']):.3f}")
+                else:
+                    st.write("📊 No entropy data available")
+    else:
+        st.info("🔍 Run detection to see results")
 
 def visualize_interface():
     st.header("📊 Graph Visualization")
     
-    if not st.session_state.kg:
+    if current_kg() is None:
         st.warning("⚠️ Build a knowledge graph first")
         return
     
+    from visualizer import GraphVisualizer
     viz = GraphVisualizer()
     
     col1, col2 = st.columns([1, 2])
@@ -319,10 +629,10 @@ def visualize_interface():
     with col2:
         try:
             if st.session_state.results and highlight_nodes:
-                fig = viz.create_graph_plot(st.session_state.kg, highlight_nodes, 
+                fig = viz.create_graph_plot(current_kg(), highlight_nodes, 
                                            show_labels, layout)
             else:
-                fig = viz.create_graph_plot(st.session_state.kg, [], show_labels, layout)
+                fig = viz.create_graph_plot(current_kg(), [], show_labels, layout)
             
             st.plotly_chart(fig, use_container_width=True)
         except Exception as e:
@@ -336,44 +646,25 @@ def results_interface():
         return
     
     # Results summary
-    results_df = []
-    for r in st.session_state.results:
-        if r['entropies']:
-            avg_entropy = sum(r['entropies']) / len(r['entropies'])
-            max_entropy = max(r['entropies'])
-            min_entropy = min(r['entropies'])
-        else:
-            avg_entropy = max_entropy = min_entropy = 0
-            
-        results_df.append({
-            'Start Node': r['start_node'],
-            'Boundary Nodes': len(r['boundary_nodes']),
-            'Avg Entropy': avg_entropy,
-            'Max Entropy': max_entropy,
-            'Min Entropy': min_entropy,
-            'Final Nodes': ', '.join(str(node) for node in r['boundary_nodes'][-3:])
-        })
-    
-    df = pd.DataFrame(results_df)
+    store = st.session_state.results
+    summary = store.summary()
+    df = store.summary_frame()
+    valid = summary['has_entropy']
     
     # Metrics
     col1, col2, col3, col4 = st.columns(4)
     with col1:
-        st.metric("📊 Total Results", len(st.session_state.results))
+        st.metric("📊 Total Results", len(df))
     with col2:
-        avg_boundary_size = sum(len(r['boundary_nodes']) for r in st.session_state.results) / len(st.session_state.results)
-        st.metric("📏 Avg Boundary Size", f"{avg_boundary_size:.1f}")
+        st.metric("📏 Avg Boundary Size", f"{summary['boundary_nodes'].mean():.1f}")
     with col3:
-        valid_results = [r for r in st.session_state.results if r['entropies']]
-        if valid_results:
-            avg_max_entropy = sum(max(r['entropies']) for r in valid_results) / len(valid_results)
-            st.metric("📈 Avg Max Entropy", f"{avg_max_entropy:.2f}")
+        if valid.any():
+            st.metric("📈 Avg Max Entropy", f"{summary['max_entropy'][valid].mean():.2f}")
         else:
             st.metric("📈 Avg Max Entropy", "N/A")
     with col4:
-        if valid_results:
-            avg_min_entropy = sum(min(r['entropies']) for r in valid_results) / len(valid_results)
-            st.metric("📉 Avg Min Entropy", f"{avg_min_entropy:.2f}")
+        if valid.any():
+            st.metric("📉 Avg Min Entropy", f"{summary['min_entropy'][valid].mean():.2f}")
         else:
             st.metric("📉 Avg Min Entropy", "N/A")
     
@@ -385,6 +676,7 @@ def results_interface():
     st.markdown("### 📊 Entropy Visualization")
     
     if st.session_state.results:
+        from visualizer import GraphVisualizer
         viz = GraphVisualizer()
         
         selected_idx = st.selectbox(
@@ -404,10 +696,19 @@ def results_interface():
         else:
             st.warning("No entropy data available for this result")
         
+        index = get_offset_index(current_kg())
+        if index is not None and st.checkbox("📝 Show in source text"):
+            spans = pd.DataFrame(index.project(result_walks([selected_result]), current_sentences()))
+            if spans.empty:
+                st.info("This walk didn't follow any edge")
+            else:
+                st.dataframe(spans[['step', 'source', 'target', 'sentence_id', 'char_start', 'char_end', 'text']],
+                             use_container_width=True)
+        
         if st.checkbox("🔍 Show boundary subgraph"):
             try:
                 subgraph_fig = viz.create_subgraph_plot(
-                    st.session_state.kg,
+                    current_kg(),
                     selected_result['boundary_nodes'],
                     f"Boundary Subgraph for {selected_result['start_node']}"
                 )
@@ -415,16 +716,75 @@ def results_interface():
             except Exception as e:
                 st.error(f"❌ Error creating subgraph: {str(e)}")
     
+    reweight_panel()
+    
     # Export functionality
     st.markdown("### 💾 Export Results")
-    if st.button("📥 Export Results"):
-        csv = df.to_csv(index=False)
-        st.download_button(
-            label="📄 Download CSV",
-            data=csv,
-            file_name="boundary_detection_results.csv",
-            mime="text/csv"
-        )
+    st.download_button(
+        label="📄 Download summary CSV",
+        data=df.to_csv(index=False),
+        file_name="boundary_detection_results.csv",
+        mime="text/csv"
+    )
+    export_format = st.selectbox("🧾 Per-step export format:", list(EXPORT_FORMATS))
+    if st.button("📥 Export per-step results"):
+        file_name, mime, write = EXPORT_FORMATS[export_format]
+        try:
+            # Written in chunks to disk, then streamed from the file
+            export = tempfile.NamedTemporaryFile(suffix=os.path.splitext(file_name)[1], delete=False)
+            export.close()
+            write(store, export.name)
+            with open(export.name, 'rb') as f:
+                st.download_button(label=f"📄 Download {export_format}", data=f,
+                                   file_name=file_name, mime=mime)
+            os.unlink(export.name)
+        except ImportError:
+            st.error("❌ Parquet/Arrow export needs pyarrow (pip install pyarrow)")
+    
+    index = get_offset_index(current_kg())
+    if index is not None and st.button("📥 Export span annotations"):
+        # One JSON line per occurrence of each traversed edge in the text
+        export = io.StringIO()
+        index.to_jsonl(export, result_walks(store), current_sentences())
+        st.download_button(label="📄 Download span annotations (JSONL)", data=export.getvalue(),
+                           file_name="boundary_detection_spans.jsonl", mime="application/jsonl")
+
+def reweight_panel():
+    config = st.session_state.get('detect_config')
+    if not config:
+        return
+    
+    st.markdown("### ⚖️ Re-weight Without Re-running")
+    trace = get_walk_trace(current_kg(), config)
+    cols = st.columns(5)
+    alpha = cols[0].number_input("α", 0.0, 5.0, float(config['alpha']), 0.05, key="rw_alpha")
+    beta = cols[1].number_input("β", 0.0, 5.0, float(config['beta']), 0.05, key="rw_beta")
+    gamma = cols[2].number_input("γ", 0.0, 5.0, float(config['gamma']), 0.05, key="rw_gamma")
+    threshold = cols[3].number_input("🌡️", 0.05, 10.0, float(config['threshold']), 0.05, key="rw_threshold")
+    window = cols[4].number_input("🪟", 1, 8, int(config['window']), key="rw_window",
+                                  disabled=trace.fixed_window is not None)
+    
+    # Only recombines the traced components; no traversal runs here
+    store = ResultStore.from_traversals(trace.walks(alpha, beta, gamma, threshold, int(window)))
+    summary = store.summary()
+    col1, col2 = st.columns(2)
+    col1.metric("📏 Avg Boundary Size", f"{summary['boundary_nodes'].mean():.1f}")
+    col2.metric("🎯 Stopped on a boundary", f"{trace.cut(alpha, beta, gamma, threshold, int(window))[2].mean():.0%}")
+    if st.button("✅ Use these weights"):
+        st.session_state.results = store
+        config.update(alpha=alpha, beta=beta, gamma=gamma, threshold=threshold, window=int(window))
+        st.rerun()
+    
+    with st.expander("🔎 Auto-tune against sentence boundaries"):
+        st.caption("Scores each configuration by how closely walks stop where they first leave "
+                   "their start node's sentences. Evaluated configurations are cached.")
+        n = st.number_input("🎲 Random configurations:", 10, 5000, 300, 10)
+        if st.button("🚀 Search"):
+            tuner = trace.tuner()
+            rows = tuner.random(int(n))
+            st.dataframe(pd.DataFrame([tuner.evaluate(alpha, beta, gamma, threshold, int(window))] + rows[:10]),
+                         use_container_width=True)
+            st.caption("First row: the current weights. Copy a row's values above to apply it.")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
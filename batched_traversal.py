@@ -0,0 +1,251 @@
+import numpy as np
+import networkx as nx
+from graph_cache import get_cached
+from entropy_model import EntropyBoundaryDetector, boundary_factor, node_clustering
+
+# Surface forms, plus what they lemmatize to in a normalized graph (is/was/were
+# -> be, has -> have); both traversal paths score these relations higher
+PREFERRED_RELATIONS = ('has', 'is', 'was', 'were', 'have', 'be')
+# Visited bitsets for one chunk of walkers stay under this many bytes
+BITSET_BUDGET = 32 * 1024 * 1024
+
+
+def _ragged(offsets, rows):
+    # Flat indices of rows[i]'s CSR slice for every i, plus which i each belongs to
+    starts = offsets[rows]
+    counts = offsets[rows + 1] - starts
+    owner = np.repeat(np.arange(len(rows)), counts)
+    flat = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + starts[owner]
+    return flat, owner, counts
+
+
+class WalkGraph:
+    # CSR adjacency plus the per-node terms of EntropyBoundaryDetector that
+    # don't depend on the walk (degree, clustering, local entropy). Cached per
+    # graph and dropped by graph_cache.invalidate when the graph changes.
+    def __init__(self, kg):
+        self.nodes = list(kg.nodes())
+        self.ids = {node: i for i, node in enumerate(self.nodes)}
+        n = len(self.nodes)
+
+        targets, preferred = [], []
+        self.out_offsets = np.zeros(n + 1, dtype=np.int64)
+        for i, node in enumerate(self.nodes):
+            # Same successor order as kg.neighbors, so ties break identically
+            for _, target, data in kg.out_edges(node, data=True):
+                targets.append(self.ids[target])
+                preferred.append(data.get('relation', '') in PREFERRED_RELATIONS)
+            self.out_offsets[i + 1] = len(targets)
+        self.targets = np.asarray(targets, dtype=np.int64)
+        self.relation_score = np.where(np.asarray(preferred, dtype=bool), 0.8, 0.5)
+        self.out_degree = np.diff(self.out_offsets)
+        sources = np.repeat(np.arange(n, dtype=np.int64), self.out_degree)
+        self.edge_keys = np.sort(sources * n + self.targets)
+
+        self.degree = np.array([kg.degree(node) for node in self.nodes], dtype=np.int64)
+        if hasattr(kg, 'clustering'):
+            clustering = [node_clustering(kg, node) for node in self.nodes]
+        else:
+            values = nx.clustering(kg.to_undirected(as_view=True))
+            clustering = [values[node] for node in self.nodes]
+        self.clustering = np.asarray(clustering, dtype=float)
+        detector = EntropyBoundaryDetector()
+        self.local_entropy = np.array([detector.compute_local_entropy(kg, node, None)
+                                       for node in self.nodes], dtype=float)
+        # traverse_with_entropy stops on a falsy next node
+        self.falsy = np.array([not node for node in self.nodes], dtype=bool)
+
+    def has_edges(self, sources, targets):
+        if not len(self.edge_keys):
+            return np.zeros(np.shape(sources), dtype=bool)
+        keys = np.asarray(sources, dtype=np.int64) * len(self.nodes) + targets
+        pos = np.minimum(np.searchsorted(self.edge_keys, keys), len(self.edge_keys) - 1)
+        return self.edge_keys[pos] == keys
+
+
+def get_walk_graph(kg):
+    return get_cached(kg, 'walk_graph', WalkGraph)
+
+
+class BatchedTraverser:
+    # Runs one traverse_with_entropy walker per start node, all in lockstep:
+    # each depth step is a fixed number of array operations over every active
+    # walker instead of a Python loop per walker. Walks and entropies match
+    # GraphTraverser.traverse_with_entropy exactly.
+    def __init__(self, kg, entropy_detector, max_degree):
+        self.kg = kg
+        self.detector = entropy_detector
+        self.max_degree = max_degree
+        self.graph = get_walk_graph(kg)
+
+    def traverse(self, start_nodes, max_depth=10, progress=None):
+        # progress(completed) is called after every step with the
+        # (node, path, entropies) of walkers that stopped in it
+        g = self.graph
+        words = max(1, (len(g.nodes) + 63) // 64)
+        chunk = max(1, BITSET_BUDGET // (8 * words))
+        results = []
+        for first in range(0, len(start_nodes), chunk):
+            results.extend(self._traverse_chunk(start_nodes[first:first + chunk], max_depth, words, progress))
+        return results
+
+    def trace(self, start_nodes, max_depth=10):
+        # Full walks with no boundary stop, since where a walk goes never depends
+        # on its entropy: any threshold or weights only cut it short. Returns the
+        # node-id paths and the per-step entropy components, one row per walker.
+        g = self.graph
+        words = max(1, (len(g.nodes) + 63) // 64)
+        chunk = max(1, BITSET_BUDGET // (8 * words))
+        parts = []
+        for first in range(0, len(start_nodes), chunk):
+            record = {}
+            self._traverse_chunk(start_nodes[first:first + chunk], max_depth, words, None, record)
+            parts.append(record)
+        keys = ('path', 'length', 'steps', 'local', 'struct', 'semantic', 'pair')
+        if not parts:
+            return {key: np.zeros((0, max_depth + 1)) for key in keys}
+        return {key: np.concatenate([part[key] for part in parts]) for key in keys}
+
+    def _structural_entropy(self, cur, path, length):
+        g = self.graph
+        # Context is the last (up to) 10 nodes stepped to, i.e. path[1:][-10:]
+        columns = length[:, None] - 1 - np.arange(10)
+        in_context = columns >= 1
+        context = np.take_along_axis(path, np.maximum(columns, 0), axis=1)
+        context_size = in_context.sum(axis=1)
+        shared = (in_context & g.has_edges(cur[:, None], context)).sum(axis=1)
+        union = g.out_degree[cur] + context_size - shared
+        overlap = np.where(context_size > 0, shared / np.maximum(union, 1), 0.0)
+
+        features = np.stack([g.degree[cur].astype(float), g.clustering[cur], overlap], axis=1)
+        low = features.min(axis=1, keepdims=True)
+        high = features.max(axis=1, keepdims=True)
+        p = (features - low) / (high - low + 1e-8)
+        terms = np.where(p > 0, p * np.log2(p + 1e-8), 0.0)
+        # Summed left to right, like the generator sum in compute_structural_entropy
+        return -((terms[:, 0] + terms[:, 1]) + terms[:, 2])
+
+    def _pair_divergence(self, prev, cur):
+        g = self.graph
+        flat, owner, counts = _ragged(g.out_offsets, cur)
+        shared = np.bincount(owner, weights=g.has_edges(prev[owner], g.targets[flat]),
+                             minlength=len(cur)).astype(np.int64)
+        prev_degree = g.out_degree[prev]
+        union = prev_degree + counts - shared
+        empty = (prev_degree == 0) | (counts == 0)
+        return np.where(empty, 1.0, 1.0 - shared / np.maximum(union, 1))
+
+    def _semantic_divergence(self, active, cur, path, length, pair_divergence):
+        # compute_semantic_divergence over path[-window_size:]: the mean of the
+        # consecutive-pair divergences in the window. Each step adds one pair.
+        divergence = np.zeros(len(active))
+        window = self.detector.window_size
+        pairs = (np.minimum(length, window) if window > 0 else length) - 1
+        if self.detector.embeddings is not None:
+            g = self.graph
+            for k in np.flatnonzero(pairs > 0):
+                names = [g.nodes[j] for j in path[k, length[k] - pairs[k] - 1:length[k]]]
+                divergence[k] = self.detector.compute_semantic_divergence(self.kg, names)
+            return divergence
+        moved = np.flatnonzero(length >= 2)
+        if len(moved):
+            rows = active[moved]
+            pair_divergence[rows, length[moved] - 1] = self._pair_divergence(
+                path[moved, length[moved] - 2], cur[moved])
+        for k in np.unique(pairs[pairs > 0]).tolist():
+            # np.mean over equal-sized windows, as over each walker's list
+            sub = np.flatnonzero(pairs == k)
+            columns = length[sub, None] - k + np.arange(k)
+            divergence[sub] = np.take_along_axis(pair_divergence[active[sub]], columns, axis=1).mean(axis=1)
+        return divergence
+
+    def _traverse_chunk(self, start_nodes, max_depth, words, progress, record=None):
+        g = self.graph
+        detector = self.detector
+        walkers = len(start_nodes)
+        path = np.zeros((walkers, max_depth + 1), dtype=np.int64)
+        path[:, 0] = [g.ids[node] for node in start_nodes]
+        length = np.ones(walkers, dtype=np.int64)
+        entropies = np.zeros((walkers, max_depth))
+        steps = np.zeros(walkers, dtype=np.int64)
+        pair_divergence = np.zeros((walkers, max_depth + 1))
+        visited = np.zeros((walkers, words), dtype=np.uint64)
+        np.bitwise_or.at(visited, (np.arange(walkers), path[:, 0] >> 6),
+                         np.left_shift(np.uint64(1), (path[:, 0] & 63).astype(np.uint64)))
+        degree_scale = max(1, self.max_degree)
+        active = np.arange(walkers)
+        if record is not None:
+            components = {key: np.zeros((walkers, max_depth)) for key in ('local', 'struct', 'semantic')}
+
+        def finish(rows):
+            completed = [(start_nodes[w], [g.nodes[j] for j in path[w, :length[w]].tolist()],
+                          entropies[w, :steps[w]].tolist()) for w in rows.tolist()]
+            if progress and completed:
+                progress(completed)
+            return completed
+
+        results = [None] * walkers
+        for depth in range(max_depth):
+            if not len(active):
+                break
+            cur = path[active, length[active] - 1]
+            sub_path, sub_length = path[active], length[active]
+            struct = self._structural_entropy(cur, sub_path, sub_length)
+            semantic = self._semantic_divergence(active, cur, sub_path, sub_length, pair_divergence)
+            entropy = detector.combine(g.local_entropy[cur], struct, semantic)
+            entropies[active, depth] = entropy
+            steps[active] += 1
+
+            if record is None:
+                stopped = entropy > detector.threshold * boundary_factor(sub_length)
+            else:
+                components['local'][active, depth] = g.local_entropy[cur]
+                components['struct'][active, depth] = struct
+                components['semantic'][active, depth] = semantic
+                stopped = np.zeros(len(active), dtype=bool)
+
+            # Candidate next nodes: every out-edge of every walker still going
+            moving = np.flatnonzero(~stopped)
+            flat, owner, counts = _ragged(g.out_offsets, cur[moving])
+            candidate = g.targets[flat]
+            seen = (visited[active[moving][owner], candidate >> 6]
+                    >> (candidate & 63).astype(np.uint64)) & np.uint64(1)
+            score = 0.6 * (g.degree[candidate] / degree_scale) + 0.4 * g.relation_score[flat]
+            score = np.where(seen.astype(bool), -np.inf, score)
+
+            nxt = np.full(len(moving), -1, dtype=np.int64)
+            has = counts > 0
+            if has.any():
+                bounds = (np.cumsum(counts) - counts)[has]
+                best = np.maximum.reduceat(score, bounds)
+                # First candidate reaching the max, as np.argmax picks
+                first = np.where(score == np.repeat(best, counts[has]), np.arange(len(score)), len(score))
+                pick = np.minimum.reduceat(first, bounds)
+                ok = np.isfinite(best)
+                chosen = np.full(has.sum(), -1, dtype=np.int64)
+                chosen[ok] = candidate[pick[ok]]
+                nxt[has] = chosen
+            valid = nxt >= 0
+            valid[valid] = ~g.falsy[nxt[valid]]
+            stopped[moving[~valid]] = True
+
+            go = moving[valid]
+            rows = active[go]
+            nodes = nxt[valid]
+            path[rows, length[rows]] = nodes
+            length[rows] += 1
+            np.bitwise_or.at(visited, (rows, nodes >> 6),
+                             np.left_shift(np.uint64(1), (nodes & 63).astype(np.uint64)))
+
+            if record is None:
+                done = active[stopped]
+                for w, result in zip(done.tolist(), finish(done)):
+                    results[w] = result
+            active = active[~stopped]
+
+        if record is not None:
+            record.update(components, path=path, length=length, steps=steps, pair=pair_divergence)
+            return None
+        for w, result in zip(active.tolist(), finish(active)):
+            results[w] = result
+        return [(path, entropies) for _, path, entropies in results]
@@ -0,0 +1,200 @@
+import argparse
+import time
+import pandas as pd
+from nlp_utils import TextProcessor
+from extraction import EXTRACTORS, get_extractor
+from kg_builder import KnowledgeGraphBuilder
+from pipeline import NLPPipeline
+from entropy_model import EntropyBoundaryDetector
+from traversal import GraphTraverser
+from sentence_splitter import SentenceSplitter
+from lookup_tagger import REFERENCE_TAGGERS, build_table, evaluate, load_corpus, tag_chapters, training_chapters, LookupTagger
+
+CSV_PATH = "src/war_and_peace_full_chapters.csv"
+
+
+def load_chapters(chapters=3, csv_path=CSV_PATH):
+    df = pd.read_csv(csv_path)
+    return df['text'].head(chapters).tolist()
+
+
+def load_chapter_sentences(chapters=3, csv_path=CSV_PATH):
+    processor = TextProcessor()
+    sentences = []
+    for text in load_chapters(chapters, csv_path):
+        sentences.extend(processor.extract_sentences(text))
+    return sentences
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def _error_line(e):
+    # NLTK's missing-resource errors are framed in rows of asterisks
+    return next((line.strip() for line in str(e).splitlines() if line.strip('* ')), repr(e))
+
+
+def benchmark_extraction(sentences, backends=None, spacy_processes=1):
+    rows = []
+    for backend in backends or list(EXTRACTORS):
+        options = {'n_process': spacy_processes} if backend == 'spacy' else {}
+        try:
+            extractor = get_extractor(backend, **options)
+            triplets, elapsed = _timed(lambda: list(extractor.iter_extract(sentences)))
+        except Exception as e:
+            rows.append({'backend': backend, 'error': _error_line(e)})
+            continue
+        rows.append({
+            'backend': backend,
+            'sentences': len(sentences),
+            'triplets': sum(len(t) for t in triplets),
+            'seconds': round(elapsed, 3),
+            'sentences_per_sec': round(len(sentences) / elapsed, 1) if elapsed else float('inf'),
+        })
+    return rows
+
+
+def benchmark_splitter(texts, tiers=None):
+    rows = []
+    for tier in tiers or list(SentenceSplitter.TIERS):
+        try:
+            splitter, load_seconds = _timed(lambda: SentenceSplitter(tier))
+            sentences, elapsed = _timed(lambda: [s for text in texts for s in splitter.split(text)])
+        except Exception as e:
+            rows.append({'tier': tier, 'error': _error_line(e)})
+            continue
+        rows.append({
+            'tier': tier,
+            'load_seconds': round(load_seconds, 3),
+            'sentences': len(sentences),
+            'seconds': round(elapsed, 3),
+            'sentences_per_sec': round(len(sentences) / elapsed, 1) if elapsed else float('inf'),
+        })
+    return rows
+
+
+def _held_out_gold():
+    # The chapters no shipped table was built from, tagged by the first
+    # reference tagger that runs here
+    _, held_out = training_chapters()
+    for reference in REFERENCE_TAGGERS:
+        try:
+            return tag_chapters(held_out, reference), reference
+        except (LookupError, ImportError):
+            continue
+    return None, None
+
+
+def benchmark_tagger(sentences, holdout=0.1):
+    # Accuracy against a gold-tagged corpus: the lookup table is rebuilt from
+    # the treebank's training split so held-out sentences are unseen. Without
+    # the treebank the shipped table is scored on the held-out chapters tagged
+    # by a reference tagger (a silver standard, named in the 'gold' column).
+    try:
+        corpus = load_corpus()
+    except LookupError:
+        corpus = None
+
+    lookup = LookupTagger()
+    if corpus:
+        split = int(len(corpus) * (1 - holdout))
+        lookup.table = build_table(corpus[:split])
+        gold, source = corpus[split:], 'treebank'
+    else:
+        gold, source = _held_out_gold()
+
+    rows = []
+    tokenized = [lookup.tokenize(s) for s in sentences]
+    reference = None
+    for name, tag_fn in (('perceptron', REFERENCE_TAGGERS['perceptron']), ('lookup', lookup.tag)):
+        try:
+            tagged, elapsed = _timed(lambda: [tag_fn(tokens) for tokens in tokenized])
+        except Exception as e:
+            rows.append({'tagger': name, 'error': _error_line(e)})
+            continue
+        tokens = sum(len(t) for t in tokenized)
+        row = {'tagger': name, 'tokens': tokens, 'seconds': round(elapsed, 3),
+               'tokens_per_sec': round(tokens / elapsed, 1) if elapsed else float('inf')}
+        if reference is None:
+            reference = tagged
+        else:
+            agree = sum(a[1] == b[1] for ref, out in zip(reference, tagged) for a, b in zip(ref, out))
+            row['agreement'] = round(agree / tokens, 4) if tokens else 0.0
+        if gold:
+            row['accuracy'] = evaluate(tag_fn, gold)['accuracy']
+            row['gold'] = source
+        rows.append(row)
+    return rows
+
+
+def benchmark_pipeline(texts, workers=None, backend='nltk'):
+    text = ' '.join(texts)
+    processor = TextProcessor()
+    builder = KnowledgeGraphBuilder(backend)
+    kg, elapsed = _timed(lambda: builder.build_from_sentences(processor.extract_sentences(text)))
+    sentences = len(kg.graph['sentences'])
+    rows = [{'mode': 'sequential', 'sentences': sentences, 'seconds': round(elapsed, 3),
+             'sentences_per_sec': round(sentences / elapsed, 1)}]
+
+    for executor in ('thread', 'process'):
+        pipeline = NLPPipeline(backend, executor=executor, workers=workers)
+        kg, elapsed = _timed(lambda: pipeline.run(text))
+        rows.append({'mode': f'pipelined ({executor})', 'sentences': len(kg.graph['sentences']),
+                     'seconds': round(elapsed, 3),
+                     'sentences_per_sec': round(len(kg.graph['sentences']) / elapsed, 1)})
+        for stage in pipeline.stage_report():
+            print(f"  [{executor}] {stage}")
+    return rows
+
+
+def benchmark_traversal(texts, threshold=0.8, max_depth=10, workers=None, backend='nltk'):
+    # "Select All": one walker per node, per-walker loop vs lockstep arrays
+    kg = KnowledgeGraphBuilder(backend).build_from_sentences(TextProcessor().extract_sentences(' '.join(texts)))
+    detector = EntropyBoundaryDetector(threshold=threshold)
+    nodes = list(kg.nodes())
+    rows, reference = [], None
+    for mode, memoize, run in (
+            ('sequential', False, lambda t: [(node,) + t.traverse_with_entropy(node, max_depth) for node in nodes]),
+            ('sequential (suffix memo)', True,
+             lambda t: [(node,) + t.traverse_with_entropy(node, max_depth) for node in nodes]),
+            ('process pool', True, lambda t: t.traverse_many(nodes, max_depth, workers, vectorized=False)),
+            ('vectorized', False, lambda t: t.traverse_many(nodes, max_depth))):
+        traverser = GraphTraverser(kg, detector, memoize=memoize)
+        walks, elapsed = _timed(lambda: run(traverser))
+        if reference is None:
+            reference = walks
+        rows.append({'mode': mode, 'walkers': len(walks), 'seconds': round(elapsed, 3),
+                     'walkers_per_sec': round(len(walks) / elapsed, 1) if elapsed else float('inf'),
+                     'steps_reused': traverser.memo_stats().get('saved', ''),
+                     'identical': walks == reference})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput benchmarks on War and Peace chapters")
+    parser.add_argument('benchmark', choices=['extraction', 'pipeline', 'splitter', 'tagger', 'traversal'])
+    parser.add_argument('--chapters', type=int, default=3)
+    parser.add_argument('--spacy-processes', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    if args.benchmark == 'extraction':
+        rows = benchmark_extraction(load_chapter_sentences(args.chapters),
+                                    spacy_processes=args.spacy_processes)
+    elif args.benchmark == 'pipeline':
+        rows = benchmark_pipeline(load_chapters(args.chapters), workers=args.workers)
+    elif args.benchmark == 'splitter':
+        rows = benchmark_splitter(load_chapters(args.chapters))
+    elif args.benchmark == 'tagger':
+        rows = benchmark_tagger(load_chapter_sentences(args.chapters))
+    elif args.benchmark == 'traversal':
+        rows = benchmark_traversal(load_chapters(args.chapters), workers=args.workers)
+
+    print(pd.DataFrame(rows).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
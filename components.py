@@ -0,0 +1,101 @@
+import itertools
+import networkx as nx
+from graph_cache import get_cached
+
+
+class ComponentIndex:
+    def __init__(self, kg):
+        self._ids = itertools.count()
+        self._members = {}
+        self.node_component = {}
+        for component in nx.weakly_connected_components(kg):
+            self._add_component(component)
+        self._sorted = None
+
+    def _add_component(self, nodes):
+        cid = next(self._ids)
+        self._members[cid] = set(nodes)
+        for node in nodes:
+            self.node_component[node] = cid
+        return cid
+
+    def _ordered_ids(self):
+        if self._sorted is None:
+            self._sorted = sorted(self._members, key=lambda cid: -len(self._members[cid]))
+        return self._sorted
+
+    @property
+    def components(self):
+        return [frozenset(self._members[cid]) for cid in self._ordered_ids()]
+
+    @property
+    def count(self):
+        return len(self._members)
+
+    @property
+    def sizes(self):
+        return [len(self._members[cid]) for cid in self._ordered_ids()]
+
+    def is_connected(self):
+        return self.count == 1
+
+    def component_of(self, node):
+        cid = self.node_component.get(node)
+        return None if cid is None else frozenset(self._members[cid])
+
+    def refresh(self, kg, nodes, edges):
+        # Appending can only merge components. A removed node or edge can split
+        # one, which needs a full recompute: edges that are no longer in the
+        # graph were removed, and nodes changed without edges may have lost some.
+        if nodes and not edges:
+            return False
+        if any(not kg.has_node(node) for node in nodes) or any(not kg.has_edge(u, v) for u, v in edges):
+            return False
+        for u, v in edges:
+            cu = self.node_component.get(u)
+            if cu is None:
+                cu = self._add_component([u])
+            cv = self.node_component.get(v)
+            if cv is None:
+                cv = self._add_component([v])
+            if cu == cv:
+                continue
+            if len(self._members[cu]) < len(self._members[cv]):
+                cu, cv = cv, cu
+            for node in self._members[cv]:
+                self.node_component[node] = cu
+            self._members[cu] |= self._members.pop(cv)
+        self._sorted = None
+        return True
+
+    def batches(self, start_nodes, min_batch_nodes=50):
+        # Group start nodes by component, largest components first. Small
+        # components are packed together so tiny tasks don't dominate scheduling.
+        by_component = {}
+        for node in start_nodes:
+            cid = self.node_component.get(node)
+            if cid is not None:
+                by_component.setdefault(cid, []).append(node)
+
+        batches = []
+        pending_nodes, pending_starts = set(), []
+        for cid in self._ordered_ids():
+            if cid not in by_component:
+                continue
+            component = self._members[cid]
+            if len(component) >= min_batch_nodes:
+                batches.append((frozenset(component), by_component[cid]))
+                continue
+            pending_nodes |= component
+            pending_starts.extend(by_component[cid])
+            if len(pending_nodes) >= min_batch_nodes:
+                batches.append((frozenset(pending_nodes), pending_starts))
+                pending_nodes, pending_starts = set(), []
+
+        if pending_starts:
+            batches.append((frozenset(pending_nodes), pending_starts))
+        return batches
+
+
+def get_component_index(kg):
+    return get_cached(kg, 'components', ComponentIndex)
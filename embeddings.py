@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+import threading
+from functools import lru_cache
+import numpy as np
+from graph_cache import get_cached
+from node_ranking import node_sentence_ids
+
+DEFAULT_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+CACHE_DIR = '.embedding_cache'
+
+
+def text_key(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class VectorCache:
+    def __init__(self, directory, name):
+        slug = name.replace('/', '__')
+        self.vectors_path = os.path.join(directory, f"{slug}.npy")
+        self.keys_path = os.path.join(directory, f"{slug}.keys.json")
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._dirty = False
+
+        if os.path.exists(self.vectors_path) and os.path.exists(self.keys_path):
+            self.vectors = np.load(self.vectors_path)
+            with open(self.keys_path) as f:
+                self.rows = {key: i for i, key in enumerate(json.load(f))}
+        else:
+            self.vectors = None
+            self.rows = {}
+
+    def lookup(self, keys):
+        with self._lock:
+            return [self.rows.get(key) for key in keys]
+
+    def get(self, rows):
+        return self.vectors[rows]
+
+    def add(self, keys, vectors):
+        vectors = np.asarray(vectors, dtype=np.float16)
+        with self._lock:
+            start = 0 if self.vectors is None else len(self.vectors)
+            self.vectors = vectors if self.vectors is None else np.vstack([self.vectors, vectors])
+            for i, key in enumerate(keys):
+                self.rows[key] = start + i
+            self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            keys = sorted(self.rows, key=self.rows.get)
+            tmp_vectors, tmp_keys = self.vectors_path + '.tmp.npy', self.keys_path + '.tmp'
+            np.save(tmp_vectors, self.vectors)
+            with open(tmp_keys, 'w') as f:
+                json.dump(keys, f)
+            os.replace(tmp_vectors, self.vectors_path)
+            os.replace(tmp_keys, self.keys_path)
+            self._dirty = False
+
+
+class EmbeddingEncoder:
+    def __init__(self, model_name=DEFAULT_MODEL, batch_size=256, max_length=128,
+                 cache_dir=CACHE_DIR, num_threads=None):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.num_threads = num_threads
+        self.cache = VectorCache(cache_dir, model_name)
+        self._model = None
+        self._tokenizer = None
+
+    def _load(self):
+        if self._model is None:
+            import torch
+            from transformers import AutoModel, AutoTokenizer
+            if self.num_threads:
+                torch.set_num_threads(self.num_threads)
+            self._tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            self._model = AutoModel.from_pretrained(self.model_name).eval()
+        return self._tokenizer, self._model
+
+    def encode(self, texts):
+        keys = [text_key(text) for text in texts]
+        rows = self.cache.lookup(keys)
+        missing = {}
+        for text, key, row in zip(texts, keys, rows):
+            if row is None:
+                missing.setdefault(key, text)
+
+        if missing:
+            self.cache.add(list(missing), self._encode_batched(list(missing.values())))
+            self.cache.save()
+            rows = self.cache.lookup(keys)
+
+        return self.cache.get(rows)
+
+    def _encode_batched(self, texts):
+        import torch
+        tokenizer, model = self._load()
+
+        # Length-sorted batches keep padding (and wasted FLOPs) low
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        output = None
+        with torch.inference_mode():
+            for start in range(0, len(order), self.batch_size):
+                batch_idx = order[start:start + self.batch_size]
+                encoded = tokenizer([texts[i] for i in batch_idx], padding=True, truncation=True,
+                                    max_length=self.max_length, return_tensors='pt')
+                hidden = model(**encoded).last_hidden_state
+                mask = encoded['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+                pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+                pooled = torch.nn.functional.normalize(pooled, dim=1)
+                if output is None:
+                    output = np.empty((len(texts), pooled.shape[1]), dtype=np.float16)
+                output[batch_idx] = pooled.numpy().astype(np.float16)
+
+        return output
+
+
+@lru_cache(maxsize=None)
+def get_encoder(model_name=DEFAULT_MODEL):
+    return EmbeddingEncoder(model_name)
+
+
+class NodeEmbeddings:
+    MODES = {
+        'node': 'Node names',
+        'sentence': 'Source sentences',
+    }
+
+    def __init__(self, kg, encoder, mode='node', sentences=None):
+        self.mode = mode
+        nodes = list(kg.nodes())
+        self.index = {node: i for i, node in enumerate(nodes)}
+
+        if mode == 'node':
+            self.vectors = encoder.encode([str(node) for node in nodes])
+        elif mode == 'sentence':
+            if sentences is None:
+                raise ValueError("Sentence embeddings need the source sentences")
+            sentence_vectors = encoder.encode(list(sentences)).astype(np.float32)
+            vectors = np.zeros((len(nodes), sentence_vectors.shape[1]), dtype=np.float32)
+            for node, row in self.index.items():
+                sent_ids = [i for i in node_sentence_ids(kg, node) if 0 <= i < len(sentences)]
+                if sent_ids:
+                    vectors[row] = sentence_vectors[sent_ids].mean(axis=0)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            self.vectors = (vectors / np.maximum(norms, 1e-9)).astype(np.float16)
+        else:
+            raise ValueError(f"Unknown embedding mode: {mode}")
+
+    def path_divergence(self, path):
+        rows = [self.index.get(node, -1) for node in path]
+        vectors = self.vectors[rows].astype(np.float32)
+        similarities = np.einsum('ij,ij->i', vectors[1:], vectors[:-1])
+        divergences = 1.0 - similarities
+        # Nodes added after encoding have no vector: treat them as fully divergent
+        known = np.array(rows) >= 0
+        divergences[~(known[1:] & known[:-1])] = 1.0
+        return divergences
+
+
+def get_node_embeddings(kg, model_name=DEFAULT_MODEL, mode='node', sentences=None):
+    return get_cached(kg, ('embeddings', model_name, mode),
+                      lambda g: NodeEmbeddings(g, get_encoder(model_name), mode, sentences))
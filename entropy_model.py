@@ -1,42 +1,58 @@
 import numpy as np
 from collections import Counter, defaultdict
 import networkx as nx
+from graph_cache import get_node_cache
+
+def node_clustering(kg, node):
+    # Non-networkx views (shared_graph) compute it themselves
+    if hasattr(kg, 'clustering'):
+        return kg.clustering(node)
+    return nx.clustering(kg.to_undirected(as_view=True), node)
+
+DEFAULT_WEIGHTS = (0.4, 0.4, 0.2)
+
+def boundary_factor(path_length):
+    # Threshold multiplier used by is_boundary; works on scalars and arrays
+    return np.where(path_length > 10, 0.9, np.where(path_length < 3, 1.2, 1.0))
 
 class EntropyBoundaryDetector:
-    def __init__(self, threshold=0.8, window_size=3):
+    def __init__(self, threshold=0.8, window_size=3, embeddings=None, alpha=DEFAULT_WEIGHTS[0],
+                 beta=DEFAULT_WEIGHTS[1], gamma=DEFAULT_WEIGHTS[2]):
         self.threshold = threshold
         self.window_size = window_size
+        self.embeddings = embeddings
+        # S = alpha * H_local + beta * H_struct + gamma * D_semantic
+        self.alpha = alpha
+        self.beta = beta
+        self.gamma = gamma
         self.relation_probs = {}
         self.node_probs = {}
         
     def compute_local_entropy(self, kg, current_node, visited_nodes):
-        neighbors = list(kg.neighbors(current_node))
-        if not neighbors:
+        cache = get_node_cache(kg, 'local_entropy')
+        if current_node not in cache:
+            cache[current_node] = self._local_entropy(kg, current_node)
+        return cache[current_node]
+    
+    def _local_entropy(self, kg, current_node):
+        # Relation histogram over all outgoing edges, counting every time a
+        # relation was asserted rather than one relation per neighbour
+        rel_counts = Counter()
+        for _, _, data in kg.out_edges(current_node, data=True):
+            rel_counts.update(data.get('relations') or {data.get('relation', 'unknown'): 1})
+        if not rel_counts:
             return 1.0
-            
-        relations = []
-        for neighbor in neighbors:
-            if kg.has_edge(current_node, neighbor):
-                rel = kg[current_node][neighbor].get('relation', 'unknown')
-            elif kg.has_edge(neighbor, current_node):
-                rel = kg[neighbor][current_node].get('relation', 'unknown')
-            else:
-                rel = 'unknown'
-            relations.append(rel)
-        
-        rel_counts = Counter(relations)
-        total = sum(rel_counts.values())
         
-        entropy = 0.0
-        for count in rel_counts.values():
-            p = count / total
-            entropy -= p * np.log2(p + 1e-8)
-            
-        return entropy
+        counts = np.fromiter(rel_counts.values(), dtype=float, count=len(rel_counts))
+        p = counts / counts.sum()
+        return float(-(p * np.log2(p)).sum())
     
     def compute_semantic_divergence(self, kg, path):
         if len(path) < 2:
             return 0.0
+        
+        if self.embeddings is not None:
+            return float(np.mean(self.embeddings.path_divergence(path)))
             
         divergences = []
         for i in range(1, len(path)):
@@ -65,7 +81,10 @@ class EntropyBoundaryDetector:
         degree = kg.degree(node)
         features.append(degree)
         
-        clustering = nx.clustering(kg.to_undirected(), node)
+        clustering_cache = get_node_cache(kg, 'clustering')
+        if node not in clustering_cache:
+            clustering_cache[node] = node_clustering(kg, node)
+        clustering = clustering_cache[node]
         features.append(clustering)
         
         neighbors = set(kg.neighbors(node))
@@ -98,7 +117,7 @@ class EntropyBoundaryDetector:
             
         return entropy > base_threshold
     
-    def compute_node_entropy(self, kg, node, path, context):
+    def entropy_components(self, kg, node, path, context):
         local_ent = self.compute_local_entropy(kg, node, path)
         struct_ent = self.compute_structural_entropy(kg, node, context)
         
@@ -107,9 +126,14 @@ class EntropyBoundaryDetector:
         else:
             semantic_div = 0.0
         
-        combined_entropy = 0.4 * local_ent + 0.4 * struct_ent + 0.2 * semantic_div
-        
-        return combined_entropy
+        return local_ent, struct_ent, semantic_div
+    
+    def combine(self, local_ent, struct_ent, semantic_div):
+        # Scalars or per-step arrays alike
+        return self.alpha * local_ent + self.beta * struct_ent + self.gamma * semantic_div
+    
+    def compute_node_entropy(self, kg, node, path, context):
+        return self.combine(*self.entropy_components(kg, node, path, context))
     
     def update_context(self, context, new_node, max_size=10):
         context.append(new_node)
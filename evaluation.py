@@ -0,0 +1,292 @@
+import argparse
+import bisect
+import itertools
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing as mp
+from sentence_splitter import SKIP_SPACE
+
+CSV_PATH = "src/war_and_peace_full_chapters.csv"
+TRAVERSALS = {
+    'vectorized': 'Lockstep arrays (BatchedTraverser)',
+    'memo': 'Per-walker loop with the suffix memo',
+    'sequential': 'Per-walker loop',
+}
+
+# Reference segmentation of the first chapters, derived from the punctuated
+# text independently of the splitter tiers by reference_boundaries.py:
+# textblob's pattern tokenizer (its own rules and abbreviation list), less its
+# breaks before a lowercase continuation, plus hand-checked edits. One list of
+# sentence end offsets per chapter.
+REFERENCE_PATH = "src/reference_boundaries.json"
+
+
+def load_reference(texts, path=REFERENCE_PATH):
+    # Sentence ends for each text; the chapters must be the ones it was made for
+    with open(path, encoding='utf-8') as f:
+        chapters = json.load(f)['chapters']
+    if len(texts) > len(chapters):
+        raise ValueError(f"{path} covers only the first {len(chapters)} chapters; extend it with "
+                         f"python reference_boundaries.py --chapters {len(texts)}")
+    for i, (text, chapter) in enumerate(zip(texts, chapters)):
+        if len(text) != chapter['chars']:
+            raise ValueError(f"Chapter {i} doesn't match {path}")
+    return [chapter['ends'] for chapter in chapters[:len(texts)]]
+
+
+def reference_spans(text, ends):
+    spans = []
+    start = SKIP_SPACE.match(text).end()
+    for end in ends:
+        spans.append((start, end))
+        start = SKIP_SPACE.match(text, end).end()
+    tail = text[start:].rstrip()
+    if tail:
+        spans.append((start, start + len(tail)))
+    return spans
+
+
+def _ends(text, spans):
+    # Sentence end offsets, trailing whitespace excluded; the end of the text
+    # is a boundary for every segmentation, so it isn't counted
+    ends = {start + len(text[start:end].rstrip()) for start, end in spans}
+    ends.discard(len(text.rstrip()))
+    return ends
+
+
+def _scores(hits, predicted, gold):
+    precision = hits / predicted if predicted else 0.0
+    recall = hits / gold if gold else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return precision, recall, f1
+
+
+def gold_sentence_map(text, kept_spans, gold_spans):
+    # Reference sentences overlapping each graph sentence (more than one when
+    # the splitter missed a boundary)
+    gold_starts = [start for start, _ in gold_spans]
+    mapping = []
+    for start, end in kept_spans:
+        first = max(0, bisect.bisect_right(gold_starts, start) - 1)
+        last = max(first, bisect.bisect_left(gold_starts, end) - 1)
+        mapping.append(set(range(first, last + 1)))
+    return mapping
+
+
+def walk_targets(trace, node_gold):
+    # Steps each walker should take: it should stop on the first node that
+    # shares no reference sentence with its start node. None if it never does.
+    targets = []
+    for i in range(len(trace.start_nodes)):
+        start = node_gold(trace.names[trace.path[i, 0]])
+        target = None
+        if start:
+            for k in range(1, trace.length[i]):
+                if not node_gold(trace.names[trace.path[i, k]]) & start:
+                    target = k + 1
+                    break
+        targets.append(target)
+    return targets
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 1024
+
+
+def run_config(config, texts, references, tolerance=0):
+    # One configuration over the chapters, each built into its own graph.
+    # Meant to run in a fresh process so peak RSS is this configuration's own.
+    from entropy_model import EntropyBoundaryDetector
+    from kg_builder import KnowledgeGraphBuilder
+    from nlp_utils import TextProcessor
+    from node_ranking import node_sentence_ids
+    from traversal import GraphTraverser
+    from weight_tuning import WalkTrace
+
+    baseline_mb = peak_rss_mb()
+    tagger = 'lookup' if config['backend'] == 'lookup' else 'perceptron'
+    processor = TextProcessor(splitter=config['splitter'], tagger=tagger)
+    builder = KnowledgeGraphBuilder(config['backend'])
+    detector = EntropyBoundaryDetector(threshold=config['threshold'], window_size=config['window'],
+                                       alpha=config['alpha'], beta=config['beta'], gamma=config['gamma'])
+    mode = config['traversal']
+    seconds = {'split': 0.0, 'build': 0.0, 'traverse': 0.0}
+    counts = dict.fromkeys(('sentences', 'split_hits', 'split_predicted', 'split_gold',
+                            'walkers', 'hits', 'predicted', 'gold'), 0)
+
+    for text, ends in zip(texts, references):
+        start = time.perf_counter()
+        sentences, kept = processor.extract_sentence_spans(text)
+        split_done = time.perf_counter()
+        kg = builder.build_from_sentences(sentences, text=text, spans=kept)
+        build_done = time.perf_counter()
+        nodes = list(kg.nodes())
+        traverser = GraphTraverser(kg, detector, memoize=(mode == 'memo'))
+        if mode == 'vectorized':
+            walks = traverser.traverse_many(nodes, config['max_depth'])
+        else:
+            walks = [(node,) + traverser.traverse_with_entropy(node, config['max_depth']) for node in nodes]
+        done = time.perf_counter()
+        seconds['split'] += split_done - start
+        seconds['build'] += build_done - split_done
+        seconds['traverse'] += done - build_done
+
+        # Scoring, untimed. Splitter boundaries against the reference ones:
+        gold_spans = reference_spans(text, ends)
+        spans = processor.splitter.span_tokenize(text)
+        gold_ends, ends = _ends(text, gold_spans), _ends(text, spans)
+        counts['sentences'] += len(gold_spans)
+        counts['split_hits'] += len(gold_ends & ends)
+        counts['split_predicted'] += len(ends)
+        counts['split_gold'] += len(gold_ends)
+
+        # Walk boundaries against where each walk leaves its reference sentence
+        sentence_gold = gold_sentence_map(text, kept, gold_spans)
+        node_golds = {}
+
+        def node_gold(node):
+            if node not in node_golds:
+                node_golds[node] = set().union(*(sentence_gold[i] for i in node_sentence_ids(kg, node)))
+            return node_golds[node]
+
+        trace = WalkTrace(kg, nodes, config['max_depth'], window_size=config['window'])
+        for (node, path, entropies), target in zip(walks, walk_targets(trace, node_gold)):
+            hit = len(entropies) == len(path) and detector.is_boundary(entropies[-1], len(path))
+            counts['walkers'] += 1
+            counts['predicted'] += hit
+            counts['gold'] += target is not None
+            counts['hits'] += hit and target is not None and abs(len(entropies) - target) <= tolerance
+
+    elapsed = sum(seconds.values())
+    split_p, split_r, split_f1 = _scores(counts['split_hits'], counts['split_predicted'], counts['split_gold'])
+    precision, recall, f1 = _scores(counts['hits'], counts['predicted'], counts['gold'])
+    peak_mb = peak_rss_mb()
+    # get_splitter and the NLTK tagger fall back when NLTK data is missing
+    used = [processor.splitter.tier]
+    extractor = builder.extractor
+    if hasattr(extractor, 'processor'):
+        used.append(extractor.processor.active_tagger)
+    return {
+        'sentences': counts['sentences'],
+        'walkers': counts['walkers'],
+        'split_precision': round(split_p, 4),
+        'split_recall': round(split_r, 4),
+        'split_f1': round(split_f1, 4),
+        'precision': round(precision, 4),
+        'recall': round(recall, 4),
+        'f1': round(f1, 4),
+        'seconds': round(elapsed, 3),
+        'traverse_seconds': round(seconds['traverse'], 3),
+        'sentences_per_sec': round(counts['sentences'] / elapsed, 1) if elapsed else float('inf'),
+        'peak_mb': round(peak_mb, 1) if peak_mb is not None else None,
+        'added_mb': round(peak_mb - baseline_mb, 1) if peak_mb is not None else None,
+        'used': '/'.join(used),
+    }
+
+
+def config_name(config):
+    return f"{config['splitter']} / {config['backend']} / {config['traversal']} / t={config['threshold']}"
+
+
+def configurations(splitters, backends, traversals, thresholds, max_depth=10,
+                   alpha=0.4, beta=0.4, gamma=0.2, window=3):
+    return [{'splitter': splitter, 'backend': backend, 'traversal': traversal, 'threshold': threshold,
+             'max_depth': max_depth, 'alpha': alpha, 'beta': beta, 'gamma': gamma, 'window': window}
+            for splitter, backend, traversal, threshold
+            in itertools.product(splitters, backends, traversals, thresholds)]
+
+
+def evaluate(configs, texts, references, tolerance=0, isolate=True):
+    # isolate runs each configuration in its own spawned process, one at a
+    # time so timings don't compete; otherwise peak memory is the process's
+    from benchmarks import _error_line
+    rows = []
+    for config in configs:
+        row = {'config': config_name(config)}
+        try:
+            if isolate:
+                with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context('spawn')) as pool:
+                    row.update(pool.submit(run_config, config, texts, references, tolerance).result())
+            else:
+                row.update(run_config(config, texts, references, tolerance))
+        except Exception as e:
+            row['error'] = _error_line(e)
+        rows.append(row)
+    return rows
+
+
+def pareto_front(rows, maximize=('f1', 'sentences_per_sec'), minimize=('peak_mb',)):
+    # A row is on the front if no other row is at least as good on every
+    # objective and better on one
+    scored = [row for row in rows if 'error' not in row]
+
+    def objectives(row):
+        return [row[key] for key in maximize] + [-(row[key] or 0) for key in minimize]
+
+    front = []
+    for row in scored:
+        mine = objectives(row)
+        dominated = any(all(a >= b for a, b in zip(other, mine)) and other != mine
+                        for other in map(objectives, scored))
+        if not dominated:
+            front.append(row)
+    return front
+
+
+def pareto_table(rows):
+    import pandas as pd
+    front = {id(row) for row in pareto_front(rows)}
+    df = pd.DataFrame([dict(row, pareto=id(row) in front) for row in rows])
+    if 'f1' in df:
+        df = df.sort_values(['pareto', 'f1', 'sentences_per_sec'], ascending=False, na_position='last')
+    return df
+
+
+def main():
+    from benchmarks import load_chapters
+    from extraction import EXTRACTORS
+    from sentence_splitter import SentenceSplitter
+
+    parser = argparse.ArgumentParser(description="Accuracy vs throughput of pipeline configurations "
+                                                 "against reference sentence boundaries")
+    parser.add_argument('--chapters', type=int, default=3, help="At most the 30 the reference covers")
+    parser.add_argument('--splitters', nargs='+', default=list(SentenceSplitter.TIERS),
+                        choices=list(SentenceSplitter.TIERS))
+    parser.add_argument('--backends', nargs='+', default=['nltk', 'lookup'], choices=list(EXTRACTORS))
+    parser.add_argument('--traversals', nargs='+', default=['vectorized', 'memo'], choices=list(TRAVERSALS))
+    parser.add_argument('--thresholds', nargs='+', type=float, default=[0.8])
+    parser.add_argument('--max-depth', type=int, default=10)
+    parser.add_argument('--alpha', type=float, default=0.4)
+    parser.add_argument('--beta', type=float, default=0.4)
+    parser.add_argument('--gamma', type=float, default=0.2)
+    parser.add_argument('--window', type=int, default=3)
+    parser.add_argument('--tolerance', type=int, default=0,
+                        help="Walk steps a boundary may be off by and still count")
+    parser.add_argument('--in-process', action='store_true',
+                        help="Run every configuration in this process (peak memory is then shared)")
+    parser.add_argument('--front-only', action='store_true')
+    parser.add_argument('--out', help="Also write the table to this CSV file")
+    args = parser.parse_args()
+
+    configs = configurations(args.splitters, args.backends, args.traversals, args.thresholds, args.max_depth,
+                             args.alpha, args.beta, args.gamma, args.window)
+    texts = load_chapters(args.chapters, CSV_PATH)
+    rows = evaluate(configs, texts, load_reference(texts), args.tolerance, not args.in_process)
+    df = pareto_table(rows)
+    if args.front_only and 'pareto' in df:
+        df = df[df['pareto']]
+    print(df.to_string(index=False))
+    if args.out:
+        df.to_csv(args.out, index=False)
+
+
+if __name__ == "__main__":
+    main()
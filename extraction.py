@@ -0,0 +1,100 @@
+from functools import lru_cache
+from nlp_utils import DocumentAnalysis, TextProcessor
+
+SPACY_MODEL = 'en_core_web_sm'
+# Only the parser and the tagger (for PTB tags in the fallback) are needed
+SPACY_DISABLED = ['ner', 'lemmatizer', 'textcat', 'entity_ruler', 'senter']
+
+SUBJECT_DEPS = {'nsubj', 'nsubjpass', 'csubj'}
+OBJECT_DEPS = {'dobj', 'obj', 'attr', 'dative', 'oprd', 'acomp'}
+PREP_OBJECT_DEPS = {'pobj'}
+
+
+@lru_cache(maxsize=None)
+def load_spacy_model(model=SPACY_MODEL):
+    import spacy
+    return spacy.load(model, disable=SPACY_DISABLED)
+
+
+class NLTKExtractor:
+    name = 'nltk'
+
+    def __init__(self, tagger='perceptron'):
+        self.processor = TextProcessor(tagger=tagger)
+
+    def iter_extract(self, sentences):
+        for sent in sentences:
+            yield self.processor.extract_svo_triplets(sent)
+
+    def analyze(self, sentences):
+        return DocumentAnalysis(sentences, self.processor)
+
+
+class LookupExtractor(NLTKExtractor):
+    name = 'lookup'
+
+    def __init__(self):
+        super().__init__(tagger='lookup')
+
+
+class SpacyExtractor:
+    name = 'spacy'
+
+    def __init__(self, model=SPACY_MODEL, batch_size=256, n_process=1, max_triplets=3):
+        self.nlp = load_spacy_model(model)
+        self.batch_size = batch_size
+        self.n_process = n_process
+        self.max_triplets = max_triplets
+        self.processor = TextProcessor()
+
+    def iter_extract(self, sentences):
+        docs = self.nlp.pipe(sentences, batch_size=self.batch_size, n_process=self.n_process)
+        for doc in docs:
+            yield self.triplets_from_doc(doc)
+
+    def triplets_from_doc(self, doc):
+        triplets = []
+        for token in doc:
+            if token.dep_ not in SUBJECT_DEPS:
+                continue
+            verb = token.head
+            for subj in self._expand_conjuncts(token):
+                for obj in self._objects(verb):
+                    if subj.lower_ != obj.lower_:
+                        triplet = (subj.lower_, verb.lower_, obj.lower_)
+                        if triplet not in triplets:
+                            triplets.append(triplet)
+
+        if not triplets:
+            # Same heuristic fallback as the NLTK path, on spaCy's PTB tags
+            pos_tags = [(token.lower_, token.tag_) for token in doc]
+            triplets = self.processor._simple_extraction(pos_tags)
+
+        return triplets[:self.max_triplets]
+
+    def _objects(self, verb):
+        objects = []
+        for child in verb.children:
+            if child.dep_ in OBJECT_DEPS:
+                objects.extend(self._expand_conjuncts(child))
+            elif child.dep_ in ('prep', 'agent'):
+                for grandchild in child.children:
+                    if grandchild.dep_ in PREP_OBJECT_DEPS:
+                        objects.extend(self._expand_conjuncts(grandchild))
+        return objects
+
+    def _expand_conjuncts(self, token):
+        return [token] + [t for t in token.conjuncts if t.i > token.i]
+
+
+EXTRACTORS = {
+    'nltk': NLTKExtractor,
+    'lookup': LookupExtractor,
+    'spacy': SpacyExtractor,
+}
+
+
+def get_extractor(backend='nltk', **kwargs):
+    if backend not in EXTRACTORS:
+        raise ValueError(f"Unknown extraction backend: {backend}")
+    return EXTRACTORS[backend](**kwargs)
@@ -0,0 +1,77 @@
+import threading
+import weakref
+
+_caches = weakref.WeakKeyDictionary()
+_lock = threading.RLock()
+
+
+class NodeCache(dict):
+    pass
+
+
+class DegreeTable:
+    def __init__(self, kg):
+        self.degrees = dict(kg.degree())
+        self.max = max(self.degrees.values(), default=0)
+
+    def refresh(self, kg, nodes, edges):
+        shrunk = False
+        for node in nodes:
+            old = self.degrees.get(node, 0)
+            if kg.has_node(node):
+                self.degrees[node] = kg.degree(node)
+            else:
+                self.degrees.pop(node, None)
+            shrunk = shrunk or self.degrees.get(node, 0) < old
+        if shrunk:
+            self.max = max(self.degrees.values(), default=0)
+        else:
+            self.max = max([self.max] + [self.degrees[n] for n in nodes if n in self.degrees])
+        return True
+
+
+def get_cached(kg, key, factory):
+    with _lock:
+        cache = _caches.setdefault(kg, {})
+        if key in cache:
+            return cache[key]
+    # Built outside the lock so a slow factory doesn't block other graphs
+    value = factory(kg)
+    with _lock:
+        return _caches.setdefault(kg, {}).setdefault(key, value)
+
+
+def peek_cached(kg, key, default=None):
+    with _lock:
+        return _caches.get(kg, {}).get(key, default)
+
+
+def get_node_cache(kg, name):
+    return get_cached(kg, ('node', name), lambda g: NodeCache())
+
+
+def invalidate(kg, nodes=None, edges=None):
+    # Per-node caches lose only the given nodes; structures with a
+    # refresh(kg, nodes, edges) method update themselves in place (returning
+    # False if they can't); anything else is dropped and rebuilt on next use.
+    with _lock:
+        cache = _caches.get(kg)
+        if not cache:
+            return
+        if nodes is None:
+            _caches.pop(kg, None)
+            return
+        for key, value in list(cache.items()):
+            if isinstance(value, NodeCache):
+                for node in nodes:
+                    value.pop(node, None)
+            elif not (hasattr(value, 'refresh') and value.refresh(kg, nodes, edges or [])):
+                del cache[key]
+
+
+def clear_cache(kg):
+    invalidate(kg)
+
+
+def get_max_degree(kg):
+    return get_cached(kg, 'degrees', DegreeTable).max
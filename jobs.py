@@ -0,0 +1,115 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, name):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.status = 'pending'
+        self.done = 0
+        self.total = 0
+        self.message = ''
+        self.result = None
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self._partial = []
+        self._lock = threading.Lock()
+        self._cancel_event = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'cancelled', 'failed')
+
+    @property
+    def progress(self):
+        if self.status == 'done':
+            return 1.0
+        return self.done / self.total if self.total else 0.0
+
+    @property
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise JobCancelled(self.name)
+
+    def report(self, done=None, total=None, message=None, partial=None):
+        # Called from the worker thread; doubles as the cancellation point
+        with self._lock:
+            if done is not None:
+                self.done = done
+            if total is not None:
+                self.total = total
+            if message is not None:
+                self.message = message
+            if partial:
+                self._partial.extend(partial)
+        self.check_cancelled()
+
+    def partial_results(self):
+        with self._lock:
+            return list(self._partial)
+
+    def _run(self, fn, args, kwargs):
+        self.status = 'running'
+        self.started_at = time.time()
+        try:
+            self.check_cancelled()
+            self.result = fn(self, *args, **kwargs)
+            self.status = 'done'
+        except JobCancelled:
+            self.status = 'cancelled'
+        except Exception as e:
+            self.error = e
+            self.status = 'failed'
+        finally:
+            self.finished_at = time.time()
+
+
+class JobRunner:
+    def __init__(self, max_workers=2):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='kg-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, name, fn, *args, **kwargs):
+        job = Job(name)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._executor.submit(job._run, fn, args, kwargs)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def active_jobs(self):
+        with self._lock:
+            return [job for job in self._jobs.values() if not job.finished]
+
+    def forget(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def shutdown(self):
+        for job in self.active_jobs():
+            job.cancel()
+        self._executor.shutdown(wait=False)
@@ -1,33 +1,183 @@
 import networkx as nx
 from nlp_utils import TextProcessor
+from extraction import get_extractor
+from graph_cache import get_cached, invalidate
+from normalization import get_normalizer, is_placeholder
+from offset_index import OffsetIndex, triplet_occurrences
+
+def copy_graph(kg):
+    # kg.copy() shares the graph's sentence list, offset index and each edge's
+    # relations / sentence_ids, so appending to it would change kg as well
+    copy = kg.copy()
+    copy.graph['sentences'] = list(kg.graph.get('sentences', []))
+    if 'offsets' in kg.graph:
+        copy.graph['offsets'] = kg.graph['offsets'].copy()
+    for _, _, data in copy.edges(data=True):
+        if 'relations' in data:
+            data['relations'] = dict(data['relations'])
+        if 'sentence_ids' in data:
+            data['sentence_ids'] = list(data['sentence_ids'])
+    return copy
+
 
 class KnowledgeGraphBuilder:
-    def __init__(self):
+    def __init__(self, backend='nltk', normalize=True, **backend_options):
         self.processor = TextProcessor()
+        self.normalizer = get_normalizer() if normalize else None
+        self.extractor = get_extractor(backend, **backend_options)
         
-    def build_from_sentences(self, sentences):
-        kg = nx.DiGraph()
-        
-        for i, sent in enumerate(sentences):
-            triplets = self.processor.extract_svo_triplets(sent)
-            self._add_triplets_to_kg(kg, triplets, i)
-            
+    def build_from_sentences(self, sentences, progress=None, text=None, spans=None):
+        # text and spans (from TextProcessor.extract_sentence_spans) let the
+        # offset index point into the source text as well as the sentences
+        kg = nx.DiGraph(sentences=[])
+        document = self.analyze(sentences)
+        self.apply_triplets(kg, sentences, self.extract_triplets(sentences, progress, document), text, spans)
+        if document is not None:
+            # Entities and similarity over the graph's sentences reuse these tags
+            get_cached(kg, 'document_analysis', lambda g: document)
         return kg
     
+    def analyze(self, sentences):
+        # DocumentAnalysis of the sentences for backends that tag with
+        # TextProcessor (nltk, lookup); None for the others
+        analyze = getattr(self.extractor, 'analyze', None)
+        return analyze(sentences) if analyze is not None else None
+    
+    def extract_triplets(self, sentences, progress=None, document=None):
+        triplets = []
+        extracted = document.iter_triplets() if document is not None else self.extractor.iter_extract(sentences)
+        for i, sent_triplets in enumerate(extracted):
+            triplets.append(sent_triplets)
+            if progress:
+                progress(i + 1, len(sentences))
+        return triplets
+    
+    def new_sentences(self, kg, sentences):
+        ingested = kg.graph.get('sentences', [])
+        if list(sentences[:len(ingested)]) != ingested:
+            raise ValueError("Text no longer starts with the ingested sentences; rebuild the graph instead")
+        return list(sentences[len(ingested):])
+    
+    def append_sentences(self, kg, sentences, progress=None, text=None, spans=None):
+        new = self.new_sentences(kg, sentences)
+        if spans is not None:
+            spans = spans[len(spans) - len(new):]
+        self.apply_triplets(kg, new, self.extract_triplets(new, progress), text, spans)
+        return new
+    
+    def apply_triplets(self, kg, sentences, triplets, text=None, spans=None):
+        # Sentence ids continue from the sentences already in the graph. Each
+        # node and edge occurrence is recorded in the graph's offset index;
+        # with the source text (and spans, else they're searched for) it also
+        # gets offsets into that text.
+        ingested = kg.graph.setdefault('sentences', [])
+        index = kg.graph.setdefault('offsets', OffsetIndex())
+        first = len(ingested)
+        touched, new_edges = set(), []
+        for sent, raw_triplets in zip(sentences, triplets):
+            sent_id = len(ingested)
+            sent_triplets = self.normalize_triplets(raw_triplets, sent_id)
+            self._add_triplets_to_kg(kg, sent_triplets, sent_id)
+            ingested.append(sent)
+            index.add_sentence(sent_id, triplet_occurrences(
+                sent, raw_triplets, sent_triplets, lambda word: self._entity(word, sent_id)))
+            for subj, _, obj in sent_triplets:
+                touched.update((subj, obj))
+                new_edges.append((subj, obj))
+        if text is not None:
+            if spans is not None:
+                index.attach_source(text, spans, first)
+            else:
+                index.locate(text, ingested, first)
+        invalidate(kg, self._affected_nodes(kg, touched), new_edges)
+        return touched
+    
+    def _entity(self, word, sent_id):
+        return self.normalizer.entity(word, sent_id) if self.normalizer is not None else word
+    
+    def normalize_triplets(self, triplets, sent_id):
+        if self.normalizer is None:
+            return list(triplets)
+        return self.normalizer.triplets(triplets, sent_id)
+    
+    def add_sentence(self, kg, triplets, sent_id):
+        triplets = self.normalize_triplets(triplets, sent_id)
+        self._add_triplets_to_kg(kg, triplets, sent_id)
+        touched = {node for subj, _, obj in triplets for node in (subj, obj)}
+        invalidate(kg, self._affected_nodes(kg, touched), [(s, o) for s, _, o in triplets])
+        return triplets
+    
+    def remove_sentence(self, kg, triplets, sent_id):
+        # Undo add_sentence (given the same raw triplets): an edge survives while
+        # another sentence still asserts it, and nodes go once no edge touches them
+        triplets = self.normalize_triplets(triplets, sent_id)
+        touched = {node for subj, _, obj in triplets for node in (subj, obj)}
+        affected = self._affected_nodes(kg, touched)
+        removed = []
+        for subj, verb, obj in triplets:
+            if kg.has_edge(subj, obj):
+                self._remove_relation(kg, subj, obj, verb, sent_id)
+                if not kg.has_edge(subj, obj):
+                    removed.append((subj, obj))
+            for node in (subj, obj):
+                if kg.has_node(node) and kg.degree(node) == 0:
+                    kg.remove_node(node)
+        # Removed edges let cached structures tell a removal from an append
+        invalidate(kg, affected, removed)
+    
+    def _affected_nodes(self, kg, touched):
+        # Clustering of a node depends on edges between its neighbours, so the
+        # neighbours of every touched node are affected as well
+        affected = set(touched)
+        for node in touched:
+            if kg.has_node(node):
+                affected.update(kg.predecessors(node))
+                affected.update(kg.successors(node))
+        return affected
+    
     def _add_triplets_to_kg(self, kg, triplets, sent_id):
         for subj, verb, obj in triplets:
             if not kg.has_node(subj):
-                kg.add_node(subj, sentence_id=sent_id, node_type='entity')
+                kg.add_node(subj, sentence_id=sent_id, node_type=self._node_type(subj))
             if not kg.has_node(obj):
-                kg.add_node(obj, sentence_id=sent_id, node_type='entity')
-                
-            kg.add_edge(subj, obj, relation=verb, sentence_id=sent_id)
+                kg.add_node(obj, sentence_id=sent_id, node_type=self._node_type(obj))
+            
+            if kg.has_edge(subj, obj):
+                data = kg[subj][obj]
+                relations = data['relations']
+                relations[verb] = relations.get(verb, 0) + 1
+                data['sentence_ids'].append(sent_id)
+                if relations[verb] > relations[data['relation']]:
+                    data['relation'] = verb
+            else:
+                # relation/sentence_id stay as the dominant relation and first
+                # sentence for code that reads a single value
+                kg.add_edge(subj, obj, relation=verb, sentence_id=sent_id,
+                            relations={verb: 1}, sentence_ids=[sent_id])
+    
+    def _remove_relation(self, kg, subj, obj, verb, sent_id):
+        data = kg[subj][obj]
+        relations, sentence_ids = data['relations'], data['sentence_ids']
+        if verb not in relations or sent_id not in sentence_ids:
+            return
+        sentence_ids.remove(sent_id)
+        relations[verb] -= 1
+        if relations[verb] == 0:
+            del relations[verb]
+        if not relations:
+            kg.remove_edge(subj, obj)
+            return
+        data['relation'] = max(relations, key=relations.get)
+        data['sentence_id'] = sentence_ids[0]
+    
+    def _node_type(self, node):
+        return 'placeholder' if is_placeholder(node) else 'entity'
     
     def get_sentence_nodes(self, kg, sent_id):
         return [n for n, d in kg.nodes(data=True) if d.get('sentence_id') == sent_id]
     
     def get_sentence_edges(self, kg, sent_id):
-        return [(u, v) for u, v, d in kg.edges(data=True) if d.get('sentence_id') == sent_id]
+        return [(u, v) for u, v, ids in kg.edges(data='sentence_ids', default=()) if sent_id in ids]
     
     def get_node_neighbors(self, kg, node):
         predecessors = list(kg.predecessors(node))
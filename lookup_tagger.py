@@ -0,0 +1,283 @@
+import argparse
+import json
+import os
+import re
+import time
+import zlib
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+TABLE_PATH = "src/pos_lookup.bin"
+CSV_PATH = "src/war_and_peace_full_chapters.csv"
+MAGIC = b'POSLKUP1'
+# The last chapters are never built into a table, so accuracy is measured on
+# unseen text
+HELD_OUT_CHAPTERS = 20
+
+TOKEN = re.compile(r"[A-Za-z]+(?=n't\b)|n't\b|'(?:s|re|ve|ll|d|m)\b|\w+(?:[-'’]\w+)*|\.\.\.|[^\w\s]")
+NUMBER = re.compile(r'^[\d.,:/-]*\d[\d.,:/-]*$')
+
+PUNCTUATION = {
+    '.': '.', '!': '.', '?': '.', ',': ',', ';': ':', ':': ':', '...': ':', '-': ':', '—': ':',
+    '(': '(', '[': '(', ')': ')', ']': ')', '"': "''", '“': '``', '”': "''", "'": "''", '‘': '``',
+    '’': "''", '$': '$', '#': '#',
+}
+
+# Closed-class words and very common verbs, so the tagger is usable without a
+# trained table; a table built from a corpus overrides these
+BUILTIN_WORDS = {
+    **dict.fromkeys(['the', 'a', 'an', 'this', 'that', 'these', 'those', 'each', 'every', 'no',
+                     'some', 'any', 'all', 'another', 'either', 'neither'], 'DT'),
+    **dict.fromkeys(['i', 'you', 'he', 'she', 'it', 'we', 'they', 'me', 'him', 'us', 'them',
+                     'himself', 'herself', 'itself', 'myself', 'yourself', 'themselves',
+                     'ourselves', 'one'], 'PRP'),
+    **dict.fromkeys(['my', 'your', 'his', 'her', 'its', 'our', 'their'], 'PRP$'),
+    **dict.fromkeys(['in', 'on', 'at', 'of', 'by', 'with', 'from', 'for', 'about', 'into', 'over',
+                     'under', 'after', 'before', 'between', 'through', 'during', 'without',
+                     'against', 'among', 'upon', 'towards', 'toward', 'near', 'since', 'until',
+                     'because', 'if', 'though', 'although', 'while', 'as', 'than', 'whether',
+                     'behind', 'beside', 'across', 'along', 'around', 'beyond', 'within'], 'IN'),
+    **dict.fromkeys(['and', 'or', 'but', 'nor', 'yet'], 'CC'),
+    **dict.fromkeys(['can', 'could', 'will', 'would', 'shall', 'should', 'may', 'might', 'must',
+                     "'ll", 'ca', 'wo'], 'MD'),
+    **dict.fromkeys(['who', 'whom', 'what'], 'WP'),
+    **dict.fromkeys(['which', 'whatever'], 'WDT'),
+    **dict.fromkeys(['when', 'where', 'why', 'how'], 'WRB'),
+    **dict.fromkeys(['not', "n't", 'never', 'very', 'too', 'also', 'so', 'then', 'now', 'here',
+                     'again', 'always', 'only', 'just', 'still', 'already', 'even',
+                     'often', 'once', 'ever', 'soon', 'perhaps', 'quite', 'almost', 'away',
+                     'back', 'together'], 'RB'),
+    **dict.fromkeys(['is', "'s", 'has', 'does', 'says', 'goes'], 'VBZ'),
+    **dict.fromkeys(['am', 'are', "'re", "'m", 'have', "'ve", 'do'], 'VBP'),
+    **dict.fromkeys(['was', 'were', 'had', "'d", 'did', 'said', 'went', 'came', 'saw', 'made',
+                     'took', 'knew', 'thought', 'told', 'felt', 'gave', 'began', 'looked',
+                     'asked', 'replied', 'left', 'got', 'stood', 'sat'], 'VBD'),
+    **dict.fromkeys(['be', 'go', 'come', 'see', 'make', 'take', 'know', 'think', 'tell', 'give',
+                     'get', 'say'], 'VB'),
+    **dict.fromkeys(['been', 'done', 'gone', 'seen', 'known', 'taken', 'given'], 'VBN'),
+    **dict.fromkeys(['being', 'having', 'doing'], 'VBG'),
+    **dict.fromkeys(['to'], 'TO'),
+    **dict.fromkeys(['there'], 'EX'),
+    **dict.fromkeys(['many', 'much', 'more', 'most', 'other', 'such', 'own', 'same', 'good',
+                     'old', 'young', 'great', 'little', 'first', 'last', 'new'], 'JJ'),
+    **dict.fromkeys(['oh', 'ah', 'yes', 'well'], 'UH'),
+}
+
+BUILTIN_SUFFIXES = {
+    'ing': 'VBG', 'ed': 'VBN', 'ly': 'RB', 'ous': 'JJ', 'ful': 'JJ', 'ble': 'JJ', 'ive': 'JJ',
+    'al': 'JJ', 'ic': 'JJ', 'less': 'JJ', 'est': 'JJS', 'tion': 'NN', 'sion': 'NN', 'ness': 'NN',
+    'ment': 'NN', 'ity': 'NN', 'ism': 'NN', 'ist': 'NN', 'ship': 'NN', 'ers': 'NNS', 'ies': 'NNS',
+    'es': 'NNS', 's': 'NNS',
+}
+
+NOMINAL_PREVIOUS = {'DT', 'PRP$', 'JJ', 'POS'}
+
+
+class LookupTable:
+    def __init__(self, words=None, suffixes=None, max_suffix=4):
+        self.words = dict(BUILTIN_WORDS)
+        self.words.update(words or {})
+        self.suffixes = dict(BUILTIN_SUFFIXES)
+        self.suffixes.update(suffixes or {})
+        self.max_suffix = max(max_suffix, max(len(s) for s in self.suffixes))
+
+
+def build_table(tagged_sents, max_suffix=4, min_suffix_count=10):
+    word_tags = defaultdict(Counter)
+    suffix_tags = defaultdict(Counter)
+    for sent in tagged_sents:
+        for word, tag in sent:
+            word = word.lower()
+            word_tags[word][tag] += 1
+            for n in range(1, min(max_suffix, len(word) - 2) + 1):
+                suffix_tags[word[-n:]][tag] += 1
+
+    suffixes = {suffix: tags.most_common(1)[0][0] for suffix, tags in suffix_tags.items()
+                if sum(tags.values()) >= min_suffix_count}
+    table = LookupTable(suffixes=suffixes, max_suffix=max_suffix)
+    words = {}
+    for word, tags in word_tags.items():
+        tag = tags.most_common(1)[0][0]
+        # Words the suffix rules already get right don't need an entry
+        if word in BUILTIN_WORDS or _guess(word, table) != tag:
+            words[word] = tag
+    table.words = {**BUILTIN_WORDS, **words}
+    return table
+
+
+def save_table(table, path=TABLE_PATH):
+    tags = sorted(set(table.words.values()) | set(table.suffixes.values()))
+    index = {tag: i for i, tag in enumerate(tags)}
+    payload = {
+        'tags': tags,
+        'max_suffix': table.max_suffix,
+        'words': {word: index[tag] for word, tag in table.words.items()},
+        'suffixes': {suffix: index[tag] for suffix, tag in table.suffixes.items()},
+    }
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC + zlib.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'), 9))
+    os.replace(tmp_path, path)
+
+
+def load_table(path=TABLE_PATH):
+    with open(path, 'rb') as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path} is not a lookup tagger table")
+    payload = json.loads(zlib.decompress(data[len(MAGIC):]).decode('utf-8'))
+    tags = payload['tags']
+    return LookupTable(words={word: tags[i] for word, i in payload['words'].items()},
+                       suffixes={suffix: tags[i] for suffix, i in payload['suffixes'].items()},
+                       max_suffix=payload['max_suffix'])
+
+
+def _guess(word, table):
+    if word in PUNCTUATION:
+        return PUNCTUATION[word]
+    if NUMBER.match(word):
+        return 'CD'
+    for n in range(min(table.max_suffix, len(word) - 2), 0, -1):
+        tag = table.suffixes.get(word[-n:])
+        if tag:
+            return tag
+    return 'NN'
+
+
+class LookupTagger:
+    def __init__(self, path=TABLE_PATH):
+        # Without a built table the tagger still runs on the built-in lexicon
+        self.table = load_table(path) if os.path.exists(path) else LookupTable()
+        self.trained = os.path.exists(path)
+
+    def tokenize(self, text):
+        return TOKEN.findall(text)
+
+    def tag(self, tokens):
+        words = self.table.words
+        tagged = []
+        prev = None
+        for i, token in enumerate(tokens):
+            lower = token.lower()
+            tag = words.get(lower)
+            if tag is None:
+                if i > 0 and token[:1].isupper():
+                    tag = 'NNPS' if lower.endswith('s') and len(lower) > 3 else 'NNP'
+                else:
+                    tag = _guess(lower, self.table)
+            # Two cheap context fixes: nouns after "to"/modals are verbs, and
+            # bare verbs after determiners/adjectives are nouns
+            if prev in ('TO', 'MD') and tag in ('NN', 'VBP'):
+                tag = 'VB'
+            elif prev in NOMINAL_PREVIOUS and tag in ('VB', 'VBP'):
+                tag = 'NN'
+            tagged.append((token, tag))
+            prev = tag
+        return tagged
+
+    def tag_word(self, word):
+        # A lowercased word's tag out of context
+        return self.table.words.get(word) or _guess(word, self.table)
+
+    def tag_text(self, text):
+        return self.tag(self.tokenize(text))
+
+
+@lru_cache(maxsize=None)
+def get_lookup_tagger(path=TABLE_PATH):
+    return LookupTagger(path)
+
+
+def evaluate(tag_fn, tagged_sents):
+    correct = total = 0
+    start = time.perf_counter()
+    predictions = [tag_fn([word for word, _ in sent]) for sent in tagged_sents]
+    elapsed = time.perf_counter() - start
+    for sent, predicted in zip(tagged_sents, predictions):
+        for (_, gold), (_, tag) in zip(sent, predicted):
+            correct += gold == tag
+            total += 1
+    return {
+        'tokens': total,
+        'accuracy': round(correct / total, 4) if total else 0.0,
+        'seconds': round(elapsed, 3),
+        'tokens_per_sec': round(total / elapsed, 1) if elapsed else float('inf'),
+    }
+
+
+def load_corpus():
+    # Penn Treebank tags, the same tagset as the perceptron tagger
+    from nltk.corpus import treebank
+    return [[(word, tag) for word, tag in sent if tag != '-NONE-'] for sent in treebank.tagged_sents()]
+
+
+def _pattern_tag(tokens):
+    # textblob's Brill lexicon tagger: Penn tags, no downloaded data needed.
+    # textblob is optional (not in requirements.txt), like the NLTK data the
+    # perceptron needs
+    try:
+        from textblob.en import parser
+    except ImportError:
+        raise ImportError("The pattern reference tagger needs textblob (pip install textblob)")
+    return [(word, tag) for word, tag in parser.find_tags(tokens)]
+
+
+def _perceptron_tag(tokens):
+    from nltk.tag import pos_tag
+    return pos_tag(tokens)
+
+
+REFERENCE_TAGGERS = {
+    'perceptron': _perceptron_tag,
+    'pattern': _pattern_tag,
+}
+
+
+def tag_chapters(texts, reference='perceptron'):
+    # Chapters tagged by a reference tagger, in this tagger's tokenization:
+    # a silver-standard corpus where no gold one is available
+    from sentence_splitter import get_splitter
+    splitter = get_splitter('regex')
+    tag_fn = REFERENCE_TAGGERS[reference]
+    tokenized = (TOKEN.findall(sentence) for text in texts for sentence in splitter.split(text))
+    return [tag_fn(tokens) for tokens in tokenized if tokens]
+
+
+def training_chapters(csv_path=CSV_PATH):
+    # (training, held-out) chapter texts
+    import pandas as pd
+    texts = pd.read_csv(csv_path)['text'].tolist()
+    return texts[:-HELD_OUT_CHAPTERS], texts[-HELD_OUT_CHAPTERS:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=f"Build the lookup tagger table ({TABLE_PATH})")
+    parser.add_argument('--source', choices=['treebank', 'chapters'], default='treebank',
+                        help="Gold-tagged NLTK treebank sample, or War and Peace chapters tagged by --reference")
+    parser.add_argument('--reference', choices=list(REFERENCE_TAGGERS), default='perceptron')
+    parser.add_argument('--chapters', type=int, help="Chapters to build from (default: all but the held-out ones)")
+    parser.add_argument('--holdout', type=float, default=0.1, help="Treebank share kept out to measure accuracy")
+    args = parser.parse_args()
+
+    if args.source == 'treebank':
+        corpus = load_corpus()
+        split = int(len(corpus) * (1 - args.holdout))
+        sents, gold = corpus[:split], corpus[split:]
+    else:
+        train, held_out = training_chapters()
+        sents = tag_chapters(train[:args.chapters], args.reference)
+        gold = tag_chapters(held_out, args.reference)
+    table = build_table(sents)
+    save_table(table)
+    tagger = LookupTagger()
+    scores = evaluate(tagger.tag, gold)
+    print(f"Built lookup table from {len(sents)} sentences ({args.source}): {TABLE_PATH} "
+          f"({os.path.getsize(TABLE_PATH) / 1024:.1f} KB, {len(table.words)} words, "
+          f"{len(table.suffixes)} suffixes)")
+    print(f"Held-out accuracy: {scores['accuracy']} on {scores['tokens']} tokens "
+          f"({scores['tokens_per_sec']} tokens/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,13 @@
 import re
 import nltk
+import numpy as np
+from scipy import sparse
 from nltk.tokenize import word_tokenize
 from nltk.tag import pos_tag
 from collections import defaultdict
+from sentence_splitter import get_splitter, normalize_whitespace
+from lookup_tagger import get_lookup_tagger
+from graph_cache import get_cached
 
 nltk.download('punkt_tab')
 def download_nltk_data():
@@ -24,19 +29,55 @@ def download_nltk_data():
 
 download_nltk_data()
 
+# Set once NLTK's tokenizer or tagger data turns out to be missing, so later
+# sentences go straight to the lookup tagger instead of retrying
+_nltk_data_missing = False
+
 class TextProcessor:
-    def __init__(self):
+    TAGGERS = {
+        'perceptron': 'NLTK averaged perceptron',
+        'lookup': 'Lookup table (fast)',
+    }
+    
+    def __init__(self, splitter='punkt', tagger='perceptron'):
+        if tagger not in self.TAGGERS:
+            raise ValueError(f"Unknown tagger: {tagger}")
+        self.splitter = get_splitter(splitter)
+        self.tagger = tagger
         self.verbs = {'VB', 'VBD', 'VBG', 'VBN', 'VBP', 'VBZ'}
         self.nouns = {'NN', 'NNS', 'NNP', 'NNPS', 'PRP', 'PRP', 'PRP$', 'WP', 'WP$'}
     
     def extract_svo_triplets(self, sentence):
+        return self.analyze_sentence(sentence).triplets
+    
+    def analyze_sentence(self, sentence):
+        # The one tagging pass: of the lowercased sentence, as triplet
+        # extraction always has (graph nodes are lowercase)
+        return SentenceAnalysis(self, sentence, self.tag_sentence(sentence.lower()))
+    
+    @property
+    def active_tagger(self):
+        # The tagger actually in use: the perceptron falls back to the lookup
+        # tagger when NLTK data is missing
+        return 'lookup' if _nltk_data_missing else self.tagger
+    
+    def tag_sentence(self, sentence):
+        global _nltk_data_missing
+        if self.active_tagger == 'lookup':
+            return get_lookup_tagger().tag_text(sentence)
         try:
-            tokens = word_tokenize(sentence.lower())
+            tokens = word_tokenize(sentence)
             pos_tags = pos_tag(tokens)
-        except:
-            tokens = sentence.lower().split()
-            pos_tags = [(token, 'NN') for token in tokens]
-        
+        except LookupError:
+            # Missing NLTK data: use the lookup tagger rather than tagging
+            # every token as a noun
+            _nltk_data_missing = True
+            pos_tags = get_lookup_tagger().tag_text(sentence)
+        except Exception:
+            pos_tags = get_lookup_tagger().tag_text(sentence)
+        return pos_tags
+    
+    def triplets_from_tags(self, pos_tags):
         triplets = []
         
         subj_candidates = self._find_subjects(pos_tags)
@@ -92,126 +133,132 @@ class TextProcessor:
         text = re.sub(r'\s+', ' ', text)
         return text.strip()
     
+    def entities_from_tags(self, pos_tags):
+        return {word.lower() for word, tag in pos_tags if tag in self.nouns}
+    
     def get_sentence_entities(self, sentence):
-        try:
-            tokens = word_tokenize(sentence)
-            pos_tags = pos_tag(tokens)
-        except:
-            tokens = sentence.split()
-            pos_tags = [(token, 'NN') for token in tokens]
-        
-        entities = []
-        for word, tag in pos_tags:
-            if tag in self.nouns:
-                entities.append(word.lower())
-                
-        return list(set(entities))
+        return list(self.analyze_sentence(sentence).entities)
     
     def compute_sentence_similarity(self, sent1, sent2):
-        entities1 = set(self.get_sentence_entities(sent1))
-        entities2 = set(self.get_sentence_entities(sent2))
-        
-        if not entities1 or not entities2:
-            return 0.0
-            
-        intersection = len(entities1 & entities2)
-        union = len(entities1 | entities2)
-        
-        return intersection / union if union > 0 else 0.0
+        return DocumentAnalysis([sent1, sent2], self).similarity(0, 1)
         
     def extract_sentences(self, text):
-        text = re.sub(r'\s+', ' ', text.strip())
-        
-        try:
-            from nltk.tokenize import sent_tokenize
-            sentences = sent_tokenize(text)
-        except:
-            sentences = self._fallback_sentence_split(text)
-        
-        return [s.strip() for s in sentences if len(s.strip()) > 5]
+        return [s.strip() for s in self.split_sentences(text) if len(s.strip()) > 5]
     
-    def _fallback_sentence_split(self, text):
-        sentences = re.split(r'[.!?]+', text)
-        return [s.strip() for s in sentences if s.strip()]
+    def extract_sentence_spans(self, text):
+        # extract_sentences along with each sentence's (start, end) in text
+        sentences, spans = [], []
+        for start, end in self.splitter.span_tokenize(text):
+            sentence = normalize_whitespace(text[start:end])
+            if len(sentence) > 5:
+                sentences.append(sentence)
+                spans.append((start, end))
+        return sentences, spans
     
-    def extract_svo_triplets(self, sentence):
-        tokens = word_tokenize(sentence.lower())
-        pos_tags = pos_tag(tokens)
-        
-        triplets = []
-        
-        subj_candidates = self._find_subjects(pos_tags)
-        verb_candidates = self._find_verbs(pos_tags)
-        obj_candidates = self._find_objects(pos_tags)
-        
-        for subj in subj_candidates:
-            for verb in verb_candidates:
-                for obj in obj_candidates:
-                    if subj != obj:
-                        triplets.append((subj, verb, obj))
-        
-        if not triplets:
-            triplets = self._simple_extraction(pos_tags)
-            
-        return triplets[:3]
+    def split_sentences(self, text):
+        return self.splitter.split(text)
+
+
+def jaccard(entities1, entities2):
+    if not entities1 or not entities2:
+        return 0.0
+    return len(entities1 & entities2) / len(entities1 | entities2)
+
+
+class SentenceAnalysis:
+    # Everything derived from one tagging pass over a sentence
+    __slots__ = ('sentence', 'pos_tags', 'entities', '_processor', '_triplets')
     
-    def _find_subjects(self, pos_tags):
-        subjects = []
-        for i, (word, tag) in enumerate(pos_tags):
-            if tag in self.nouns and i < len(pos_tags) // 2:
-                subjects.append(word)
-        return subjects[:2] if subjects else ['subject']
+    def __init__(self, processor, sentence, pos_tags):
+        self.sentence = sentence
+        self.pos_tags = pos_tags
+        self.entities = frozenset(processor.entities_from_tags(pos_tags))
+        self._processor = processor
+        self._triplets = None
     
-    def _find_verbs(self, pos_tags):
-        verbs = []
-        for word, tag in pos_tags:
-            if tag in self.verbs:
-                verbs.append(word)
-        return verbs[:2] if verbs else ['relates']
+    @property
+    def tokens(self):
+        return [word for word, _ in self.pos_tags]
     
-    def _find_objects(self, pos_tags):
-        objects = []
-        for i, (word, tag) in enumerate(pos_tags):
-            if tag in self.nouns and i > len(pos_tags) // 2:
-                objects.append(word)
-        return objects[:2] if objects else ['object']
+    @property
+    def tags(self):
+        return [tag for _, tag in self.pos_tags]
     
-    def _simple_extraction(self, pos_tags):
-        words = [word for word, tag in pos_tags if tag in self.nouns or tag in self.verbs]
-        
-        if len(words) >= 3:
-            return [(words[0], words[1], words[2])]
-        elif len(words) == 2:
-            return [(words[0], 'relates', words[1])]
-        elif len(words) == 1:
-            return [(words[0], 'exists', 'entity')]
-        else:
-            return [('subject', 'relates', 'object')]
+    @property
+    def triplets(self):
+        if self._triplets is None:
+            self._triplets = self._processor.triplets_from_tags(self.pos_tags)
+        return self._triplets
+
+
+class DocumentAnalysis:
+    def __init__(self, sentences, processor=None):
+        self.processor = processor or TextProcessor()
+        self.sentences = list(sentences)
+        self._analyses = [None] * len(self.sentences)
+        self._entity_matrix = None
+        self._vocabulary = None
     
-    def clean_text(self, text):
-        text = re.sub(r'[^\w\s\.\!\?]', '', text)
-        text = re.sub(r'\s+', ' ', text)
-        return text.strip()
+    def __len__(self):
+        return len(self.sentences)
     
-    def get_sentence_entities(self, sentence):
-        tokens = word_tokenize(sentence)
-        pos_tags = pos_tag(tokens)
-        
-        entities = []
-        for word, tag in pos_tags:
-            if tag in self.nouns:
-                entities.append(word.lower())
-                
-        return list(set(entities))
+    def refresh(self, kg, nodes, edges):
+        # Kept in the graph cache: sentences appended to the graph are
+        # analyzed on first use; any other change drops the analysis
+        sentences = kg.graph.get('sentences', [])
+        if sentences[:len(self.sentences)] != self.sentences:
+            return False
+        new = sentences[len(self.sentences):]
+        if new:
+            self.sentences.extend(new)
+            self._analyses.extend([None] * len(new))
+            self._entity_matrix = self._vocabulary = None
+        return True
     
-    def compute_sentence_similarity(self, sent1, sent2):
-        entities1 = set(self.get_sentence_entities(sent1))
-        entities2 = set(self.get_sentence_entities(sent2))
-        
-        if not entities1 or not entities2:
-            return 0.0
-            
-        intersection = len(entities1 & entities2)
-        union = len(entities1 | entities2)
-        
-        return intersection / union if union > 0 else 0.0
\ No newline at end of file
+    def __getitem__(self, i):
+        if self._analyses[i] is None:
+            self._analyses[i] = self.processor.analyze_sentence(self.sentences[i])
+        return self._analyses[i]
+    
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+    
+    def iter_triplets(self):
+        return (analysis.triplets for analysis in self)
+    
+    def triplets(self):
+        return list(self.iter_triplets())
+    
+    def entity_matrix(self):
+        # Binary sentences x entities incidence matrix
+        if self._entity_matrix is None:
+            vocabulary = {}
+            rows, cols = [], []
+            for i, analysis in enumerate(self):
+                for entity in analysis.entities:
+                    rows.append(i)
+                    cols.append(vocabulary.setdefault(entity, len(vocabulary)))
+            self._vocabulary = vocabulary
+            self._entity_matrix = sparse.csr_matrix(
+                (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+                shape=(len(self), len(vocabulary)))
+        return self._entity_matrix
+    
+    def similarity(self, i, j):
+        return jaccard(self[i].entities, self[j].entities)
+    
+    def similarity_matrix(self):
+        # Jaccard for all pairs: |A & B| from M @ M.T, |A | B| = |A| + |B| - |A & B|.
+        # Only pairs sharing an entity are stored; the rest are 0.
+        m = self.entity_matrix()
+        intersection = (m @ m.T).tocoo()
+        counts = np.asarray(m.sum(axis=1)).ravel()
+        union = counts[intersection.row] + counts[intersection.col] - intersection.data
+        return sparse.csr_matrix((intersection.data / union, (intersection.row, intersection.col)),
+                                 shape=(len(self), len(self)))
+
+
+def get_document_analysis(kg):
+    # The graph's sentences, analyzed; the builder seeds this with the analyses
+    # its triplets came from, so nothing is tagged again
+    return get_cached(kg, 'document_analysis', lambda g: DocumentAnalysis(g.graph.get('sentences', [])))
@@ -0,0 +1,57 @@
+import bisect
+import heapq
+from collections import defaultdict
+from graph_cache import get_cached
+
+
+def _trigrams(text, pad=True):
+    padded = f"  {text} " if pad else text
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NodeSearchIndex:
+    def __init__(self, kg, min_length=3):
+        nodes = [n for n, data in kg.nodes(data=True)
+                 if len(str(n)) >= min_length and data.get('node_type') != 'placeholder']
+        degrees = dict(kg.degree(nodes))
+
+        self.nodes = sorted(nodes, key=lambda n: (-degrees[n], str(n)))
+        self.rank = {node: i for i, node in enumerate(self.nodes)}
+        self._keys = sorted((str(node).lower(), self.rank[node]) for node in self.nodes)
+        self._names = [key for key, _ in self._keys]
+        self._trigrams = defaultdict(list)
+        for name, rank in self._keys:
+            for gram in _trigrams(name):
+                self._trigrams[gram].append(rank)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def search(self, query, limit=20):
+        query = query.strip().lower()
+        if not query:
+            return self.nodes[:limit]
+
+        lo = bisect.bisect_left(self._names, query)
+        hi = bisect.bisect_left(self._names, query + '\uffff')
+        ranks = heapq.nsmallest(limit, (rank for _, rank in self._keys[lo:hi]))
+        results = [self.nodes[r] for r in ranks]
+
+        if len(results) < limit and len(query) >= 3:
+            seen = set(ranks)
+            grams = _trigrams(query, pad=False)
+            hits = defaultdict(int)
+            for gram in grams:
+                for rank in self._trigrams.get(gram, ()):
+                    if rank not in seen:
+                        hits[rank] += 1
+            min_hits = max(1, int(len(grams) * 0.6))
+            fuzzy = heapq.nsmallest(limit - len(results),
+                                    ((-count, rank) for rank, count in hits.items() if count >= min_hits))
+            results.extend(self.nodes[rank] for _, rank in fuzzy)
+
+        return results
+
+
+def get_node_index(kg):
+    return get_cached(kg, 'node_index', NodeSearchIndex)
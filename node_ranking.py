@@ -0,0 +1,121 @@
+import heapq
+import numpy as np
+import scipy.sparse as sp
+from graph_cache import get_cached
+
+
+def node_sentence_ids(kg, node):
+    sent_ids = {kg.nodes[node].get('sentence_id')}
+    for edges in (kg.out_edges(node, data=True), kg.in_edges(node, data=True)):
+        for _, _, data in edges:
+            sent_ids.update(data.get('sentence_ids') or (data.get('sentence_id'),))
+    sent_ids.discard(None)
+    return sent_ids
+
+
+class StartNodeSelector:
+    RANKINGS = {
+        'degree': 'Degree',
+        'pagerank': 'PageRank',
+        'coverage': 'Sentence coverage',
+    }
+
+    def __init__(self, kg, min_length=3):
+        self.kg = kg
+        self.candidates = [n for n, data in kg.nodes(data=True)
+                           if len(str(n)) >= min_length and data.get('node_type') != 'placeholder']
+        self._rankings = {}
+        self._coverage_order = None
+        self._cover_size = 0
+        self.sentence_ids = set()
+        self._node_sentences = {}
+        for node in self.candidates:
+            sent_ids = node_sentence_ids(kg, node)
+            self._node_sentences[node] = sent_ids
+            self.sentence_ids |= sent_ids
+
+    def ranking(self, method='degree'):
+        if method not in self._rankings:
+            if method == 'degree':
+                degrees = dict(self.kg.degree(self.candidates))
+                ranked = sorted(self.candidates, key=lambda n: -degrees[n])
+            elif method == 'pagerank':
+                scores = self.pagerank()
+                ranked = sorted(self.candidates, key=lambda n: -scores[n])
+            elif method == 'coverage':
+                ranked = self._greedy_coverage()
+            else:
+                raise ValueError(f"Unknown ranking method: {method}")
+            self._rankings[method] = ranked
+        return self._rankings[method]
+
+    def top_k(self, k, method='degree'):
+        return self.ranking(method)[:k]
+
+    def covering_set(self):
+        self._greedy_coverage()
+        return self._coverage_order[:self._cover_size]
+
+    def coverage(self, nodes):
+        if not self.sentence_ids:
+            return 0.0
+        covered = set()
+        for node in nodes:
+            covered |= self._node_sentences.get(node, set())
+        return len(covered) / len(self.sentence_ids)
+
+    def pagerank(self, alpha=0.85, tol=1e-6, max_iter=100):
+        nodes = list(self.kg.nodes())
+        n = len(nodes)
+        if n == 0:
+            return {}
+        index = {node: i for i, node in enumerate(nodes)}
+        rows, cols = [], []
+        for u, v in self.kg.edges():
+            rows.append(index[u])
+            cols.append(index[v])
+
+        adjacency = sp.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(n, n))
+        out_degree = np.asarray(adjacency.sum(axis=1)).ravel()
+        dangling = out_degree == 0
+        inv_degree = np.divide(1.0, out_degree, out=np.zeros(n), where=~dangling)
+        transition = (sp.diags(inv_degree) @ adjacency).T.tocsr()
+
+        ranks = np.full(n, 1.0 / n)
+        for _ in range(max_iter):
+            previous = ranks
+            ranks = alpha * (transition @ previous) + (alpha * previous[dangling].sum() + 1 - alpha) / n
+            if np.abs(ranks - previous).sum() < n * tol:
+                break
+
+        return {node: ranks[index[node]] for node in nodes}
+
+    def _greedy_coverage(self):
+        if self._coverage_order is not None:
+            return self._coverage_order
+
+        # Lazy greedy set cover: a node's gain can only shrink as more sentences
+        # are covered, so stale heap entries are re-scored only when popped.
+        degrees = dict(self.kg.degree(self.candidates))
+        heap = [(-len(self._node_sentences[n]), -degrees[n], i, n)
+                for i, n in enumerate(self.candidates)]
+        heapq.heapify(heap)
+        covered = set()
+        order = []
+        while heap:
+            neg_gain, neg_degree, i, node = heapq.heappop(heap)
+            gain = len(self._node_sentences[node] - covered)
+            if gain != -neg_gain:
+                heapq.heappush(heap, (-gain, neg_degree, i, node))
+                continue
+            order.append(node)
+            covered |= self._node_sentences[node]
+            if gain > 0:
+                self._cover_size = len(order)
+
+        self._coverage_order = order
+        return order
+
+
+def get_start_node_selector(kg):
+    return get_cached(kg, 'start_node_selector', StartNodeSelector)
@@ -0,0 +1,131 @@
+import sys
+import threading
+from functools import lru_cache
+from lookup_tagger import get_lookup_tagger
+
+# Fallback names produced by TextProcessor._find_* / _simple_extraction
+PLACEHOLDERS = {'subject', 'object', 'entity'}
+PLACEHOLDER_PREFIX = 'unknown@'
+
+IRREGULAR_NOUNS = {
+    'men': 'man', 'women': 'woman', 'children': 'child', 'people': 'person', 'feet': 'foot',
+    'teeth': 'tooth', 'mice': 'mouse', 'geese': 'goose', 'wives': 'wife', 'lives': 'life',
+    'knives': 'knife', 'wolves': 'wolf', 'halves': 'half', 'selves': 'self', 'leaves': 'leaf',
+}
+IRREGULAR_VERBS = {
+    'is': 'be', 'are': 'be', 'am': 'be', 'was': 'be', 'were': 'be', 'been': 'be', 'being': 'be',
+    "'s": 'be', "'re": 'be', "'m": 'be', 'has': 'have', 'had': 'have', 'having': 'have',
+    "'ve": 'have', "'d": 'have', 'does': 'do', 'did': 'do', 'done': 'do', 'said': 'say',
+    'says': 'say', 'went': 'go', 'gone': 'go', 'goes': 'go', 'came': 'come', 'saw': 'see',
+    'seen': 'see', 'made': 'make', 'took': 'take', 'taken': 'take', 'knew': 'know',
+    'known': 'know', 'thought': 'think', 'told': 'tell', 'felt': 'feel', 'gave': 'give',
+    'given': 'give', 'began': 'begin', 'begun': 'begin', 'got': 'get', 'left': 'leave',
+    'stood': 'stand', 'sat': 'sit', 'found': 'find', 'heard': 'hear', 'held': 'hold',
+    'brought': 'bring', 'kept': 'keep', 'met': 'meet', 'ran': 'run', 'wrote': 'write',
+    'written': 'write', 'spoke': 'speak', 'spoken': 'speak', 'became': 'become', 'fell': 'fall',
+    'fallen': 'fall', 'led': 'lead', 'lay': 'lie', 'lost': 'lose', 'meant': 'mean',
+    'sent': 'send', 'set': 'set', 'put': 'put', 'let': 'let', 'rode': 'ride', 'ridden': 'ride',
+}
+NO_PLURAL_SUFFIXES = ('ss', 'us', 'is', 'as', 'ics', 'ous', "'s")
+# Lookup tagger tags of an -s form that may be stripped, by lemma pos
+PLURAL_TAGS = {'n': {'NNS'}, 'v': {'VBZ', 'NNS'}}
+
+
+@lru_cache(maxsize=None)
+def _wordnet_lemmatizer():
+    try:
+        from nltk.corpus import wordnet
+        from nltk.stem import WordNetLemmatizer
+        wordnet.ensure_loaded()
+        return WordNetLemmatizer()
+    except (LookupError, OSError, ImportError):
+        return None
+
+
+def strip_possessive(word):
+    if word.endswith(("'s", "’s")) and len(word) > 2:
+        return word[:-2]
+    if word.endswith(("s'", "s’")):
+        return word[:-1]
+    return word
+
+
+def rule_lemma(word, pos):
+    # Conservative fallback when WordNet isn't available: irregular forms, and
+    # plural / third-person -s only where the lookup tagger's lexicon knows the
+    # form as one, so names (nicholas) and words like news or always stay whole
+    if pos == 'v' and word in IRREGULAR_VERBS:
+        return IRREGULAR_VERBS[word]
+    if pos == 'n' and word in IRREGULAR_NOUNS:
+        return IRREGULAR_NOUNS[word]
+    if len(word) <= 3 or not word.endswith('s') or word.endswith(NO_PLURAL_SUFFIXES):
+        return word
+    if get_lookup_tagger().tag_word(word) not in PLURAL_TAGS.get(pos, ()):
+        return word
+    if word.endswith('ies') and len(word) > 4:
+        return word[:-3] + 'y'
+    if word.endswith(('sses', 'shes', 'ches', 'xes', 'zes')):
+        return word[:-2]
+    return word[:-1]
+
+
+class Normalizer:
+    # Lemmas are memoized per (word, pos) and interned so the many repeated
+    # node/relation names share one string object
+    def __init__(self, use_wordnet=True):
+        self.lemmatizer = _wordnet_lemmatizer() if use_wordnet else None
+        self._lemmas = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lemma(self, word, pos='n'):
+        key = (word, pos)
+        lemma = self._lemmas.get(key)
+        if lemma is not None:
+            self.hits += 1
+            return lemma
+        self.misses += 1
+        lemma = strip_possessive(word.strip().lower())
+        if pos == 'v' and lemma in IRREGULAR_VERBS:
+            lemma = IRREGULAR_VERBS[lemma]
+        elif self.lemmatizer is not None:
+            lemma = self.lemmatizer.lemmatize(lemma, pos)
+        else:
+            lemma = rule_lemma(lemma, pos)
+        lemma = sys.intern(lemma or word)
+        with self._lock:
+            return self._lemmas.setdefault(key, lemma)
+
+    def entity(self, word, sent_id):
+        # Placeholders are scoped to their sentence; a single global 'subject'
+        # node would otherwise join every sentence that lacked one. All of a
+        # sentence's fallbacks share one node, so a triplet with a fallback at
+        # both ends is a self-loop and dropped.
+        if word in PLACEHOLDERS:
+            return placeholder(sent_id)
+        return self.lemma(word, 'n')
+
+    def relation(self, verb):
+        return self.lemma(verb, 'v')
+
+    def triplets(self, triplets, sent_id):
+        normalized = []
+        for subj, verb, obj in triplets:
+            triplet = (self.entity(subj, sent_id), self.relation(verb), self.entity(obj, sent_id))
+            if triplet[0] != triplet[2] and triplet not in normalized:
+                normalized.append(triplet)
+        return normalized
+
+
+def placeholder(sent_id):
+    return sys.intern(f"{PLACEHOLDER_PREFIX}{sent_id}")
+
+
+def is_placeholder(node):
+    return isinstance(node, str) and node.startswith(PLACEHOLDER_PREFIX)
+
+
+@lru_cache(maxsize=None)
+def get_normalizer():
+    return Normalizer()
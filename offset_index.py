@@ -0,0 +1,288 @@
+import json
+import re
+import threading
+import numpy as np
+from lookup_tagger import TOKEN
+from normalization import is_placeholder
+from results_store import _Column
+from sentence_splitter import SKIP_SPACE, WHITESPACE
+
+OCCURRENCE_COLUMNS = ('key', 'sentence_id', 'start', 'end', 'char_start', 'char_end')
+
+
+def token_spans(sentence):
+    # Lowercased token -> its (start, end) in the sentence, in order
+    spans = {}
+    for match in TOKEN.finditer(sentence):
+        spans.setdefault(match.group().lower(), []).append(match.span())
+    return spans
+
+
+def _find(word, sentence, tokens):
+    found = tokens.get(word.lower())
+    if found is None:
+        # Backends tokenize differently (spaCy, NLTK's treebank rules)
+        pattern = r'(?<!\w)' + re.escape(word) + r'(?!\w)'
+        found = tokens[word.lower()] = [m.span() for m in re.finditer(pattern, sentence, re.IGNORECASE)]
+    return found
+
+
+def _first_after(spans, position):
+    return next((span for span in spans if span[0] >= position), spans[0] if spans else None)
+
+
+def triplet_occurrences(sentence, raw_triplets, triplets, entity):
+    # (key, start, end) for every node and edge of one sentence's normalized
+    # triplets, aligned through the raw (surface) triplets they came from.
+    # entity(word) is the node name a surface word was normalized to.
+    tokens = token_spans(sentence)
+    nodes = {node for subj, _, obj in triplets for node in (subj, obj)}
+    edges = {(subj, obj) for subj, _, obj in triplets}
+    occurrences = []
+    seen = set()
+
+    def add(key, span):
+        if span is not None and (key, span) not in seen:
+            seen.add((key, span))
+            occurrences.append((key,) + span)
+
+    whole = (0, len(sentence))
+    for node in nodes:
+        # A placeholder stands for what the sentence left out
+        if is_placeholder(node):
+            add(node, whole)
+    for subj_word, verb_word, obj_word in raw_triplets:
+        subj, obj = entity(subj_word), entity(obj_word)
+        if (subj, obj) not in edges:
+            continue
+        subj_spans = [] if is_placeholder(subj) else _find(subj_word, sentence, tokens)
+        obj_spans = [] if is_placeholder(obj) else _find(obj_word, sentence, tokens)
+        for node, spans in ((subj, subj_spans), (obj, obj_spans)):
+            for span in spans:
+                add(node, span)
+        # The edge covers the subject, its verb and the object after them
+        first = _first_after(subj_spans, 0)
+        verb = _first_after(_find(verb_word, sentence, tokens), first[0] if first else 0)
+        last = _first_after(obj_spans, (verb or first or whole)[0])
+        parts = [span for span in (first, verb, last) if span is not None]
+        add((subj, obj), (min(s for s, _ in parts), max(e for _, e in parts)) if parts else whole)
+    return occurrences
+
+
+def source_map(text, start, end):
+    # Breakpoints between offsets into normalize_whitespace(text[start:end])
+    # and offsets into text: every whitespace run became one space
+    lead = SKIP_SPACE.match(text, start).end()
+    normalized, source = [0], [lead]
+    position, cursor = 0, lead
+    for run in WHITESPACE.finditer(text, lead, end):
+        position += run.start() - cursor + 1
+        cursor = run.end()
+        normalized.append(position)
+        source.append(cursor)
+    return np.asarray(normalized, dtype=np.int64), np.asarray(source, dtype=np.int64)
+
+
+def locate_sentences(text, sentences, start=0):
+    # (start, end) of each normalized sentence in text, found in order; None
+    # for one that can't be found (the rest are still searched after it)
+    spans = []
+    for sentence in sentences:
+        # Most sentences appear verbatim; only those whose whitespace was
+        # collapsed need the (slower) whitespace-tolerant pattern
+        found = text.find(sentence, start)
+        if found >= 0:
+            span = (found, found + len(sentence))
+        else:
+            pattern = r'\s+'.join(re.escape(word) for word in sentence.split(' '))
+            match = re.compile(pattern).search(text, start)
+            if match is None:
+                spans.append(None)
+                continue
+            span = match.span()
+        spans.append(span)
+        start = span[1]
+    return spans
+
+
+class OffsetIndex:
+    # Where every node and edge occurs: one row per (key, sentence_id, start,
+    # end) in flat arrays, with start/end into kg.graph['sentences'][sentence_id]
+    # and char_start/char_end into the source text (-1 until a source is
+    # attached). Rows are appended sentence by sentence, so each sentence's
+    # rows are contiguous; lookups by key go through a CSR ordering that is
+    # rebuilt lazily after appends.
+    def __init__(self):
+        self.keys = []
+        self.ids = {}
+        self._key = _Column(np.int32)
+        self._sentence = _Column(np.int32)
+        self._start = _Column(np.int32)
+        self._end = _Column(np.int32)
+        self._char_start = _Column(np.int64)
+        self._char_end = _Column(np.int64)
+        # Per sentence: first row, and its span in the source text
+        self._rows = _Column(np.int64)
+        self._rows.append(0)
+        self._span_start = _Column(np.int64)
+        self._span_end = _Column(np.int64)
+        self._order = None
+        self._key_offsets = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def copy(self):
+        index = OffsetIndex()
+        with self._lock:
+            index.keys = list(self.keys)
+            index.ids = dict(self.ids)
+            for name in ('_key', '_sentence', '_start', '_end', '_char_start', '_char_end',
+                         '_rows', '_span_start', '_span_end'):
+                column = getattr(index, name)
+                column.size = 0
+                column.extend(getattr(self, name).view())
+        return index
+
+    def __len__(self):
+        return self._key.size
+
+    @property
+    def sentences(self):
+        return self._span_start.size
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).data.nbytes for name in
+                   ('_key', '_sentence', '_start', '_end', '_char_start', '_char_end',
+                    '_rows', '_span_start', '_span_end'))
+
+    def _intern(self, key):
+        i = self.ids.get(key)
+        if i is None:
+            i = self.ids[key] = len(self.keys)
+            self.keys.append(key)
+        return i
+
+    def add_sentence(self, sent_id, occurrences):
+        # occurrences: (key, start, end) with a node name or (subj, obj) as key
+        with self._lock:
+            if sent_id != self.sentences:
+                raise ValueError(f"Expected sentence {self.sentences}, got {sent_id}")
+            n = len(occurrences)
+            self._key.extend([self._intern(key) for key, _, _ in occurrences])
+            self._sentence.extend(np.full(n, sent_id))
+            self._start.extend([start for _, start, _ in occurrences])
+            self._end.extend([end for _, _, end in occurrences])
+            self._char_start.extend(np.full(n, -1))
+            self._char_end.extend(np.full(n, -1))
+            self._rows.append(self._key.size)
+            self._span_start.append(-1)
+            self._span_end.append(-1)
+            self._order = None
+
+    def attach_source(self, text, spans, first=0):
+        # spans[i] is sentence first + i's (start, end) in text (None if unknown);
+        # fills in the source offsets of its rows
+        with self._lock:
+            rows = self._rows.view()
+            for sent_id, span in enumerate(spans, first):
+                if span is None:
+                    continue
+                self._span_start.data[sent_id], self._span_end.data[sent_id] = span
+                a, b = rows[sent_id], rows[sent_id + 1]
+                if a == b:
+                    continue
+                normalized, source = source_map(text, *span)
+                for rel, out in ((self._start, self._char_start), (self._end, self._char_end)):
+                    offsets = rel.data[a:b].astype(np.int64)
+                    at = np.searchsorted(normalized, offsets, side='right') - 1
+                    out.data[a:b] = source[at] + offsets - normalized[at]
+
+    def locate(self, text, sentences, first=0):
+        # Attach a source for sentences whose spans weren't recorded when they
+        # were split (streamed or appended text), by finding them in order
+        # Resume after the last sentence that was located, not an unlocated one
+        start = max(0, int(self._span_end.data[:first].max())) if first else 0
+        self.attach_source(text, locate_sentences(text, sentences[first:], start), first)
+
+    def sentence_span(self, sent_id):
+        span = (int(self._span_start.data[sent_id]), int(self._span_end.data[sent_id]))
+        return None if span[0] < 0 else span
+
+    def _lookup(self):
+        with self._lock:
+            if self._order is None:
+                keys = self._key.view()
+                self._order = np.argsort(keys, kind='stable')
+                counts = np.bincount(keys, minlength=len(self.keys))
+                self._key_offsets = np.concatenate(([0], np.cumsum(counts)))
+            return self._order, self._key_offsets
+
+    def rows(self, key):
+        # Row numbers of every occurrence of a node or (subj, obj) edge
+        i = self.ids.get(key)
+        if i is None:
+            return np.zeros(0, dtype=np.int64)
+        order, offsets = self._lookup()
+        return order[offsets[i]:offsets[i + 1]]
+
+    def occurrences(self, key):
+        rows = self.rows(key)
+        return {
+            'sentence_id': self._sentence.data[rows],
+            'start': self._start.data[rows],
+            'end': self._end.data[rows],
+            'char_start': self._char_start.data[rows],
+            'char_end': self._char_end.data[rows],
+        }
+
+    def project(self, walks, sentences=None):
+        # Span annotations for traversal results ((start_node, path, entropies)
+        # tuples): every occurrence of each edge a walk took, so the cost is the
+        # size of the results, not of the text. With the graph's sentences the
+        # covered text is included too.
+        for result, (start_node, path, _) in enumerate(walks):
+            last = len(path) - 1
+            for step in range(1, len(path)):
+                source, target = path[step - 1], path[step]
+                rows = self.rows((source, target))
+                for sent_id, start, end, char_start, char_end in zip(
+                        self._sentence.data[rows].tolist(), self._start.data[rows].tolist(),
+                        self._end.data[rows].tolist(), self._char_start.data[rows].tolist(),
+                        self._char_end.data[rows].tolist()):
+                    annotation = {
+                        'result': result,
+                        'start_node': start_node,
+                        'step': step,
+                        'source': source,
+                        'target': target,
+                        'final': step == last,
+                        'sentence_id': sent_id,
+                        'start': start,
+                        'end': end,
+                        'char_start': char_start if char_start >= 0 else None,
+                        'char_end': char_end if char_end >= 0 else None,
+                    }
+                    if sentences is not None:
+                        annotation['text'] = sentences[sent_id][start:end]
+                    yield annotation
+
+    def to_jsonl(self, file, walks, sentences=None):
+        # file is a path or a text file object
+        if isinstance(file, str):
+            with open(file, 'w', encoding='utf-8') as f:
+                return self.to_jsonl(f, walks, sentences)
+        for annotation in self.project(walks, sentences):
+            file.write(json.dumps(annotation, ensure_ascii=False) + '\n')
+
+
+def get_offset_index(kg):
+    return kg.graph.get('offsets')
@@ -0,0 +1,178 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import networkx as nx
+from extraction import get_extractor
+from kg_builder import KnowledgeGraphBuilder
+from nlp_utils import TextProcessor
+from streaming import stream_sentence_spans
+
+_END = object()
+_worker_extractor = None
+
+
+def _init_worker(backend, backend_options):
+    global _worker_extractor
+    _worker_extractor = get_extractor(backend, **backend_options)
+
+
+def _tag_batch(sentences, extractor=None):
+    start = time.perf_counter()
+    triplets = list((extractor or _worker_extractor).iter_extract(sentences))
+    return triplets, time.perf_counter() - start
+
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+        self.first = None
+        self.last = None
+        self.depth_samples = 0
+        self.depth_total = 0
+        self.max_depth = 0
+
+    def record(self, items, busy):
+        now = time.perf_counter()
+        self.first = self.first or now - busy
+        self.last = now
+        self.items += items
+        self.busy += busy
+
+    def sample_queue(self, q):
+        depth = q.qsize()
+        self.depth_samples += 1
+        self.depth_total += depth
+        self.max_depth = max(self.max_depth, depth)
+
+    def as_dict(self):
+        span = (self.last - self.first) if self.first is not None else 0.0
+        return {
+            'stage': self.name,
+            'items': self.items,
+            'busy_seconds': round(self.busy, 3),
+            'wall_seconds': round(span, 3),
+            'items_per_sec': round(self.items / span, 1) if span else 0.0,
+            'mean_queue_depth': round(self.depth_total / self.depth_samples, 2) if self.depth_samples else 0.0,
+            'max_queue_depth': self.max_depth,
+        }
+
+
+class NLPPipeline:
+    # split -> [bounded queue] -> tag (pool) -> [bounded queue of futures] -> insert
+    def __init__(self, backend='nltk', backend_options=None, executor='process', workers=None,
+                 batch_size=32, queue_size=8, chunk_size=4000, splitter='punkt'):
+        self.backend = backend
+        self.backend_options = backend_options or {}
+        self.executor = executor
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.chunk_size = chunk_size
+        self.splitter = splitter
+        self.stats = {}
+
+    def run(self, text, kg=None, progress=None):
+        kg = kg if kg is not None else nx.DiGraph(sentences=[])
+        builder = KnowledgeGraphBuilder(self.backend, **self.backend_options)
+        self.stats = {name: StageStats(name) for name in ('split', 'tag', 'insert')}
+        sentences_q = queue.Queue(maxsize=self.queue_size * self.batch_size)
+        batches_q = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        errors = []
+
+        if self.executor == 'process':
+            pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                       initargs=(self.backend, self.backend_options))
+            submit = lambda batch: pool.submit(_tag_batch, batch)
+        else:
+            pool = ThreadPoolExecutor(max_workers=self.workers)
+            submit = lambda batch: pool.submit(_tag_batch, batch, builder.extractor)
+
+        def put(q, item):
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def split_stage():
+            stats = self.stats['split']
+            chunks = (text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size))
+            try:
+                started = time.perf_counter()
+                for item in stream_sentence_spans(chunks, TextProcessor(self.splitter)):
+                    stats.record(1, time.perf_counter() - started)
+                    stats.sample_queue(sentences_q)
+                    if not put(sentences_q, item):
+                        return
+                    started = time.perf_counter()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                put(sentences_q, _END)
+
+        def dispatch_stage():
+            batch = []
+            try:
+                while not stop.is_set():
+                    item = sentences_q.get()
+                    if item is not _END:
+                        batch.append(item)
+                    if batch and (item is _END or len(batch) >= self.batch_size):
+                        self.stats['tag'].sample_queue(batches_q)
+                        sentences = [sent for sent, _ in batch]
+                        spans = [span for _, span in batch]
+                        if not put(batches_q, (sentences, spans, submit(sentences))):
+                            return
+                        batch = []
+                    if item is _END:
+                        return
+            except Exception as e:
+                errors.append(e)
+            finally:
+                put(batches_q, _END)
+
+        threads = [threading.Thread(target=split_stage, daemon=True),
+                   threading.Thread(target=dispatch_stage, daemon=True)]
+        for thread in threads:
+            thread.start()
+
+        try:
+            done = 0
+            while True:
+                self.stats['insert'].sample_queue(batches_q)
+                item = batches_q.get()
+                if item is _END:
+                    break
+                batch, spans, future = item
+                triplets, tag_seconds = future.result()
+                self.stats['tag'].record(len(batch), tag_seconds)
+
+                started = time.perf_counter()
+                builder.apply_triplets(kg, batch, triplets, text, spans)
+                self.stats['insert'].record(len(batch), time.perf_counter() - started)
+
+                done += len(batch)
+                if progress:
+                    progress(done, self.stats['split'].items)
+            if errors:
+                raise errors[0]
+        finally:
+            stop.set()
+            # Unblock a dispatcher waiting on an empty queue
+            try:
+                sentences_q.put_nowait(_END)
+            except queue.Full:
+                pass
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        return kg
+
+    def stage_report(self):
+        return [stats.as_dict() for stats in self.stats.values()]
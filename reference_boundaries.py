@@ -0,0 +1,120 @@
+import argparse
+import json
+from evaluation import CSV_PATH, REFERENCE_PATH
+
+EDITS_PATH = "src/reference_edits.json"
+# Whitespace, opening quotes and dashes between a boundary and the next word
+OPENERS = set('“‘"\'([—–- \n\t')
+
+
+def tokenizer_ends(text):
+    # Sentence end offsets from textblob's pattern tokenizer. Its sentences are
+    # the text's characters with spaces between tokens, except that it shortens
+    # runs of dots ("...." becomes "..."), so they're aligned character by
+    # character and skipped dots are given back to the sentence they end.
+    try:
+        from textblob.en import tokenize
+    except ImportError:
+        raise ImportError("Deriving the reference boundaries needs textblob (pip install textblob)")
+    ends = []
+    position = 0
+    for sentence in tokenize(text):
+        for char in sentence:
+            if char.isspace():
+                continue
+            while text[position].isspace() or (text[position] != char and text[position] == '.'):
+                position += 1
+            if text[position] != char:
+                raise ValueError(f"Can't align the tokenizer's output at offset {position}")
+            position += 1
+        while position < len(text) and text[position] == '.':
+            position += 1
+        ends.append(position)
+    return ends
+
+
+def derive_ends(text):
+    # The tokenizer breaks off speech before its tag ("“How lovely!” said
+    # everyone..."); a boundary followed by a lowercase word isn't one
+    ends = []
+    for end in tokenizer_ends(text):
+        following = end
+        while following < len(text) and text[following] in OPENERS:
+            following += 1
+        if following < len(text) and text[following].islower():
+            continue
+        ends.append(end)
+    return ends
+
+
+def load_edits(path=EDITS_PATH):
+    # Hand-checked corrections: {'chapter', 'end', 'action': add|remove,
+    # 'context': the text just before end}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)['edits']
+
+
+def reference_ends(texts, edits):
+    chapters = []
+    for i, text in enumerate(texts):
+        ends = set(derive_ends(text))
+        for edit in (e for e in edits if e['chapter'] == i):
+            end = edit['end']
+            if not text[:end].endswith(edit['context']):
+                raise ValueError(f"Edit at chapter {i} offset {end} no longer matches {edit['context']!r}")
+            if edit['action'] == 'add':
+                ends.add(end)
+            else:
+                ends.discard(end)
+        # The end of the text is a boundary for every segmentation
+        ends.discard(len(text.rstrip()))
+        chapters.append({'chars': len(text), 'ends': sorted(ends)})
+    return chapters
+
+
+def review(texts, chapters, width=40):
+    # Every boundary where the reference and a splitter tier disagree, to be
+    # checked by hand (and recorded in the edits file where the reference is wrong)
+    from evaluation import _ends
+    from sentence_splitter import SentenceSplitter, get_splitter
+    splitters = {tier: get_splitter(tier) for tier in SentenceSplitter.TIERS}
+    for i, (text, chapter) in enumerate(zip(texts, chapters)):
+        ends = set(chapter['ends'])
+        tiers = {tier: _ends(text, splitter.span_tokenize(text)) for tier, splitter in splitters.items()}
+        for end in sorted(ends ^ set().union(*tiers.values())):
+            found = [tier for tier, tier_ends in tiers.items() if end in tier_ends]
+            marker = 'reference' if end in ends else '+'.join(found)
+            print(f"{i}\t{end}\t{marker}\t{text[end - width:end]!r} | {text[end:end + width // 2]!r}")
+
+
+def main():
+    import pandas as pd
+    parser = argparse.ArgumentParser(description=f"Derive the reference sentence boundaries ({REFERENCE_PATH}) "
+                                                 f"from the punctuated chapters and the hand edits ({EDITS_PATH})")
+    parser.add_argument('--chapters', type=int, default=30)
+    parser.add_argument('--check', action='store_true', help="Only verify that the reference file is up to date")
+    parser.add_argument('--review', action='store_true',
+                        help="List the boundaries where the reference and a splitter tier disagree")
+    args = parser.parse_args()
+
+    texts = pd.read_csv(CSV_PATH)['text'].head(args.chapters).tolist()
+    chapters = reference_ends(texts, load_edits())
+    if args.review:
+        review(texts, chapters)
+    elif args.check:
+        with open(REFERENCE_PATH, encoding='utf-8') as f:
+            saved = json.load(f)['chapters']
+        if saved != chapters:
+            raise SystemExit(f"{REFERENCE_PATH} is out of date; rerun python reference_boundaries.py "
+                             f"--chapters {len(texts)}")
+        print(f"{REFERENCE_PATH} matches ({len(chapters)} chapters)")
+    else:
+        with open(REFERENCE_PATH, 'w', encoding='utf-8') as f:
+            json.dump({'chapters': chapters}, f, separators=(',', ':'))
+            f.write('\n')
+        print(f"Wrote {sum(len(c['ends']) for c in chapters)} boundaries for {len(chapters)} chapters "
+              f"to {REFERENCE_PATH}")
+
+
+if __name__ == "__main__":
+    main()
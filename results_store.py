@@ -0,0 +1,225 @@
+import csv
+import threading
+import numpy as np
+
+EXPORT_COLUMNS = ('result', 'start_node', 'step', 'node', 'entropy')
+
+
+class _Column:
+    # Growable numpy buffer; views handed out stay valid after it reallocates
+    def __init__(self, dtype, capacity=256):
+        self.data = np.empty(capacity, dtype=dtype)
+        self.size = 0
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self.data.dtype)
+        end = self.size + len(values)
+        if end > len(self.data):
+            grown = np.empty(max(end, 2 * len(self.data)), dtype=self.data.dtype)
+            grown[:self.size] = self.data[:self.size]
+            self.data = grown
+        self.data[self.size:end] = values
+        self.size = end
+
+    def append(self, value):
+        self.extend((value,))
+
+    def view(self):
+        return self.data[:self.size]
+
+
+class ResultStore:
+    # Columnar traversal results: node names are interned to integer ids and
+    # every result's path and entropies live in flat arrays addressed by
+    # per-result offsets. Traversals are appended as they finish (from the job
+    # thread) while the UI reads; indexing still returns the old result dicts.
+    def __init__(self):
+        self.names = []
+        self.ids = {}
+        self._start = _Column(np.int32)
+        self._path = _Column(np.int32)
+        self._path_offsets = _Column(np.int64)
+        self._entropy = _Column(np.float64)
+        self._entropy_offsets = _Column(np.int64)
+        self._path_offsets.append(0)
+        self._entropy_offsets.append(0)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_traversals(cls, traversals):
+        store = cls()
+        store.extend(traversals)
+        return store
+
+    def _intern(self, node):
+        i = self.ids.get(node)
+        if i is None:
+            i = self.ids[node] = len(self.names)
+            self.names.append(node)
+        return i
+
+    def append(self, start_node, path, entropies):
+        with self._lock:
+            self._start.append(self._intern(start_node))
+            self._path.extend([self._intern(node) for node in path])
+            self._path_offsets.append(self._path.size)
+            self._entropy.extend(entropies)
+            self._entropy_offsets.append(self._entropy.size)
+
+    def extend(self, traversals):
+        # (start_node, path, entropies) tuples, as returned by traverse_many
+        for start_node, path, entropies in traversals:
+            self.append(start_node, path, entropies)
+
+    def __len__(self):
+        return self._start.size
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __getitem__(self, i):
+        with self._lock:
+            if not -len(self) <= i < len(self):
+                raise IndexError(i)
+            i %= len(self)
+            p = self._path_offsets.data[i:i + 2]
+            e = self._entropy_offsets.data[i:i + 2]
+            return {
+                'start_node': self.names[self._start.data[i]],
+                'boundary_nodes': [self.names[j] for j in self._path.data[p[0]:p[1]].tolist()],
+                'entropies': self._entropy.data[e[0]:e[1]].tolist(),
+            }
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def _snapshot(self):
+        # Consistent views over the first n results, safe to use without the lock
+        with self._lock:
+            n = len(self)
+            return (n, self._start.view(), self._path.view(), self._path_offsets.view(),
+                    self._entropy.view(), self._entropy_offsets.view(), list(self.names))
+
+    def summary(self):
+        # Per-result columns for the results table, computed with reduceat
+        n, start, _, path_offsets, entropy, entropy_offsets, names = self._snapshot()
+        path_len = np.diff(path_offsets)
+        entropy_len = np.diff(entropy_offsets)
+        avg = np.zeros(n)
+        high = np.zeros(n)
+        low = np.zeros(n)
+        has = entropy_len > 0
+        if has.any():
+            # reduceat misreads empty segments, so only non-empty ones are reduced
+            starts = entropy_offsets[:-1][has]
+            avg[has] = np.add.reduceat(entropy, starts) / entropy_len[has]
+            high[has] = np.maximum.reduceat(entropy, starts)
+            low[has] = np.minimum.reduceat(entropy, starts)
+        return {
+            'start_node': [names[i] for i in start.tolist()],
+            'boundary_nodes': path_len,
+            'steps': entropy_len,
+            'has_entropy': has,
+            'avg_entropy': avg,
+            'max_entropy': high,
+            'min_entropy': low,
+        }
+
+    def summary_frame(self, tail=3):
+        import pandas as pd
+        summary = self.summary()
+        n, _, path, path_offsets, _, _, names = self._snapshot()
+        final = [', '.join(str(names[j]) for j in path[max(a, b - tail):b].tolist())
+                 for a, b in zip(path_offsets[:-1].tolist(), path_offsets[1:].tolist())]
+        return pd.DataFrame({
+            'Start Node': summary['start_node'],
+            'Boundary Nodes': summary['boundary_nodes'],
+            'Avg Entropy': summary['avg_entropy'],
+            'Max Entropy': summary['max_entropy'],
+            'Min Entropy': summary['min_entropy'],
+            'Final Nodes': final,
+        })
+
+    def iter_batches(self, batch_rows=65536):
+        # Full per-step results, one row per path node, in chunks of about
+        # batch_rows. Node columns stay integer ids into the returned names;
+        # steps past the last computed entropy get NaN.
+        n, start, path, path_offsets, entropy, entropy_offsets, names = self._snapshot()
+        first = 0
+        while first < n:
+            limit = path_offsets[first] + batch_rows
+            last = max(first + 1, int(np.searchsorted(path_offsets, limit, side='right')) - 1)
+            last = min(last, n)
+            a, b = path_offsets[first], path_offsets[last]
+            lengths = np.diff(path_offsets[first:last + 1])
+            result = np.repeat(np.arange(first, last, dtype=np.int32), lengths)
+            step = (np.arange(b - a) - np.repeat(path_offsets[first:last] - a, lengths)).astype(np.int32)
+            values = np.full(b - a, np.nan)
+            scored = step < np.repeat(np.diff(entropy_offsets[first:last + 1]), lengths)
+            values[scored] = entropy[entropy_offsets[first]:entropy_offsets[last]]
+            yield {
+                'result': result,
+                'start_node': start[result],
+                'step': step,
+                'node': path[a:b],
+                'entropy': values,
+            }, names
+            first = last
+
+    def _arrow_batches(self, batch_rows):
+        import pyarrow as pa
+        dictionary = None
+        for batch, names in self.iter_batches(batch_rows):
+            # One name dictionary per export, shared by every batch
+            if dictionary is None:
+                dictionary = pa.array(names, type=pa.string())
+            yield pa.record_batch([
+                pa.array(batch['result']),
+                pa.DictionaryArray.from_arrays(pa.array(batch['start_node']), dictionary),
+                pa.array(batch['step']),
+                pa.DictionaryArray.from_arrays(pa.array(batch['node']), dictionary),
+                pa.array(batch['entropy'], from_pandas=True),
+            ], names=list(EXPORT_COLUMNS))
+
+    def _arrow_schema(self):
+        import pyarrow as pa
+        names = pa.dictionary(pa.int32(), pa.string())
+        return pa.schema([('result', pa.int32()), ('start_node', names), ('step', pa.int32()),
+                          ('node', names), ('entropy', pa.float64())])
+
+    def to_parquet(self, path, batch_rows=65536):
+        import pyarrow.parquet as pq
+        with pq.ParquetWriter(path, self._arrow_schema()) as writer:
+            for batch in self._arrow_batches(batch_rows):
+                writer.write_batch(batch)
+
+    def to_arrow(self, path, batch_rows=65536):
+        # Arrow IPC file (Feather v2)
+        import pyarrow as pa
+        with pa.OSFile(str(path), 'wb') as sink, pa.ipc.new_file(sink, self._arrow_schema()) as writer:
+            for batch in self._arrow_batches(batch_rows):
+                writer.write_batch(batch)
+
+    def to_csv(self, file, batch_rows=65536):
+        # file is a path or a text file object
+        if isinstance(file, str):
+            with open(file, 'w', newline='', encoding='utf-8') as f:
+                return self.to_csv(f, batch_rows)
+        writer = csv.writer(file)
+        writer.writerow(EXPORT_COLUMNS)
+        for batch, names in self.iter_batches(batch_rows):
+            writer.writerows(zip(
+                batch['result'].tolist(),
+                (names[i] for i in batch['start_node'].tolist()),
+                batch['step'].tolist(),
+                (names[i] for i in batch['node'].tolist()),
+                ('' if np.isnan(e) else e for e in batch['entropy'].tolist()),
+            ))
+
+
+EXPORT_FORMATS = {
+    'parquet': ('boundary_detection_steps.parquet', 'application/vnd.apache.parquet', ResultStore.to_parquet),
+    'arrow': ('boundary_detection_steps.arrow', 'application/vnd.apache.arrow.file', ResultStore.to_arrow),
+    'csv': ('boundary_detection_steps.csv', 'text/csv', ResultStore.to_csv),
+}
@@ -0,0 +1,111 @@
+import os
+import pickle
+import re
+from functools import lru_cache
+
+CSV_PATH = "src/war_and_peace_full_chapters.csv"
+PUNKT_CACHE_PATH = ".punkt_cache/war_and_peace.pickle"
+
+WHITESPACE = re.compile(r'\s+')
+# Terminal punctuation, any closing quotes/brackets, then whitespace and
+# something that can open a sentence (an opening quote, capital or digit)
+BOUNDARY = re.compile(r'[.!?…]+[”’"\')\]]*(?=\s+[“‘"\'(\[]*[A-Z0-9])')
+LAST_WORD = re.compile(r'[\w.’\'-]+$')
+SKIP_SPACE = re.compile(r'\s*')
+
+ABBREVIATIONS = {
+    'mr', 'mrs', 'ms', 'dr', 'st', 'jr', 'sr', 'prof', 'gen', 'col', 'capt', 'lt', 'sgt',
+    'rev', 'hon', 'mme', 'mlle', 'messrs', 'mm', 'etc', 'vs', 'viz', 'cf', 'i.e', 'e.g',
+    'p.s', 'u.s', 'a.m', 'p.m', 'vol', 'ch', 'fig', 'approx', 'dept', 'esq',
+}
+
+
+def normalize_whitespace(text):
+    return WHITESPACE.sub(' ', text).strip()
+
+
+def regex_spans(text):
+    spans = []
+    start = SKIP_SPACE.match(text).end()
+    for match in BOUNDARY.finditer(text):
+        if match.group().startswith('.') and len(match.group().rstrip('”’"\')]')) == 1:
+            word = LAST_WORD.search(text, max(0, match.start() - 30), match.start())
+            if word:
+                token = word.group().lstrip('“‘"\'(').lower()
+                if token in ABBREVIATIONS or (len(token) == 1 and token.isalpha()):
+                    continue
+        end = match.end()
+        if end > start:
+            spans.append((start, end))
+        start = SKIP_SPACE.match(text, end).end()
+    tail = text[start:].rstrip()
+    if tail:
+        spans.append((start, start + len(tail)))
+    return spans
+
+
+def train_punkt(texts, cache_path=PUNKT_CACHE_PATH):
+    from nltk.tokenize.punkt import PunktTrainer
+    trainer = PunktTrainer()
+    trainer.train('\n'.join(texts), finalize=True)
+    params = trainer.get_params()
+    os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+    tmp_path = cache_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(params, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
+    return params
+
+
+@lru_cache(maxsize=None)
+def load_punkt(trained=False, csv_path=CSV_PATH, cache_path=PUNKT_CACHE_PATH):
+    from nltk.tokenize.punkt import PunktSentenceTokenizer, PunktTokenizer
+    if not trained:
+        return PunktTokenizer('english')
+
+    if os.path.exists(cache_path):
+        with open(cache_path, 'rb') as f:
+            params = pickle.load(f)
+    else:
+        import pandas as pd
+        params = train_punkt(pd.read_csv(csv_path)['text'], cache_path)
+    return PunktSentenceTokenizer(params)
+
+
+class SentenceSplitter:
+    TIERS = {
+        'punkt': 'Punkt (pretrained)',
+        'punkt-wp': 'Punkt (trained on War and Peace)',
+        'regex': 'Fast regex',
+    }
+
+    def __init__(self, tier='punkt'):
+        if tier not in self.TIERS:
+            raise ValueError(f"Unknown sentence splitter tier: {tier}")
+        self.tier = tier
+        self._punkt = None if tier == 'regex' else load_punkt(trained=(tier == 'punkt-wp'))
+
+    def span_tokenize(self, text):
+        if self._punkt is None:
+            return regex_spans(text)
+        return list(self._punkt.span_tokenize(text))
+
+    def split(self, text):
+        return [normalize_whitespace(text[start:end]) for start, end in self.span_tokenize(text)]
+
+
+@lru_cache(maxsize=None)
+def get_splitter(tier='punkt'):
+    # Punkt needs NLTK data (or the corpus to train on); without it the regex
+    # tier is used rather than failing
+    try:
+        return SentenceSplitter(tier)
+    except (LookupError, OSError):
+        return SentenceSplitter('regex')
+
+
+if __name__ == "__main__":
+    import pandas as pd
+    load_punkt.cache_clear()
+    train_punkt(pd.read_csv(CSV_PATH)['text'])
+    print(f"Trained Punkt parameters saved to {PUNKT_CACHE_PATH}")
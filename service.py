@@ -0,0 +1,382 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+import networkx as nx
+from entropy_model import DEFAULT_WEIGHTS, EntropyBoundaryDetector
+from kg_builder import KnowledgeGraphBuilder
+from nlp_utils import TextProcessor
+from node_ranking import get_start_node_selector
+from traversal import GraphTraverser
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+               413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable',
+               504: 'Gateway Timeout'}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _param(body, name, kind, default):
+    # Request parameters are converted here so bad values are the client's
+    # error (400) rather than an exception inside the handler (500)
+    value = body.get(name, default)
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise HTTPError(400, f"'{name}' must be a number, got {value!r}")
+    try:
+        return kind(value)
+    except ValueError:
+        raise HTTPError(400, f"'{name}' must be a number, got {value!r}")
+
+
+class MicroBatcher:
+    # Collects concurrent submissions for up to max_wait seconds (or max_batch
+    # items) and runs them as one call of fn(items) -> results on the executor
+    def __init__(self, name, fn, executor, max_batch=32, max_wait=0.01):
+        self.name = name
+        self.fn = fn
+        self.executor = executor
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue = asyncio.Queue()
+        self.batches = 0
+        self.items = 0
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+
+    async def submit(self, item):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Requests that already timed out don't need computing
+            batch = [(item, future) for item, future in batch if not future.done()]
+            if not batch:
+                continue
+            self.batches += 1
+            self.items += len(batch)
+            try:
+                results = await loop.run_in_executor(self.executor, self.fn, [item for item, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'mean_batch_size': round(self.items / self.batches, 2) if self.batches else 0.0,
+            'queued': self.queue.qsize(),
+        }
+
+
+class Metrics:
+    def __init__(self, window=1000):
+        self.started = time.time()
+        self.requests = 0
+        self.by_status = {}
+        self.latencies = deque(maxlen=window)
+
+    def record(self, status, seconds):
+        self.requests += 1
+        self.by_status[status] = self.by_status.get(status, 0) + 1
+        self.latencies.append(seconds)
+
+    def as_dict(self):
+        latencies = sorted(self.latencies)
+
+        def percentile(q):
+            if not latencies:
+                return 0.0
+            return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 2)
+
+        uptime = time.time() - self.started
+        return {
+            'uptime_seconds': round(uptime, 1),
+            'requests': self.requests,
+            'requests_per_sec': round(self.requests / uptime, 2) if uptime else 0.0,
+            'by_status': {str(k): v for k, v in sorted(self.by_status.items())},
+            'latency_ms': {'p50': percentile(0.5), 'p95': percentile(0.95), 'p99': percentile(0.99)},
+        }
+
+
+class BoundaryService:
+    def __init__(self, backend='nltk', splitter='punkt', workers=4, max_pending=64,
+                 request_timeout=30.0, max_graphs=32, max_batch=32, max_wait=0.01,
+                 max_body=10 * 1024 * 1024):
+        # Models, the splitter and built graphs stay loaded for the server's lifetime
+        self.processor = TextProcessor(splitter)
+        self.builder = KnowledgeGraphBuilder(backend)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.max_pending = max_pending
+        self.request_timeout = request_timeout
+        self.max_graphs = max_graphs
+        self.max_body = max_body
+        self.batch_options = {'max_batch': max_batch, 'max_wait': max_wait}
+        self.graphs = OrderedDict()
+        # Builds in progress by graph_id, so concurrent requests for the same
+        # text wait on one build instead of each starting their own
+        self.building = {}
+        self.metrics = Metrics()
+        self.pending = 0
+        self.tagger = None
+        self.traverser = None
+
+    def start(self):
+        self.tagger = MicroBatcher('tag', self._tag_batch, self.executor, **self.batch_options)
+        self.traverser = MicroBatcher('traverse', self._traverse_batch, self.executor, **self.batch_options)
+        self.tagger.start()
+        self.traverser.start()
+
+    async def stop(self):
+        await self.tagger.stop()
+        await self.traverser.stop()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _tag_batch(self, requests):
+        # One extractor pass over every request's sentences
+        sentences = [sent for sents in requests for sent in sents]
+        triplets = list(self.builder.extractor.iter_extract(sentences))
+        results, start = [], 0
+        for sents in requests:
+            results.append(triplets[start:start + len(sents)])
+            start += len(sents)
+        return results
+
+    def _traverse_batch(self, requests):
+        # Requests on the same graph with the same settings share one traverse_many
+        groups, graphs = {}, {}
+        for i, (graph_id, kg, start_nodes, settings, max_depth) in enumerate(requests):
+            graphs[graph_id] = kg
+            groups.setdefault((graph_id, settings, max_depth), []).append((i, start_nodes))
+        results = [None] * len(requests)
+        for (graph_id, settings, max_depth), members in groups.items():
+            kg = graphs[graph_id]
+            detector = EntropyBoundaryDetector(**dict(settings))
+            nodes = list(dict.fromkeys(n for _, starts in members for n in starts))
+            walks = {node: (path, entropies) for node, path, entropies in
+                     GraphTraverser(kg, detector).traverse_many(nodes, max_depth, workers=1)}
+            for i, starts in members:
+                results[i] = [{
+                    'start_node': node,
+                    'boundary_nodes': walks[node][0],
+                    'entropies': [float(e) for e in walks[node][1]],
+                    'is_boundary': bool(walks[node][1]) and
+                                   bool(detector.is_boundary(walks[node][1][-1], len(walks[node][0]))),
+                } for node in starts if node in walks]
+        return results
+
+    def _store_graph(self, graph_id, kg):
+        self.graphs[graph_id] = kg
+        self.graphs.move_to_end(graph_id)
+        while len(self.graphs) > self.max_graphs:
+            self.graphs.popitem(last=False)
+
+    async def build_graph(self, text):
+        graph_id = hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+        if graph_id in self.graphs:
+            self.graphs.move_to_end(graph_id)
+            return graph_id, self.graphs[graph_id]
+        build = self.building.get(graph_id)
+        if build is None:
+            build = asyncio.ensure_future(self._build_graph(graph_id, text))
+            self.building[graph_id] = build
+            build.add_done_callback(lambda _: self.building.pop(graph_id, None))
+        # Shielded so one caller timing out doesn't cancel the build for the others
+        return graph_id, await asyncio.shield(build)
+
+    async def _build_graph(self, graph_id, text):
+        loop = asyncio.get_running_loop()
+        sentences = await loop.run_in_executor(self.executor, self.processor.extract_sentences, text)
+        triplets = await self.tagger.submit(sentences)
+        kg = nx.DiGraph(sentences=[])
+        await loop.run_in_executor(self.executor, self.builder.apply_triplets, kg, sentences, triplets)
+        self._store_graph(graph_id, kg)
+        return kg
+
+    async def detect(self, body):
+        # Parameters are checked before any graph is built for the request
+        start_nodes = body.get('start_nodes', 20)
+        if isinstance(start_nodes, list):
+            start_nodes = [n for n in start_nodes if isinstance(n, str)]
+        else:
+            start_nodes = _param(body, 'start_nodes', int, 20)
+        # Hashable, so requests with the same detector settings share a batch
+        settings = (('threshold', _param(body, 'threshold', float, 0.8)),
+                    ('window_size', _param(body, 'window_size', int, 3)),
+                    ('alpha', _param(body, 'alpha', float, DEFAULT_WEIGHTS[0])),
+                    ('beta', _param(body, 'beta', float, DEFAULT_WEIGHTS[1])),
+                    ('gamma', _param(body, 'gamma', float, DEFAULT_WEIGHTS[2])))
+        max_depth = _param(body, 'max_depth', int, 10)
+
+        if 'graph_id' in body:
+            graph_id = body['graph_id']
+            kg = self.graphs.get(graph_id)
+            if kg is None:
+                raise HTTPError(404, f"Unknown graph_id: {graph_id}")
+        elif 'text' in body:
+            graph_id, kg = await self.build_graph(str(body['text']))
+        else:
+            raise HTTPError(400, "Expected 'text' or 'graph_id'")
+
+        if isinstance(start_nodes, int):
+            k = start_nodes
+            # Ranking a new graph's nodes is CPU work, so it runs on the executor
+            start_nodes = await asyncio.get_running_loop().run_in_executor(
+                self.executor, lambda: get_start_node_selector(kg).top_k(k))
+        start_nodes = [n for n in start_nodes if kg.has_node(n)]
+        traversals = await self.traverser.submit((graph_id, kg, start_nodes, settings, max_depth))
+        return {
+            'graph_id': graph_id,
+            'nodes': kg.number_of_nodes(),
+            'edges': kg.number_of_edges(),
+            'sentences': len(kg.graph['sentences']),
+            'traversals': traversals,
+        }
+
+    async def route(self, method, path, body):
+        if path == '/health':
+            return {'status': 'ok'}
+        if path == '/metrics':
+            return {**self.metrics.as_dict(), 'pending': self.pending, 'graphs': len(self.graphs),
+                    'batchers': {b.name: b.stats() for b in (self.tagger, self.traverser)}}
+        if method != 'POST':
+            raise HTTPError(405 if path in ('/graphs', '/detect') else 404, f"{method} {path}")
+        if path == '/graphs':
+            if 'text' not in body:
+                raise HTTPError(400, "Expected 'text'")
+            graph_id, kg = await self.build_graph(str(body['text']))
+            return {'graph_id': graph_id, 'nodes': kg.number_of_nodes(), 'edges': kg.number_of_edges()}
+        if path == '/detect':
+            return await self.detect(body)
+        raise HTTPError(404, path)
+
+    async def handle(self, reader, writer):
+        started = time.perf_counter()
+        status, payload = 200, None
+        try:
+            method, path, body = await self._read_request(reader)
+            if path in ('/health', '/metrics'):
+                payload = await self.route(method, path, body)
+            elif self.pending >= self.max_pending:
+                # Shed load instead of queueing without bound
+                raise HTTPError(503, "Too many requests in flight")
+            else:
+                self.pending += 1
+                try:
+                    timeout = _param(body, 'timeout', float, self.request_timeout)
+                    payload = await asyncio.wait_for(self.route(method, path, body), timeout)
+                except asyncio.TimeoutError:
+                    raise HTTPError(504, "Request timed out")
+                finally:
+                    self.pending -= 1
+        except HTTPError as e:
+            status, payload = e.status, {'error': str(e)}
+        except Exception as e:
+            status, payload = 500, {'error': f"{type(e).__name__}: {e}"}
+
+        data = json.dumps(payload, default=float).encode('utf-8')
+        headers = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+                   "Content-Type: application/json", f"Content-Length: {len(data)}",
+                   "Connection: close"]
+        if status == 503:
+            headers.append("Retry-After: 1")
+        try:
+            writer.write(("\r\n".join(headers) + "\r\n\r\n").encode('latin-1') + data)
+            await writer.drain()
+        finally:
+            writer.close()
+        self.metrics.record(status, time.perf_counter() - started)
+
+    async def _read_request(self, reader):
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            method, path = request_line[0].upper(), request_line[1].split('?')[0]
+        except (IndexError, UnicodeDecodeError):
+            raise HTTPError(400, "Malformed request line")
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get('content-length', 0) or 0)
+        if length > self.max_body:
+            raise HTTPError(413, f"Body larger than {self.max_body} bytes")
+        body = {}
+        if length:
+            try:
+                body = json.loads(await reader.readexactly(length))
+            except ValueError:
+                raise HTTPError(400, "Body must be JSON")
+            if not isinstance(body, dict):
+                raise HTTPError(400, "Body must be a JSON object")
+        return method, path, body
+
+
+async def serve(host='127.0.0.1', port=8765, **options):
+    service = BoundaryService(**options)
+    service.start()
+    server = await asyncio.start_server(service.handle, host, port, backlog=1024)
+    print(f"Boundary detection service on http://{host}:{port}", flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local HTTP service for entropy boundary detection")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--backend', default='nltk')
+    parser.add_argument('--splitter', default='punkt')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--max-pending', type=int, default=64)
+    parser.add_argument('--timeout', type=float, default=30.0)
+    parser.add_argument('--max-batch', type=int, default=32)
+    parser.add_argument('--max-wait-ms', type=float, default=10.0)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, backend=args.backend, splitter=args.splitter,
+                          workers=args.workers, max_pending=args.max_pending,
+                          request_timeout=args.timeout, max_batch=args.max_batch,
+                          max_wait=args.max_wait_ms / 1000))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
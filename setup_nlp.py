@@ -47,5 +47,16 @@ def download_nltk_resources():
         print(f"✗ Testing failed: {e}")
         print("Using fallback methods...")
 
+def download_spacy_model(model='en_core_web_sm'):
+    print(f"\nDownloading spaCy model {model}...")
+    try:
+        import spacy.cli
+        spacy.cli.download(model)
+        print(f"✓ {model} downloaded successfully")
+    except (Exception, SystemExit) as e:
+        print(f"✗ Failed to download {model}: {e}")
+        print("The spaCy extraction backend will be unavailable.")
+
 if __name__ == "__main__":
-    download_nltk_resources()
\ No newline at end of file
+    download_nltk_resources()
+    download_spacy_model()
\ No newline at end of file
@@ -0,0 +1,325 @@
+import sys
+from multiprocessing import shared_memory
+import numpy as np
+
+_attached = {}
+
+
+class SharedGraphHandle:
+    # Everything a worker needs to attach: the block name and where each array
+    # lives in it. Small enough to pickle with every task.
+    def __init__(self, name, layout, number_of_nodes, number_of_edges):
+        self.name = name
+        self.layout = layout
+        self.number_of_nodes = number_of_nodes
+        self.number_of_edges = number_of_edges
+
+
+def _pack(arrays):
+    layout, offset = {}, 0
+    for key, array in arrays.items():
+        layout[key] = (offset, array.dtype.str, array.shape[0])
+        # Keep every array 8-byte aligned
+        offset += (array.nbytes + 7) // 8 * 8
+    return layout, max(offset, 8)
+
+
+def _open(name):
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # Attaching would register the block with the resource tracker, which then
+    # unlinks it when this process exits; only the owner may do that
+    from multiprocessing import resource_tracker
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args, **kwargs: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+class SharedGraph:
+    # Frozen CSR export of a knowledge graph into one shared memory block.
+    # Edges keep networkx insertion order so traversals tie-break identically.
+    def __init__(self, kg):
+        nodes = list(kg.nodes())
+        node_ids = {node: i for i, node in enumerate(nodes)}
+        strings = [str(node) for node in nodes]
+        string_ids = {}
+
+        def intern(value):
+            value = str(value)
+            if value not in string_ids:
+                string_ids[value] = len(strings)
+                strings.append(value)
+            return string_ids[value]
+
+        out_offsets = np.zeros(len(nodes) + 1, dtype=np.int64)
+        targets, relation, first_sentence = [], [], []
+        rel_offsets, rel_ids, rel_counts = [0], [], []
+        sent_offsets, sent_ids = [0], []
+        for i, node in enumerate(nodes):
+            for _, target, data in kg.out_edges(node, data=True):
+                targets.append(node_ids[target])
+                relation.append(intern(data.get('relation', 'unknown')))
+                first_sentence.append(-1 if data.get('sentence_id') is None else data['sentence_id'])
+                relations = data.get('relations') or {data.get('relation', 'unknown'): 1}
+                rel_ids.extend(intern(rel) for rel in relations)
+                rel_counts.extend(relations.values())
+                rel_offsets.append(len(rel_ids))
+                sent_ids.extend(data.get('sentence_ids') or ())
+                sent_offsets.append(len(sent_ids))
+            out_offsets[i + 1] = len(targets)
+
+        targets = np.asarray(targets, dtype=np.int32)
+        sources = np.repeat(np.arange(len(nodes), dtype=np.int32), np.diff(out_offsets))
+        # In-edges point back at out-edge indices so attributes are stored once
+        in_edge = np.argsort(targets, kind='stable').astype(np.int64)
+        in_offsets = np.zeros(len(nodes) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(targets, minlength=len(nodes)), out=in_offsets[1:])
+
+        node_attrs = [kg.nodes[node] for node in nodes]
+        node_sentence = np.array([-1 if a.get('sentence_id') is None else a['sentence_id']
+                                  for a in node_attrs], dtype=np.int64)
+        node_type = np.array([intern(a.get('node_type', 'entity')) for a in node_attrs], dtype=np.int32)
+
+        encoded = [s.encode('utf-8') for s in strings]
+        string_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=string_offsets[1:])
+
+        arrays = {
+            'out_offsets': out_offsets,
+            'out_targets': targets,
+            'in_offsets': in_offsets,
+            'in_sources': sources[in_edge],
+            'in_edge': in_edge,
+            'edge_relation': np.asarray(relation, dtype=np.int32),
+            'edge_sentence': np.asarray(first_sentence, dtype=np.int64),
+            'rel_offsets': np.asarray(rel_offsets, dtype=np.int64),
+            'rel_ids': np.asarray(rel_ids, dtype=np.int32),
+            'rel_counts': np.asarray(rel_counts, dtype=np.int32),
+            'sent_offsets': np.asarray(sent_offsets, dtype=np.int64),
+            'sent_ids': np.asarray(sent_ids, dtype=np.int64),
+            'node_sentence': node_sentence,
+            'node_type': node_type,
+            'string_offsets': string_offsets,
+            'string_data': np.frombuffer(b''.join(encoded), dtype=np.uint8),
+        }
+        layout, size = _pack(arrays)
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        for key, array in arrays.items():
+            offset, dtype, length = layout[key]
+            np.ndarray((length,), dtype=dtype, buffer=self.shm.buf, offset=offset)[:] = array
+        self.handle = SharedGraphHandle(self.shm.name, layout, len(nodes), len(targets))
+        self._view = None
+
+    @property
+    def view(self):
+        if self._view is None:
+            self._view = SharedGraphView(self.handle, self.shm)
+        return self._view
+
+    def close(self):
+        _attached.pop(self.handle.name, None)
+        self._view = None
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _NodeView:
+    def __init__(self, graph):
+        self._graph = graph
+
+    def __call__(self, data=False):
+        if data:
+            return ((name, self[name]) for name in self._graph.names[:len(self)])
+        return iter(self._graph)
+
+    def __getitem__(self, node):
+        i = self._graph.ids[node]
+        sentence_id = int(self._graph.node_sentence[i])
+        return {'sentence_id': None if sentence_id < 0 else sentence_id,
+                'node_type': self._graph.names[self._graph.node_type[i]]}
+
+    def __iter__(self):
+        return iter(self._graph)
+
+    def __len__(self):
+        return self._graph.number_of_nodes()
+
+    def __contains__(self, node):
+        return node in self._graph.ids
+
+
+class _Adjacency:
+    def __init__(self, graph, source):
+        self._graph = graph
+        self._source = source
+
+    def __getitem__(self, target):
+        edge = self._graph._edge_index(self._source, target)
+        if edge is None:
+            raise KeyError(target)
+        return self._graph._edge_data(edge)
+
+    def get(self, target, default=None):
+        edge = self._graph._edge_index(self._source, target)
+        return default if edge is None else self._graph._edge_data(edge)
+
+    def __contains__(self, target):
+        return self._graph._edge_index(self._source, target) is not None
+
+    def __iter__(self):
+        return self._graph.successors(self._source)
+
+    def __len__(self):
+        return self._graph.out_degree(self._source)
+
+
+class SharedGraphView:
+    # Read-only, networkx-like view over an exported graph: the subset of the
+    # DiGraph API used by GraphTraverser and EntropyBoundaryDetector, plus
+    # clustering() so the detector doesn't need to_undirected()
+    def __init__(self, handle, shm=None):
+        self.handle = handle
+        self._shm = shm or _open(handle.name)
+        for key, (offset, dtype, length) in handle.layout.items():
+            setattr(self, key, np.ndarray((length,), dtype=dtype, buffer=self._shm.buf, offset=offset))
+        data = self.string_data.tobytes()
+        offsets = self.string_offsets.tolist()
+        self.names = [data[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
+        self.ids = {self.names[i]: i for i in range(handle.number_of_nodes)}
+        self.graph = {}
+        self.nodes = _NodeView(self)
+        self._out_offsets = self.out_offsets.tolist()
+        self._in_offsets = self.in_offsets.tolist()
+
+    def __reduce__(self):
+        # Pickling sends only the handle; the receiving process attaches
+        return attach, (self.handle,)
+
+    def __len__(self):
+        return self.handle.number_of_nodes
+
+    def __iter__(self):
+        return iter(self.names[:self.handle.number_of_nodes])
+
+    def __contains__(self, node):
+        return node in self.ids
+
+    def __getitem__(self, node):
+        return _Adjacency(self, node)
+
+    def number_of_nodes(self):
+        return self.handle.number_of_nodes
+
+    def number_of_edges(self):
+        return self.handle.number_of_edges
+
+    def has_node(self, node):
+        return node in self.ids
+
+    def _out(self, i):
+        return self.out_targets[self._out_offsets[i]:self._out_offsets[i + 1]]
+
+    def _in(self, i):
+        return self.in_sources[self._in_offsets[i]:self._in_offsets[i + 1]]
+
+    def successors(self, node):
+        return (self.names[j] for j in self._out(self.ids[node]).tolist())
+
+    neighbors = successors
+
+    def predecessors(self, node):
+        return (self.names[j] for j in self._in(self.ids[node]).tolist())
+
+    def out_degree(self, node):
+        i = self.ids[node]
+        return self._out_offsets[i + 1] - self._out_offsets[i]
+
+    def in_degree(self, node):
+        i = self.ids[node]
+        return self._in_offsets[i + 1] - self._in_offsets[i]
+
+    def degree(self, nbunch=None):
+        # As DiGraph.degree: a single node's degree, or (node, degree) for
+        # every node of an iterable nbunch that is in the graph
+        try:
+            if nbunch in self.ids:
+                return self.out_degree(nbunch) + self.in_degree(nbunch)
+        except TypeError:
+            # Unhashable, so a container of nodes (a list or set)
+            pass
+        nodes = self if nbunch is None else [node for node in nbunch if node in self.ids]
+        return [(node, self.degree(node)) for node in nodes]
+
+    def _edge_index(self, source, target):
+        i, j = self.ids.get(source), self.ids.get(target)
+        if i is None or j is None:
+            return None
+        hits = np.flatnonzero(self._out(i) == j)
+        return self._out_offsets[i] + int(hits[0]) if len(hits) else None
+
+    def has_edge(self, source, target):
+        return self._edge_index(source, target) is not None
+
+    def _edge_data(self, edge):
+        rels = slice(self.rel_offsets[edge], self.rel_offsets[edge + 1])
+        sents = slice(self.sent_offsets[edge], self.sent_offsets[edge + 1])
+        sentence_id = int(self.edge_sentence[edge])
+        return {
+            'relation': self.names[self.edge_relation[edge]],
+            'sentence_id': None if sentence_id < 0 else sentence_id,
+            'relations': dict(zip((self.names[r] for r in self.rel_ids[rels].tolist()),
+                                  self.rel_counts[rels].tolist())),
+            'sentence_ids': self.sent_ids[sents].tolist(),
+        }
+
+    def out_edges(self, node, data=False):
+        i = self.ids[node]
+        start = self._out_offsets[i]
+        for k, j in enumerate(self._out(i).tolist()):
+            if data:
+                yield node, self.names[j], self._edge_data(start + k)
+            else:
+                yield node, self.names[j]
+
+    def in_edges(self, node, data=False):
+        i = self.ids[node]
+        start = self._in_offsets[i]
+        for k, j in enumerate(self._in(i).tolist()):
+            if data:
+                yield self.names[j], node, self._edge_data(int(self.in_edge[start + k]))
+            else:
+                yield self.names[j], node
+
+    def _undirected(self, i):
+        return (set(self._out(i).tolist()) | set(self._in(i).tolist())) - {i}
+
+    def clustering(self, node):
+        # Same definition as nx.clustering on the undirected view
+        i = self.ids[node]
+        neighbors = self._undirected(i)
+        k = len(neighbors)
+        if k < 2:
+            return 0.0
+        triangles = sum(len(neighbors & self._undirected(j)) for j in neighbors)
+        return triangles / (k * (k - 1))
+
+
+def attach(handle):
+    # One view per block per process, so worker-side caches are reused
+    view = _attached.get(handle.name)
+    if view is None:
+        view = _attached[handle.name] = SharedGraphView(handle)
+    return view
+
+
+def export_graph(kg):
+    return SharedGraph(kg)
@@ -0,0 +1,221 @@
+import os
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+from functools import lru_cache
+
+DEFAULT_MAX_MB = int(os.environ.get('CC_SHARED_CACHE_MB', 1024))
+
+# Rough per-item footprint of a networkx DiGraph with our attributes
+GRAPH_NODE_BYTES = 600
+GRAPH_EDGE_BYTES = 900
+
+
+def estimate_size(value):
+    if hasattr(value, 'memory_usage') and hasattr(value, 'columns'):
+        return int(value.memory_usage(deep=True).sum())
+    if hasattr(value, 'number_of_edges'):
+        sentences = value.graph.get('sentences', [])
+        return (value.number_of_nodes() * GRAPH_NODE_BYTES + value.number_of_edges() * GRAPH_EDGE_BYTES
+                + sum(sys.getsizeof(s) for s in sentences) + getattr(value.graph.get('offsets'), 'nbytes', 0))
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sys.getsizeof(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class _Entry:
+    __slots__ = ('value', 'size', 'refs')
+
+    def __init__(self, value, size):
+        self.value = value
+        self.size = size
+        self.refs = 0
+
+
+class ResourceHandle:
+    # What a session keeps instead of the resource itself. The reference is
+    # released when the handle is released or garbage collected with the session.
+    def __init__(self, pool, key):
+        self.pool = pool
+        self.key = key
+        self._finalizer = weakref.finalize(self, pool._release, key)
+
+    @property
+    def value(self):
+        return self.pool.peek(self.key)
+
+    @property
+    def released(self):
+        return not self._finalizer.alive
+
+    def release(self):
+        self._finalizer()
+
+    def _rebind(self, key):
+        self._finalizer.detach()
+        self.key = key
+        self._finalizer = weakref.finalize(self, self.pool._release, key)
+
+
+class ResourcePool:
+    # Process-wide, thread-safe store shared by every session. Entries are
+    # reference counted; once the total size passes max_bytes, the least
+    # recently used entries that no session holds are evicted. Entries in use
+    # are never evicted, so the ceiling can be exceeded while they're pinned.
+    def __init__(self, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self._building = {}
+
+    def peek(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            self._entries.move_to_end(key)
+            return entry.value
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def refs(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry.refs if entry else 0
+
+    def get(self, key):
+        # Handle on an existing entry, or None
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self.hits += 1
+            return self._acquire_locked(key)
+
+    def put(self, key, value, size=None):
+        # Returns a handle; if the key is already present the existing value wins
+        with self._lock:
+            if key not in self._entries:
+                entry = _Entry(value, estimate_size(value) if size is None else size)
+                self._entries[key] = entry
+                self.total_bytes += entry.size
+            return self._acquire_locked(key)
+
+    def acquire(self, key, factory, size=None):
+        # factory() runs at most once per key at a time, outside the pool lock,
+        # so concurrent sessions asking for the same corpus or graph share a build
+        while True:
+            with self._lock:
+                if key in self._entries:
+                    self.hits += 1
+                    return self._acquire_locked(key)
+                building = self._building.get(key)
+                if building is None:
+                    building = self._building[key] = threading.Event()
+                    owner = True
+                else:
+                    owner = False
+            if not owner:
+                building.wait()
+                continue
+            try:
+                value = factory()
+                with self._lock:
+                    self.misses += 1
+                    return self.put(key, value, size)
+            finally:
+                with self._lock:
+                    self._building.pop(key, None)
+                building.set()
+
+    def update(self, handle, new_key, update, copy):
+        # Change the value behind handle with update(value) and file it under
+        # new_key, as one step under the lock: in place if handle is its only
+        # holder, otherwise on copy(value) so other sessions keep the original.
+        # If new_key is already present that value is used instead. Returns the
+        # handle to keep (handle itself when changed in place).
+        with self._lock:
+            if new_key in self._entries:
+                self.hits += 1
+                return self._acquire_locked(new_key)
+            entry = self._entries[handle.key]
+            if entry.refs == 1:
+                update(entry.value)
+                del self._entries[handle.key]
+                self._entries[new_key] = entry
+                handle._rebind(new_key)
+                self.resize(new_key)
+                return handle
+            value = copy(entry.value)
+            update(value)
+            return self.put(new_key, value)
+
+    def resize(self, key, size=None):
+        # For values that grow in place (e.g. a graph that was appended to)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            new_size = estimate_size(entry.value) if size is None else size
+            self.total_bytes += new_size - entry.size
+            entry.size = new_size
+            self._evict_locked()
+
+    def _acquire_locked(self, key):
+        entry = self._entries[key]
+        entry.refs += 1
+        self._entries.move_to_end(key)
+        handle = ResourceHandle(self, key)
+        self._evict_locked()
+        return handle
+
+    def _release(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.refs > 0:
+                entry.refs -= 1
+            self._evict_locked()
+
+    def _evict_locked(self):
+        if self.total_bytes <= self.max_bytes:
+            return
+        for key in list(self._entries):
+            if self.total_bytes <= self.max_bytes:
+                break
+            entry = self._entries[key]
+            if entry.refs == 0:
+                del self._entries[key]
+                self.total_bytes -= entry.size
+                self.evictions += 1
+
+    def clear_unused(self):
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if e.refs == 0]:
+                self.total_bytes -= self._entries.pop(key).size
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'pinned': sum(1 for e in self._entries.values() if e.refs),
+                'total_mb': round(self.total_bytes / 2 ** 20, 1),
+                'max_mb': round(self.max_bytes / 2 ** 20, 1),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+@lru_cache(maxsize=None)
+def get_resource_pool():
+    return ResourcePool()
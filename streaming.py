@@ -0,0 +1,117 @@
+import argparse
+import json
+import sys
+from collections import deque
+import networkx as nx
+from kg_builder import KnowledgeGraphBuilder
+from entropy_model import EntropyBoundaryDetector
+from traversal import GraphTraverser
+from nlp_utils import TextProcessor
+from sentence_splitter import normalize_whitespace
+
+
+def stream_sentence_spans(chunks, processor=None):
+    # Split an unbounded stream of text chunks into (sentence, (start, end))
+    # with offsets into the concatenated stream; the last, possibly unfinished,
+    # sentence is held back until more text (or the end of the stream) arrives
+    processor = processor or TextProcessor()
+    buffer, offset = '', 0
+    for chunk in chunks:
+        buffer += chunk
+        spans = processor.splitter.span_tokenize(buffer)
+        if len(spans) > 1:
+            for start, end in spans[:-1]:
+                sent = normalize_whitespace(buffer[start:end])
+                if len(sent) > 5:
+                    yield sent, (offset + start, offset + end)
+            cut = spans[-1][0]
+            buffer = buffer[cut:]
+            offset += cut
+    sentences, spans = processor.extract_sentence_spans(buffer)
+    for sent, (start, end) in zip(sentences, spans):
+        yield sent, (offset + start, offset + end)
+
+
+def stream_sentences(chunks, processor=None):
+    for sent, _ in stream_sentence_spans(chunks, processor):
+        yield sent
+
+
+class StreamingBoundaryDetector:
+    def __init__(self, window=50, threshold=0.8, max_depth=10, window_size=3,
+                 backend='nltk', **backend_options):
+        self.window = window
+        self.max_depth = max_depth
+        self.builder = KnowledgeGraphBuilder(backend, **backend_options)
+        self.detector = EntropyBoundaryDetector(threshold=threshold, window_size=window_size)
+        self.kg = nx.DiGraph()
+        self.next_sentence_id = 0
+        self._window_triplets = deque()
+
+    def process(self, sentences):
+        pending = deque()
+
+        def feed():
+            for sent in sentences:
+                pending.append(sent)
+                yield sent
+
+        for triplets in self.builder.extractor.iter_extract(feed()):
+            yield self.add_sentence(pending.popleft(), triplets)
+
+    def add_sentence(self, sentence, triplets):
+        sent_id = self.next_sentence_id
+        self.next_sentence_id += 1
+
+        normalized = self.builder.add_sentence(self.kg, triplets, sent_id)
+        self._window_triplets.append((sent_id, triplets))
+        while self._window_triplets and self._window_triplets[0][0] <= sent_id - self.window:
+            old_id, old_triplets = self._window_triplets.popleft()
+            self.builder.remove_sentence(self.kg, old_triplets, old_id)
+
+        # The window graph changes every sentence, so the degree normaliser is
+        # recomputed here rather than taken from the per-graph cache
+        max_degree = max((d for _, d in self.kg.degree()), default=0)
+        traverser = GraphTraverser(self.kg, self.detector, max_degree=max_degree)
+
+        traversals = []
+        for start_node in dict.fromkeys(subj for subj, _, _ in normalized):
+            if not self.kg.has_node(start_node):
+                continue
+            path, entropies = traverser.traverse_with_entropy(start_node, self.max_depth)
+            traversals.append({
+                'start_node': start_node,
+                'boundary_nodes': path,
+                'entropies': entropies,
+                'is_boundary': bool(entropies) and self.detector.is_boundary(entropies[-1], len(path)),
+            })
+
+        return {
+            'sentence_id': sent_id,
+            'sentence': sentence,
+            'boundary': any(t['is_boundary'] for t in traversals),
+            'traversals': traversals,
+            'window_nodes': self.kg.number_of_nodes(),
+            'window_edges': self.kg.number_of_edges(),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream text through the boundary detector")
+    parser.add_argument('path', nargs='?', help="Text file to read (defaults to stdin)")
+    parser.add_argument('--window', type=int, default=50)
+    parser.add_argument('--threshold', type=float, default=0.8)
+    parser.add_argument('--max-depth', type=int, default=10)
+    parser.add_argument('--backend', default='nltk')
+    args = parser.parse_args()
+
+    source = open(args.path) if args.path else sys.stdin
+    detector = StreamingBoundaryDetector(window=args.window, threshold=args.threshold,
+                                         max_depth=args.max_depth, backend=args.backend)
+    with source:
+        for decision in detector.process(stream_sentences(source)):
+            print(json.dumps(decision, default=float), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+import os
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The modules live at the repo root, not in a package
+sys.path.insert(0, ROOT)
+CSV_PATH = os.path.join(ROOT, "src", "war_and_peace_full_chapters.csv")
+
+
+def build_chapter(row):
+    import pandas as pd
+    from kg_builder import KnowledgeGraphBuilder
+    from nlp_utils import TextProcessor
+    text = pd.read_csv(CSV_PATH)['text'].iloc[row]
+    # The regex splitter and the NLTK backend's fallbacks need no downloaded data
+    sentences = TextProcessor('regex').extract_sentences(text)
+    return KnowledgeGraphBuilder('nltk').build_from_sentences(sentences)
+
+
+@pytest.fixture(scope='session')
+def chapter_graph():
+    return build_chapter(1)
+
+
+@pytest.fixture
+def detector():
+    from entropy_model import EntropyBoundaryDetector
+    return EntropyBoundaryDetector()
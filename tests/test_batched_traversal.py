@@ -0,0 +1,55 @@
+import pytest
+import batched_traversal
+from entropy_model import EntropyBoundaryDetector
+from traversal import GraphTraverser
+
+SETTINGS = [
+    {},
+    {'threshold': 0.3},
+    {'threshold': 2.0},
+    {'window_size': 0},
+    {'window_size': 1, 'threshold': 0.5},
+]
+
+
+def sequential(kg, detector, nodes, max_depth):
+    traverser = GraphTraverser(kg, detector, memoize=False)
+    return [(node,) + traverser.traverse_with_entropy(node, max_depth) for node in nodes]
+
+
+@pytest.mark.parametrize('settings', SETTINGS)
+@pytest.mark.parametrize('max_depth', [3, 10, 25])
+def test_matches_sequential_walks(chapter_graph, settings, max_depth):
+    detector = EntropyBoundaryDetector(**settings)
+    nodes = list(chapter_graph)
+    walks = GraphTraverser(chapter_graph, detector).traverse_many(nodes, max_depth, workers=1)
+    assert walks == sequential(chapter_graph, detector, nodes, max_depth)
+
+
+def test_chunks_match_one_batch(chapter_graph, detector, monkeypatch):
+    nodes = list(chapter_graph)
+    expected = sequential(chapter_graph, detector, nodes, 10)
+    # A budget of a few bitsets splits the walkers into many chunks
+    monkeypatch.setattr(batched_traversal, 'BITSET_BUDGET', 64)
+    assert GraphTraverser(chapter_graph, detector).traverse_many(nodes, 10, workers=1) == expected
+
+
+def test_progress_reports_every_walker(chapter_graph, detector):
+    nodes = list(chapter_graph)
+    calls = []
+    walks = GraphTraverser(chapter_graph, detector).traverse_many(
+        nodes, 10, workers=1, progress=lambda done, total, completed: calls.append((done, total, completed)))
+    assert calls[-1][:2] == (len(nodes), len(nodes))
+    assert sorted(walk for _, _, completed in calls for walk in completed) == sorted(walks)
+
+
+def test_trace_follows_the_unstopped_walk(chapter_graph):
+    # With no boundary ever reached, the traced paths are the full walks
+    detector = EntropyBoundaryDetector(threshold=1e9)
+    nodes = list(chapter_graph)
+    walker = batched_traversal.BatchedTraverser(chapter_graph, detector,
+                                                GraphTraverser(chapter_graph, detector).max_degree)
+    trace = walker.trace(nodes, 10)
+    names = walker.graph.nodes
+    for i, (_, path, _) in enumerate(sequential(chapter_graph, detector, nodes, 10)):
+        assert [names[j] for j in trace['path'][i, :trace['length'][i]]] == path
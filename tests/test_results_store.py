@@ -0,0 +1,106 @@
+import csv
+import math
+import pytest
+from results_store import EXPORT_COLUMNS, ResultStore
+from traversal import GraphTraverser
+
+TRAVERSALS = [
+    ('a', ['a', 'b', 'c'], [0.5, 0.25, 1.5]),
+    # A walk that stopped before scoring its last node
+    ('b', ['b', 'c'], [0.75]),
+    ('c', ['c'], []),
+    ('d', ['d', 'a', 'é'], [0.1, 0.2, 0.3]),
+]
+
+
+def step_rows(traversals):
+    rows = []
+    for i, (start, path, entropies) in enumerate(traversals):
+        for step, node in enumerate(path):
+            rows.append((i, start, step, node, entropies[step] if step < len(entropies) else None))
+    return rows
+
+
+def same_rows(rows, expected):
+    assert len(rows) == len(expected)
+    for row, want in zip(rows, expected):
+        assert row[:4] == want[:4]
+        if want[4] is None:
+            assert row[4] is None or math.isnan(row[4])
+        else:
+            assert row[4] == pytest.approx(want[4])
+
+
+@pytest.fixture(scope='module')
+def chapter_traversals(chapter_graph):
+    from entropy_model import EntropyBoundaryDetector
+    return GraphTraverser(chapter_graph, EntropyBoundaryDetector()).traverse_many(list(chapter_graph), workers=1)
+
+
+def test_indexing_round_trips():
+    store = ResultStore.from_traversals(TRAVERSALS)
+    assert len(store) == len(TRAVERSALS)
+    assert [(r['start_node'], r['boundary_nodes'], r['entropies']) for r in store] == TRAVERSALS
+    assert store[-1]['boundary_nodes'] == ['d', 'a', 'é']
+    with pytest.raises(IndexError):
+        store[len(TRAVERSALS)]
+    assert not ResultStore()
+
+
+def test_growing_columns_keep_results(chapter_traversals):
+    store = ResultStore()
+    for traversal in chapter_traversals:
+        store.append(*traversal)
+    assert [(r['start_node'], r['boundary_nodes'], r['entropies']) for r in store] == \
+        [(node, path, [float(e) for e in entropies]) for node, path, entropies in chapter_traversals]
+
+
+def test_summary():
+    summary = ResultStore.from_traversals(TRAVERSALS).summary()
+    assert summary['start_node'] == ['a', 'b', 'c', 'd']
+    assert summary['boundary_nodes'].tolist() == [3, 2, 1, 3]
+    assert summary['steps'].tolist() == [3, 1, 0, 3]
+    assert summary['has_entropy'].tolist() == [True, True, False, True]
+    assert summary['avg_entropy'] == pytest.approx([0.75, 0.75, 0.0, 0.2])
+    assert summary['max_entropy'] == pytest.approx([1.5, 0.75, 0.0, 0.3])
+    assert summary['min_entropy'] == pytest.approx([0.25, 0.75, 0.0, 0.1])
+
+
+@pytest.mark.parametrize('batch_rows', [1, 2, 5, 65536])
+def test_batches_cover_every_step(batch_rows):
+    rows = []
+    for batch, names in ResultStore.from_traversals(TRAVERSALS).iter_batches(batch_rows):
+        assert set(batch) == set(EXPORT_COLUMNS)
+        for result, start, step, node, entropy in zip(*(batch[c].tolist() for c in EXPORT_COLUMNS)):
+            rows.append((result, names[start], step, names[node], entropy))
+    same_rows(rows, step_rows(TRAVERSALS))
+
+
+def test_csv_round_trip(tmp_path, chapter_traversals):
+    path = str(tmp_path / "steps.csv")
+    ResultStore.from_traversals(chapter_traversals).to_csv(path, batch_rows=7)
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        assert tuple(next(reader)) == EXPORT_COLUMNS
+        rows = [(int(r), s, int(step), n, float(e) if e else None) for r, s, step, n, e in reader]
+    same_rows(rows, step_rows(chapter_traversals))
+
+
+@pytest.mark.parametrize('fmt', ['parquet', 'arrow'])
+def test_arrow_round_trip(tmp_path, fmt):
+    pa = pytest.importorskip('pyarrow')
+    path = str(tmp_path / f"steps.{fmt}")
+    store = ResultStore.from_traversals(TRAVERSALS)
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        store.to_parquet(path, batch_rows=2)
+        table = pq.read_table(path)
+    else:
+        store.to_arrow(path, batch_rows=2)
+        with pa.memory_map(path) as source:
+            table = pa.ipc.open_file(source).read_all()
+    assert table.column_names == list(EXPORT_COLUMNS)
+    columns = [table.column(c).to_pylist() for c in EXPORT_COLUMNS]
+    same_rows(list(zip(*columns)), step_rows(TRAVERSALS))
+    # The unscored step is a null, not a NaN
+    assert columns[4][4] is None
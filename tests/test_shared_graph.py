@@ -0,0 +1,80 @@
+import pickle
+from multiprocessing import shared_memory
+import networkx as nx
+import pytest
+from shared_graph import SharedGraph, SharedGraphView
+from traversal import GraphTraverser
+
+
+@pytest.fixture
+def shared(chapter_graph):
+    with SharedGraph(chapter_graph) as exported:
+        yield exported
+
+
+def test_nodes_and_edges_match(chapter_graph, shared):
+    view = shared.view
+    assert list(view) == list(chapter_graph)
+    assert view.number_of_nodes() == chapter_graph.number_of_nodes()
+    assert view.number_of_edges() == chapter_graph.number_of_edges()
+    for node in chapter_graph:
+        assert view.has_node(node)
+        # Insertion order is kept, so greedy tie-breaks match
+        assert list(view.successors(node)) == list(chapter_graph.successors(node))
+        assert sorted(view.predecessors(node)) == sorted(chapter_graph.predecessors(node))
+        assert view.nodes[node]['sentence_id'] == chapter_graph.nodes[node].get('sentence_id')
+    assert not view.has_node('no such node')
+
+
+def test_degree_matches(chapter_graph, shared):
+    view = shared.view
+    nodes = list(chapter_graph)
+    for node in nodes:
+        assert view.degree(node) == chapter_graph.degree(node)
+        assert view.in_degree(node) == chapter_graph.in_degree(node)
+        assert view.out_degree(node) == chapter_graph.out_degree(node)
+    assert list(view.degree()) == list(chapter_graph.degree())
+    some = nodes[:5] + ['no such node']
+    assert list(view.degree(some)) == list(chapter_graph.degree(some))
+    assert list(view.degree(set(nodes[:5]))) == list(chapter_graph.degree(set(nodes[:5])))
+
+
+def test_edge_data_matches(chapter_graph, shared):
+    view = shared.view
+    for source, target, data in chapter_graph.edges(data=True):
+        assert view.has_edge(source, target)
+        shared_data = view[source][target]
+        assert shared_data['relation'] == data['relation']
+        assert shared_data['sentence_ids'] == list(data.get('sentence_ids') or ())
+    assert [(s, t) for s, t, _ in view.out_edges(next(iter(view)), data=True)] == \
+        list(chapter_graph.out_edges(next(iter(chapter_graph))))
+
+
+def test_clustering_matches_undirected_networkx(chapter_graph, shared):
+    expected = nx.clustering(chapter_graph.to_undirected())
+    for node in chapter_graph:
+        assert shared.view.clustering(node) == pytest.approx(expected[node])
+
+
+def test_traversal_on_view_matches_graph(chapter_graph, shared, detector):
+    nodes = list(chapter_graph)
+    expected = [GraphTraverser(chapter_graph, detector).traverse_with_entropy(n) for n in nodes]
+    traverser = GraphTraverser(shared.view, detector)
+    assert traverser.max_degree == GraphTraverser(chapter_graph, detector).max_degree
+    assert [traverser.traverse_with_entropy(n) for n in nodes] == expected
+
+
+def test_pickling_sends_the_handle(shared):
+    data = pickle.dumps(shared.view)
+    assert len(data) < 4096
+    view = pickle.loads(data)
+    assert isinstance(view, SharedGraphView)
+    assert list(view) == list(shared.view)
+
+
+def test_close_unlinks_the_block(chapter_graph):
+    exported = SharedGraph(chapter_graph)
+    name = exported.handle.name
+    exported.close()
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=name)
@@ -0,0 +1,79 @@
+import networkx as nx
+import pytest
+from components import get_component_index
+from entropy_model import EntropyBoundaryDetector
+from traversal import GraphTraverser, SuffixMemo
+
+# Settings under which walkers converge on shared suffixes in a chapter graph
+CONVERGING = [
+    {'threshold': 2.0},
+    {'window_size': 1, 'threshold': 0.5},
+]
+
+
+def walk_all(traverser, nodes, max_depth=10):
+    return [(node,) + traverser.traverse_with_entropy(node, max_depth) for node in nodes]
+
+
+@pytest.mark.parametrize('settings', CONVERGING)
+def test_memoized_walks_match(chapter_graph, settings):
+    detector = EntropyBoundaryDetector(**settings)
+    nodes = list(chapter_graph)
+    memoized = GraphTraverser(chapter_graph, detector)
+    assert walk_all(memoized, nodes) == walk_all(GraphTraverser(chapter_graph, detector, memoize=False), nodes)
+    stats = memoized.memo_stats()
+    assert stats['hits'] > 0
+    assert stats['walks'] == len(nodes)
+    assert stats['saved'] == round(stats['reused_steps'] / (stats['reused_steps'] + stats['computed_steps']), 4)
+
+
+def test_repeated_walks_are_reused(chapter_graph):
+    detector = EntropyBoundaryDetector()
+    nodes = list(chapter_graph)
+    traverser = GraphTraverser(chapter_graph, detector)
+    first = walk_all(traverser, nodes)
+    computed = traverser.memo_stats()['computed_steps']
+    assert walk_all(traverser, nodes) == first
+    stats = traverser.memo_stats()
+    # Every second walk is replayed from its own recorded start
+    assert stats['computed_steps'] == computed
+    assert stats['hits'] >= len(nodes)
+
+
+def test_visited_nodes_block_reuse(detector):
+    # From the hub h, the walker that started at x can't step back to x and
+    # takes y; the walker from b reaches h in the same state but hasn't
+    # visited x, so it must not reuse that suffix
+    kg = nx.DiGraph(sentences=[])
+    for source, target in [('x', 'h'), ('b', 'h'), ('h', 'x'), ('h', 'y')]:
+        kg.add_edge(source, target, relation='sees', sentence_id=0)
+    detector = EntropyBoundaryDetector(threshold=1e9, window_size=1)
+    traverser = GraphTraverser(kg, detector)
+    assert traverser.traverse_with_entropy('x')[0] == ['x', 'h', 'y']
+    assert traverser.traverse_with_entropy('b')[0] == ['b', 'h', 'x']
+    assert traverser.memo_stats()['hits'] == 0
+
+
+def test_full_memo_still_walks(chapter_graph, detector):
+    nodes = list(chapter_graph)
+    traverser = GraphTraverser(chapter_graph, detector)
+    traverser.memo = SuffixMemo(max_entries=0)
+    assert walk_all(traverser, nodes) == walk_all(GraphTraverser(chapter_graph, detector, memoize=False), nodes)
+    assert traverser.memo_stats()['entries'] == 0
+
+
+@pytest.mark.parametrize('settings', CONVERGING)
+def test_sequential_vectorized_and_parallel_agree(chapter_graph, settings):
+    # Two copies of the chapter, so start nodes fall into two component batches
+    kg = nx.compose(chapter_graph, nx.relabel_nodes(chapter_graph, lambda node: f"{node}#2"))
+    assert len(get_component_index(kg).batches(list(kg))) > 1
+    detector = EntropyBoundaryDetector(**settings)
+    nodes = list(kg)
+    expected = walk_all(GraphTraverser(kg, detector, memoize=False), nodes)
+    assert GraphTraverser(kg, detector).traverse_many(nodes, 10, workers=1) == expected
+    assert GraphTraverser(kg, detector).traverse_many(nodes, 10, workers=1, vectorized=False) == expected
+    # Worker processes attach to a shared export; their memo stats are merged back
+    parallel = GraphTraverser(kg, detector)
+    assert parallel.traverse_many(nodes, 10, workers=2, min_parallel_nodes=0, vectorized=False) == expected
+    stats = parallel.memo_stats()
+    assert stats['walks'] == len(nodes) and stats['hits'] > 0
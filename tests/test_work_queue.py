@@ -0,0 +1,109 @@
+import multiprocessing
+import time
+import pytest
+from work_queue import WorkQueue, parse_rows, run_worker
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return WorkQueue(str(tmp_path / "queue.sqlite"), lease_seconds=60, max_attempts=2)
+
+
+def journal_mode(queue):
+    return queue._connection().execute("PRAGMA journal_mode").fetchone()[0]
+
+
+def test_enqueue_is_idempotent(queue):
+    assert queue.enqueue('chapter', 'chapter-0', {'row': 0})
+    assert not queue.enqueue('chapter', 'chapter-0', {'row': 0})
+    assert queue.stats()['pending'] == 1
+
+
+def test_claims_are_exclusive(queue):
+    for row in range(2):
+        queue.enqueue('chapter', f"chapter-{row}", {'row': row})
+    first, second = queue.claim('a'), queue.claim('b')
+    assert (first.key, second.key) == ('chapter-0', 'chapter-1')
+    assert first.attempt == second.attempt == 1
+    assert queue.claim('c') is None
+    assert queue.stats()['leased'] == 2
+
+
+def test_expired_lease_moves_to_another_worker(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.sqlite"), lease_seconds=0.05, max_attempts=3)
+    queue.enqueue('chapter', 'chapter-0', {'row': 0})
+    stale = queue.claim('a')
+    time.sleep(0.1)
+    task = queue.claim('b')
+    assert task.key == 'chapter-0' and task.attempt == 2
+    # The worker that lost the lease can neither extend it nor write a result
+    assert not stale.heartbeat()
+    assert not stale.complete({'by': 'a'})
+    assert task.heartbeat()
+    assert task.complete({'by': 'b'})
+    assert queue.result('chapter-0') == {'by': 'b'}
+    assert queue.stats() == {'pending': 0, 'leased': 0, 'done': 1, 'failed': 0, 'results': 1}
+
+
+def test_completed_task_is_not_claimed_again(queue):
+    queue.enqueue('chapter', 'chapter-0', {'row': 0})
+    task = queue.claim('a')
+    assert task.complete([1, 2])
+    assert not task.complete([3])
+    assert not queue.enqueue('chapter', 'chapter-0', {'row': 0})
+    assert queue.claim('b') is None
+    assert queue.results('chapter') == {'chapter-0': [1, 2]}
+
+
+def test_failures_retry_until_max_attempts(queue):
+    queue.enqueue('chapter', 'chapter-0', {'row': 0})
+    queue.claim('a').fail("first")
+    assert queue.stats()['pending'] == 1
+    queue.claim('a').fail("second")
+    assert queue.stats()['failed'] == 1
+    assert queue.claim('a') is None
+    assert queue.retry_failed() == 1
+    assert queue.claim('a').attempt == 1
+
+
+def test_expired_lease_out_of_attempts_fails(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.sqlite"), lease_seconds=0.05, max_attempts=1)
+    queue.enqueue('chapter', 'chapter-0', {'row': 0})
+    queue.claim('a')
+    time.sleep(0.1)
+    assert queue.claim('b') is None
+    assert queue.stats()['failed'] == 1
+
+
+def test_journal_mode(tmp_path):
+    assert journal_mode(WorkQueue(str(tmp_path / "delete.sqlite"))) == 'delete'
+    assert journal_mode(WorkQueue(str(tmp_path / "wal.sqlite"), wal=True)) == 'wal'
+
+
+def double(payload):
+    return payload['row'] * 2
+
+
+def drain(path, worker):
+    run_worker(WorkQueue(path), worker, handlers={'double': double}, poll_interval=0.05, log=lambda *_: None)
+
+
+def test_workers_drain_the_queue_once(tmp_path):
+    path = str(tmp_path / "queue.sqlite")
+    queue = WorkQueue(path)
+    for row in range(40):
+        queue.enqueue('double', f"double-{row}", {'row': row})
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=drain, args=(path, f"worker-{i}")) for i in range(4)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join(60)
+        assert process.exitcode == 0
+    assert queue.stats()['done'] == 40
+    assert queue.results('double') == {f"double-{row}": row * 2 for row in range(40)}
+
+
+def test_parse_rows():
+    assert parse_rows("0-2,5,9", 6) == [0, 1, 2, 5]
+    assert parse_rows(None, 3) == [0, 1, 2]
@@ -1,11 +1,93 @@
+import os
 import numpy as np
 from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import networkx as nx
+from components import get_component_index
+from graph_cache import get_max_degree
+from shared_graph import SharedGraph, attach
+from batched_traversal import PREFERRED_RELATIONS, BatchedTraverser
+
+
+def _traverse_batch(handle, detector, start_nodes, max_depth, max_degree):
+    traverser = GraphTraverser(attach(handle), detector, max_degree=max_degree)
+    walks = [traverser.traverse_with_entropy(node, max_depth) for node in start_nodes]
+    return walks, traverser.memo_stats()
+
+
+class SuffixMemo:
+    # Finished walk suffixes, keyed by everything the rest of a greedy walk
+    # depends on: the context (last 10 nodes stepped to, which also fixes the
+    # boundary threshold factor), the semantic window and the remaining depth.
+    # The visited set only matters through the neighbours it made a walker
+    # skip, so each suffix keeps the earlier nodes that must be visited (and
+    # its own nodes, which must not be) for it to replay the same way.
+    def __init__(self, max_entries=100000, per_key=4):
+        self.max_entries = max_entries
+        self.per_key = per_key
+        self._entries = {}
+        self.size = 0
+        self.walks = 0
+        self.lookups = 0
+        self.hits = 0
+        self.reused_steps = 0
+        self.computed_steps = 0
+
+    def key(self, path, context, window, remaining):
+        return (tuple(context), tuple(path[-window:]), remaining)
+
+    def find(self, key, visited):
+        self.lookups += 1
+        for entry in self._entries.get(key, ()):
+            nodes, entropies, required, suffix = entry
+            if required <= visited and suffix.isdisjoint(visited):
+                self.hits += 1
+                self.reused_steps += len(entropies)
+                return entry
+        return None
+
+    def record(self, keys, path, entropies, skipped, reused=None):
+        # keys[i] is the state at path[i]; skipped[j] the visited neighbours
+        # passed over when leaving path[j]
+        self.walks += 1
+        if self.size >= self.max_entries:
+            return
+        position = {node: i for i, node in enumerate(path)}
+        pending = list(reused[2]) if reused else []
+        for i in range(len(keys) - 1, -1, -1):
+            if i < len(skipped):
+                pending.extend(skipped[i])
+            entries = self._entries.setdefault(keys[i], [])
+            if len(entries) >= self.per_key:
+                continue
+            required = frozenset(node for node in pending if position[node] <= i)
+            entries.append((tuple(path[i + 1:]), tuple(entropies[i:]), required, frozenset(path[i + 1:])))
+            self.size += 1
+
+    def merge(self, stats):
+        for name in ('walks', 'lookups', 'hits', 'reused_steps', 'computed_steps'):
+            setattr(self, name, getattr(self, name) + stats.get(name, 0))
+
+    def stats(self):
+        steps = self.reused_steps + self.computed_steps
+        return {
+            'walks': self.walks,
+            'lookups': self.lookups,
+            'hits': self.hits,
+            'reused_steps': self.reused_steps,
+            'computed_steps': self.computed_steps,
+            'saved': round(self.reused_steps / steps, 4) if steps else 0.0,
+            'entries': self.size,
+        }
+
 
 class GraphTraverser:
-    def __init__(self, kg, entropy_detector):
+    def __init__(self, kg, entropy_detector, max_degree=None, memoize=True):
         self.kg = kg
         self.detector = entropy_detector
+        self.max_degree = max_degree if max_degree is not None else get_max_degree(kg)
+        # Assumes the graph doesn't change under the traverser, like max_degree
+        self.memo = SuffixMemo() if memoize else None
         
     def traverse_with_entropy(self, start_node, max_depth=10):
         visited = set()
@@ -16,14 +98,31 @@ class GraphTraverser:
         current = start_node
         visited.add(current)
         
+        # A window of 0 means the whole path, which no two walkers share
+        window = self.detector.window_size
+        memo = self.memo if window > 0 else None
+        keys, skipped, reused = [], [], None
+        
         for depth in range(max_depth):
+            if memo is not None:
+                key = memo.key(path, context, window, max_depth - depth)
+                reused = memo.find(key, visited)
+                if reused is not None:
+                    path.extend(reused[0])
+                    entropies.extend(reused[1])
+                    break
+                keys.append(key)
+                memo.computed_steps += 1
+            
             entropy = self.detector.compute_node_entropy(self.kg, current, path, context)
             entropies.append(entropy)
             
             if self.detector.is_boundary(entropy, len(path)):
                 break
-                
-            next_node = self._select_next_node(current, visited)
+            
+            passed_over = []
+            skipped.append(passed_over)
+            next_node = self._select_next_node(current, visited, passed_over)
             if not next_node:
                 break
                 
@@ -32,11 +131,75 @@ class GraphTraverser:
             context = self.detector.update_context(context, next_node)
             current = next_node
         
+        if memo is not None:
+            memo.record(keys, path, entropies, skipped, reused)
         return path, entropies
     
-    def _select_next_node(self, current, visited):
+    def memo_stats(self):
+        return self.memo.stats() if self.memo is not None else {}
+    
+    def traverse_many(self, start_nodes, max_depth=10, workers=None, progress=None,
+                      min_parallel_nodes=64, vectorized=True):
+        # Walkers never leave their weakly connected component, so start nodes are
+        # batched per component, largest first. Workers attach to one shared memory
+        # export of the graph instead of receiving a pickled copy. progress is called
+        # as progress(done, total, completed) with the (node, path, entropies) just finished.
+        # vectorized runs every walker in lockstep in this process (BatchedTraverser).
+        batches = get_component_index(self.kg).batches(start_nodes)
+        total = sum(len(starts) for _, starts in batches)
+        workers = workers or os.cpu_count() or 1
+        results = {}
+        done = 0
+
+        if vectorized:
+            def on_step(completed):
+                nonlocal done
+                done += len(completed)
+                if progress:
+                    progress(done, total, completed)
+
+            starts = [node for _, batch in batches for node in batch]
+            walker = BatchedTraverser(self.kg, self.detector, self.max_degree)
+            for node, result in zip(starts, walker.traverse(starts, max_depth, on_step)):
+                results[node] = result
+        elif workers <= 1 or len(batches) <= 1 or total < min_parallel_nodes:
+            for _, starts in batches:
+                for node in starts:
+                    results[node] = self.traverse_with_entropy(node, max_depth)
+                    done += 1
+                    if progress:
+                        progress(done, total, [(node,) + results[node]])
+        else:
+            shared = SharedGraph(self.kg)
+            pool = ProcessPoolExecutor(max_workers=min(workers, len(batches)))
+            try:
+                futures = {
+                    pool.submit(_traverse_batch, shared.handle, self.detector,
+                                starts, max_depth, self.max_degree): starts
+                    for _, starts in batches
+                }
+                for future in as_completed(futures):
+                    starts = futures[future]
+                    walks, stats = future.result()
+                    if self.memo is not None:
+                        self.memo.merge(stats)
+                    completed = [(node,) + result for node, result in zip(starts, walks)]
+                    for node, path, entropies in completed:
+                        results[node] = (path, entropies)
+                    done += len(starts)
+                    if progress:
+                        progress(done, total, completed)
+            finally:
+                pool.shutdown(wait=False, cancel_futures=True)
+                shared.close()
+
+        return [(node,) + results[node] for node in start_nodes if node in results]
+    
+    def _select_next_node(self, current, visited, skipped=None):
         neighbors = list(self.kg.neighbors(current))
         unvisited = [n for n in neighbors if n not in visited]
+        if skipped is not None:
+            skipped.extend(n for n in neighbors if n in visited)
         
         if not unvisited:
             return None
@@ -53,12 +216,12 @@ class GraphTraverser:
         return unvisited[best_idx]
     
     def _compute_node_score(self, current, candidate):
-        degree_score = self.kg.degree(candidate) / max(1, max(dict(self.kg.degree()).values()))
+        degree_score = self.kg.degree(candidate) / max(1, self.max_degree)
         
         relation_score = 0.5
         if self.kg.has_edge(current, candidate):
             relation = self.kg[current][candidate].get('relation', '')
-            if relation in ['has', 'is', 'was', 'were']:
+            if relation in PREFERRED_RELATIONS:
                 relation_score = 0.8
         
         return 0.6 * degree_score + 0.4 * relation_score
@@ -2,6 +2,51 @@ import plotly.graph_objects as go
 import plotly.express as px
 import networkx as nx
 import numpy as np
+from graph_cache import get_cached
+
+
+def compute_layout(kg, layout_type):
+    if layout_type == 'spring':
+        return nx.spring_layout(kg, k=1, iterations=50)
+    elif layout_type == 'circular':
+        return nx.circular_layout(kg)
+    elif layout_type == 'random':
+        return nx.random_layout(kg)
+    else:
+        return nx.spring_layout(kg)
+
+
+class LayoutCache:
+    def __init__(self, kg):
+        self.positions = {}
+        self.stale = {}
+
+    def get(self, kg, layout_type):
+        pos = self.positions.get(layout_type)
+        stale = self.stale.pop(layout_type, set())
+        if pos is None or (stale and layout_type not in ('spring', 'random')):
+            pos = compute_layout(kg, layout_type)
+        elif stale or len(pos) != kg.number_of_nodes():
+            # Only the affected nodes move; everything else keeps its place
+            pos = {node: xy for node, xy in pos.items() if node in kg}
+            if layout_type == 'spring':
+                fixed = [node for node in pos if node not in stale]
+                pos = nx.spring_layout(kg, pos=pos or None, fixed=fixed or None, k=1, iterations=50)
+            else:
+                missing = [node for node in kg if node not in pos]
+                pos.update(zip(missing, np.random.rand(len(missing), 2)))
+        self.positions[layout_type] = pos
+        return pos
+
+    def refresh(self, kg, nodes, edges):
+        for layout_type in self.positions:
+            self.stale.setdefault(layout_type, set()).update(nodes)
+        return True
+
+
+def get_layout(kg, layout_type):
+    return get_cached(kg, 'layouts', LayoutCache).get(kg, layout_type)
+
 
 class GraphVisualizer:
     def __init__(self):
@@ -53,14 +98,7 @@ class GraphVisualizer:
         return fig
     
     def _get_layout(self, kg, layout_type):
-        if layout_type == 'spring':
-            return nx.spring_layout(kg, k=1, iterations=50)
-        elif layout_type == 'circular':
-            return nx.circular_layout(kg)
-        elif layout_type == 'random':
-            return nx.random_layout(kg)
-        else:
-            return nx.spring_layout(kg)
+        return get_layout(kg, layout_type)
     
     def _get_edge_coordinates(self, kg, pos):
         edge_x = []
@@ -0,0 +1,193 @@
+import argparse
+import itertools
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from batched_traversal import BatchedTraverser
+from entropy_model import DEFAULT_WEIGHTS, EntropyBoundaryDetector, boundary_factor
+from graph_cache import get_max_degree
+from node_ranking import node_sentence_ids
+
+CONFIG_KEYS = ('alpha', 'beta', 'gamma', 'threshold', 'window')
+
+
+class WalkTrace:
+    # Full walks from each start node with their per-step entropy components.
+    # Where a walk goes never depends on its entropy, so any alpha/beta/gamma,
+    # threshold and (without embeddings) window size is a recombination of
+    # these arrays: the walk is cut at the first step past the threshold.
+    def __init__(self, kg, start_nodes, max_depth=10, embeddings=None, window_size=3):
+        self.kg = kg
+        self.start_nodes = list(start_nodes)
+        self.max_depth = max_depth
+        # With embeddings the semantic term is only traced for this window
+        self.fixed_window = window_size if embeddings is not None else None
+        detector = EntropyBoundaryDetector(window_size=window_size, embeddings=embeddings)
+        walker = BatchedTraverser(kg, detector, get_max_degree(kg))
+        self.names = walker.graph.nodes
+        arrays = walker.trace(self.start_nodes, max_depth)
+        self.path = arrays['path']
+        self.length = arrays['length']
+        self.steps = arrays['steps']
+        self.local = arrays['local']
+        self.struct = arrays['struct']
+        self.pair = arrays['pair']
+        self._semantic = {window_size: arrays['semantic']}
+        self._lock = threading.Lock()
+        # Path length when the entropy at each step is computed
+        self.step_length = np.arange(1, max_depth + 1)
+        self.valid = np.arange(max_depth) < self.steps[:, None]
+        self._tuner = None
+
+    def semantic(self, window):
+        with self._lock:
+            if window in self._semantic:
+                return self._semantic[window]
+        if self.fixed_window is not None:
+            raise ValueError(f"Embedding divergence was traced for window {self.fixed_window} only")
+        # Mean of the pair divergences in path[-window:], step by step; every
+        # walker has the same path length at a given step
+        semantic = np.zeros_like(self.local)
+        for depth in range(1, self.max_depth):
+            length = depth + 1
+            pairs = (min(length, window) if window > 0 else length) - 1
+            if pairs > 0:
+                semantic[:, depth] = self.pair[:, length - pairs:length].mean(axis=1)
+        with self._lock:
+            return self._semantic.setdefault(window, semantic)
+
+    def combine(self, alpha=DEFAULT_WEIGHTS[0], beta=DEFAULT_WEIGHTS[1], gamma=DEFAULT_WEIGHTS[2], window=3):
+        detector = EntropyBoundaryDetector(alpha=alpha, beta=beta, gamma=gamma)
+        return detector.combine(self.local, self.struct, self.semantic(window))
+
+    def cut(self, alpha=DEFAULT_WEIGHTS[0], beta=DEFAULT_WEIGHTS[1], gamma=DEFAULT_WEIGHTS[2],
+            threshold=0.8, window=3):
+        # Entropy per step, number of steps each walk keeps, and whether it
+        # stopped on a boundary (rather than running out of nodes or depth)
+        entropies = self.combine(alpha, beta, gamma, window)
+        boundary = (entropies > threshold * boundary_factor(self.step_length)) & self.valid
+        hit = boundary.any(axis=1)
+        steps = np.where(hit, boundary.argmax(axis=1) + 1, self.steps)
+        return entropies, steps, hit
+
+    def tuner(self):
+        # Default (sentence target) tuner, so its evaluation cache lives with the trace
+        with self._lock:
+            if self._tuner is None:
+                self._tuner = WeightTuner(self)
+            return self._tuner
+
+    def walks(self, alpha=DEFAULT_WEIGHTS[0], beta=DEFAULT_WEIGHTS[1], gamma=DEFAULT_WEIGHTS[2],
+              threshold=0.8, window=3):
+        # Same (start_node, path, entropies) as traverse_many with these settings
+        entropies, steps, hit = self.cut(alpha, beta, gamma, threshold, window)
+        lengths = np.where(hit, steps, self.length)
+        return [(node, [self.names[j] for j in self.path[i, :lengths[i]].tolist()],
+                 entropies[i, :steps[i]].tolist())
+                for i, node in enumerate(self.start_nodes)]
+
+
+def sentence_targets(trace):
+    # Target step count per walker: stop on the first node sharing no sentence
+    # with the start node; walks that never leave it should run to the end
+    sentences = {}
+
+    def sentence_ids(j):
+        if j not in sentences:
+            sentences[j] = node_sentence_ids(trace.kg, trace.names[j])
+        return sentences[j]
+
+    targets = trace.steps.copy()
+    for i in range(len(trace.start_nodes)):
+        start = sentence_ids(trace.path[i, 0])
+        for k in range(1, trace.length[i]):
+            if not sentence_ids(trace.path[i, k]) & start:
+                targets[i] = k + 1
+                break
+    return targets
+
+
+class WeightTuner:
+    # Scores configurations against per-walker target step counts. Every
+    # evaluation is a recombination of the trace, run on a thread pool (the
+    # array work releases the GIL), and kept so repeated searches are free.
+    def __init__(self, trace, targets=None, workers=4):
+        self.trace = trace
+        if targets is None:
+            targets = sentence_targets(trace)
+        elif isinstance(targets, dict):
+            targets = [targets.get(node, steps) for node, steps in zip(trace.start_nodes, trace.steps)]
+        self.targets = np.asarray(targets)
+        self.workers = workers
+        self.cache = {}
+        self._lock = threading.Lock()
+
+    def _key(self, config):
+        return tuple(int(config[k]) if k == 'window' else round(float(config[k]), 6) for k in CONFIG_KEYS)
+
+    def evaluate(self, alpha, beta, gamma, threshold, window):
+        config = {'alpha': alpha, 'beta': beta, 'gamma': gamma, 'threshold': threshold, 'window': window}
+        key = self._key(config)
+        with self._lock:
+            if key in self.cache:
+                return self.cache[key]
+        _, steps, hit = self.trace.cut(*key)
+        error = np.abs(steps - self.targets)
+        row = dict(zip(CONFIG_KEYS, key), score=-float(error.mean()), exact=float((error == 0).mean()),
+                   boundaries=float(hit.mean()), avg_steps=float(steps.mean()))
+        with self._lock:
+            return self.cache.setdefault(key, row)
+
+    def search(self, configs):
+        configs = list({self._key(c): c for c in configs}.values())
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            rows = list(pool.map(lambda c: self.evaluate(**{k: c[k] for k in CONFIG_KEYS}), configs))
+        return sorted(rows, key=lambda row: -row['score'])
+
+    def _windows(self, windows):
+        fixed = self.trace.fixed_window
+        return (fixed,) if fixed is not None else windows
+
+    def grid(self, alphas, betas, gammas, thresholds, windows=(3,)):
+        return self.search(dict(zip(CONFIG_KEYS, values)) for values in
+                           itertools.product(alphas, betas, gammas, thresholds, self._windows(windows)))
+
+    def random(self, n, seed=None, alpha=(0.0, 1.0), beta=(0.0, 1.0), gamma=(0.0, 1.0),
+               threshold=(0.2, 3.0), windows=(2, 3, 4, 5)):
+        rng = random.Random(seed)
+        windows = self._windows(windows)
+        return self.search({'alpha': rng.uniform(*alpha), 'beta': rng.uniform(*beta),
+                            'gamma': rng.uniform(*gamma), 'threshold': rng.uniform(*threshold),
+                            'window': rng.choice(windows)} for _ in range(n))
+
+    def best(self):
+        with self._lock:
+            return max(self.cache.values(), key=lambda row: row['score'], default=None)
+
+
+def main():
+    import pandas as pd
+    from benchmarks import load_chapters
+    from kg_builder import KnowledgeGraphBuilder
+    from nlp_utils import TextProcessor
+
+    parser = argparse.ArgumentParser(description="Search entropy weights, threshold and window size")
+    parser.add_argument('--chapters', type=int, default=3)
+    parser.add_argument('--max-depth', type=int, default=10)
+    parser.add_argument('--random', type=int, default=500, help="Random configurations to try")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    sentences = TextProcessor().extract_sentences(' '.join(load_chapters(args.chapters)))
+    kg = KnowledgeGraphBuilder().build_from_sentences(sentences)
+    tuner = WeightTuner(WalkTrace(kg, list(kg.nodes()), args.max_depth), workers=args.workers)
+    baseline = tuner.evaluate(*DEFAULT_WEIGHTS, threshold=0.8, window=3)
+    rows = tuner.random(args.random, seed=args.seed)
+    print(pd.DataFrame([baseline] + rows[:args.top]).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
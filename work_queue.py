@@ -0,0 +1,337 @@
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+DB_PATH = "work_queue.sqlite"
+CSV_PATH = "src/war_and_peace_full_chapters.csv"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL UNIQUE,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    error TEXT,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_claim ON tasks (status, lease_expires);
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    result TEXT NOT NULL,
+    worker TEXT NOT NULL,
+    written REAL NOT NULL
+);
+"""
+
+
+class WorkQueue:
+    # Chapter-level task queue in one SQLite file, so workers on any host that
+    # can see the file drain it without a broker. Tasks are claimed with a
+    # lease; a worker that stops heartbeating loses it and the task is retried.
+    def __init__(self, path=DB_PATH, lease_seconds=60, max_attempts=3, wal=False):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.wal = wal
+        self._local = threading.local()
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            # The rollback journal works for workers on several hosts sharing
+            # the file. WAL lets readers run alongside the writer, but needs
+            # shared memory, so only every worker on one host may opt in;
+            # SQLite gives no error when that doesn't hold.
+            db.execute(f"PRAGMA journal_mode={'WAL' if self.wal else 'DELETE'}")
+            db.execute("PRAGMA busy_timeout=30000")
+            self._local.db = db
+        return db
+
+    @contextmanager
+    def _transaction(self):
+        db = self._connection()
+        # IMMEDIATE takes the write lock up front, so two workers can't both
+        # read the same task as claimable
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def enqueue(self, kind, key, payload):
+        # Re-enqueueing an existing key is a no-op
+        with self._transaction() as db:
+            cursor = db.execute(
+                "INSERT OR IGNORE INTO tasks (kind, key, payload, updated) VALUES (?, ?, ?, ?)",
+                (kind, key, json.dumps(payload), time.time()))
+            return cursor.rowcount == 1
+
+    def claim(self, worker):
+        now = time.time()
+        with self._transaction() as db:
+            # Expired leases that are out of attempts fail instead of being retried
+            db.execute(
+                "UPDATE tasks SET status = 'failed', lease_owner = NULL, updated = ?,"
+                " error = COALESCE(error, 'lease expired') WHERE status = 'leased'"
+                " AND lease_expires < ? AND attempts >= ?",
+                (now, now, self.max_attempts))
+            row = db.execute(
+                "SELECT * FROM tasks WHERE status = 'pending'"
+                " OR (status = 'leased' AND lease_expires < ?) ORDER BY id LIMIT 1",
+                (now,)).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE tasks SET status = 'leased', lease_owner = ?, lease_expires = ?,"
+                " attempts = attempts + 1, updated = ? WHERE id = ?",
+                (worker, now + self.lease_seconds, now, row['id']))
+        return Task(self, row['id'], row['kind'], row['key'], json.loads(row['payload']),
+                    row['attempts'] + 1, worker)
+
+    def heartbeat(self, task_id, worker):
+        # False once the lease has been taken over by another worker
+        now = time.time()
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE tasks SET lease_expires = ?, updated = ? WHERE id = ?"
+                " AND status = 'leased' AND lease_owner = ?",
+                (now + self.lease_seconds, now, task_id, worker))
+            return cursor.rowcount == 1
+
+    def complete(self, task_id, key, kind, worker, result):
+        # The first result written for a key wins; a retried or duplicated run
+        # of the same task leaves it untouched. Result and status commit together.
+        # False (and nothing written) once the lease has been taken over by
+        # another worker, which now owns the task.
+        now = time.time()
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE tasks SET status = 'done', lease_owner = NULL, lease_expires = NULL,"
+                " error = NULL, updated = ? WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (now, task_id, worker))
+            if cursor.rowcount != 1:
+                return False
+            db.execute(
+                "INSERT OR IGNORE INTO results (key, kind, result, worker, written) VALUES (?, ?, ?, ?, ?)",
+                (key, kind, json.dumps(result, default=float), worker, now))
+            return True
+
+    def fail(self, task_id, worker, error):
+        now = time.time()
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,"
+                " lease_owner = NULL, lease_expires = NULL, error = ?, updated = ?"
+                " WHERE id = ? AND lease_owner = ?",
+                (self.max_attempts, error, now, task_id, worker))
+
+    def retry_failed(self):
+        with self._transaction() as db:
+            return db.execute(
+                "UPDATE tasks SET status = 'pending', attempts = 0, updated = ? WHERE status = 'failed'",
+                (time.time(),)).rowcount
+
+    def stats(self):
+        db = self._connection()
+        counts = dict.fromkeys(('pending', 'leased', 'done', 'failed'), 0)
+        for row in db.execute("SELECT status, COUNT(*) AS n FROM tasks GROUP BY status"):
+            counts[row['status']] = row['n']
+        counts['results'] = db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        return counts
+
+    def result(self, key):
+        row = self._connection().execute("SELECT result FROM results WHERE key = ?", (key,)).fetchone()
+        return None if row is None else json.loads(row['result'])
+
+    def results(self, kind=None):
+        query, args = "SELECT key, result FROM results", ()
+        if kind:
+            query, args = query + " WHERE kind = ?", (kind,)
+        return {row['key']: json.loads(row['result'])
+                for row in self._connection().execute(query + " ORDER BY key", args)}
+
+
+class Task:
+    def __init__(self, queue, id, kind, key, payload, attempt, worker):
+        self.queue = queue
+        self.id = id
+        self.kind = kind
+        self.key = key
+        self.payload = payload
+        self.attempt = attempt
+        self.worker = worker
+
+    def heartbeat(self):
+        return self.queue.heartbeat(self.id, self.worker)
+
+    def complete(self, result):
+        return self.queue.complete(self.id, self.key, self.kind, self.worker, result)
+
+    def fail(self, error):
+        self.queue.fail(self.id, self.worker, error)
+
+
+def process_chapter(payload):
+    # Build one chapter's graph and run boundary detection from its top-ranked nodes
+    import pandas as pd
+    from kg_builder import KnowledgeGraphBuilder
+    from nlp_utils import TextProcessor
+    from node_ranking import get_start_node_selector
+    from entropy_model import EntropyBoundaryDetector
+    from traversal import GraphTraverser
+
+    text = pd.read_csv(payload.get('csv_path', CSV_PATH))['text'].iloc[payload['row']]
+    sentences, spans = TextProcessor(payload.get('splitter', 'punkt')).extract_sentence_spans(text)
+    kg = KnowledgeGraphBuilder(payload.get('backend', 'nltk')).build_from_sentences(sentences, text=text, spans=spans)
+    start_nodes = get_start_node_selector(kg).top_k(payload.get('start_nodes', 20),
+                                                    payload.get('ranking', 'degree'))
+    detector = EntropyBoundaryDetector(threshold=payload.get('threshold', 0.8))
+    traversals = GraphTraverser(kg, detector).traverse_many(
+        start_nodes, payload.get('max_depth', 10), workers=1)
+    # [step, sentence_id, char_start, char_end] in the chapter for every edge walked
+    spans = [[] for _ in traversals]
+    for annotation in kg.graph['offsets'].project(traversals):
+        spans[annotation['result']].append([annotation['step'], annotation['sentence_id'],
+                                            annotation['char_start'], annotation['char_end']])
+    return {
+        'row': payload['row'],
+        'sentences': len(sentences),
+        'nodes': kg.number_of_nodes(),
+        'edges': kg.number_of_edges(),
+        'traversals': [{
+            'start_node': node,
+            'boundary_nodes': path,
+            'entropies': entropies,
+            'is_boundary': bool(entropies) and bool(detector.is_boundary(entropies[-1], len(path))),
+            'spans': walk_spans,
+        } for (node, path, entropies), walk_spans in zip(traversals, spans)],
+    }
+
+
+HANDLERS = {
+    'chapter': process_chapter,
+}
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def run_worker(queue, worker=None, handlers=HANDLERS, poll_interval=1.0, exit_when_empty=True,
+               log=print):
+    worker = worker or default_worker_id()
+    processed = 0
+    while True:
+        task = queue.claim(worker)
+        if task is None:
+            if exit_when_empty and not queue.stats()['leased']:
+                return processed
+            time.sleep(poll_interval)
+            continue
+
+        # Heartbeat from a side thread while the handler runs; a third of the
+        # lease leaves room for a couple of missed beats
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(queue.lease_seconds / 3):
+                if not task.heartbeat():
+                    log(f"[{worker}] lost lease on {task.key}")
+                    return
+
+        heart = threading.Thread(target=beat, daemon=True)
+        heart.start()
+        started = time.perf_counter()
+        try:
+            result = handlers[task.kind](task.payload)
+        except Exception as e:
+            stop.set()
+            task.fail(f"{type(e).__name__}: {e}")
+            log(f"[{worker}] {task.key} failed (attempt {task.attempt}): {e}")
+        else:
+            stop.set()
+            if task.complete(result):
+                processed += 1
+                log(f"[{worker}] {task.key} done in {time.perf_counter() - started:.2f}s")
+            else:
+                log(f"[{worker}] lost lease on {task.key}; result discarded")
+        heart.join()
+
+
+def parse_rows(spec, total):
+    rows = []
+    for part in (spec or f"0-{total - 1}").split(','):
+        start, _, end = part.partition('-')
+        rows.extend(range(int(start), int(end or start) + 1))
+    return [row for row in rows if 0 <= row < total]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite work queue for chapter-level KG building and detection")
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--lease', type=float, default=60)
+    parser.add_argument('--max-attempts', type=int, default=3)
+    parser.add_argument('--wal', action='store_true',
+                        help="Use SQLite's WAL journal (only when every worker runs on this host)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    enqueue = commands.add_parser('enqueue', help="Queue chapters from the CSV")
+    enqueue.add_argument('--csv', default=CSV_PATH)
+    enqueue.add_argument('--rows', help="e.g. 0-9,15 (default: every chapter)")
+    enqueue.add_argument('--threshold', type=float, default=0.8)
+    enqueue.add_argument('--max-depth', type=int, default=10)
+    enqueue.add_argument('--start-nodes', type=int, default=20)
+    enqueue.add_argument('--backend', default='nltk')
+
+    worker = commands.add_parser('worker', help="Drain the queue")
+    worker.add_argument('--id')
+    worker.add_argument('--wait', action='store_true', help="Keep polling once the queue is empty")
+
+    commands.add_parser('status', help="Show task counts")
+    commands.add_parser('retry', help="Requeue failed tasks")
+    export = commands.add_parser('export', help="Print results as JSON lines")
+    export.add_argument('--kind')
+    args = parser.parse_args()
+
+    queue = WorkQueue(args.db, lease_seconds=args.lease, max_attempts=args.max_attempts, wal=args.wal)
+    if args.command == 'enqueue':
+        import pandas as pd
+        total = len(pd.read_csv(args.csv))
+        added = 0
+        for row in parse_rows(args.rows, total):
+            # The key covers the settings, so changed settings are new tasks
+            payload = {'csv_path': args.csv, 'row': row, 'threshold': args.threshold,
+                       'max_depth': args.max_depth, 'start_nodes': args.start_nodes,
+                       'backend': args.backend}
+            key = f"chapter:{row}:{args.backend}:{args.threshold}:{args.max_depth}:{args.start_nodes}"
+            added += queue.enqueue('chapter', key, payload)
+        print(f"Queued {added} new tasks")
+    elif args.command == 'worker':
+        processed = run_worker(queue, args.id, exit_when_empty=not args.wait)
+        print(f"Processed {processed} tasks")
+    elif args.command == 'retry':
+        print(f"Requeued {queue.retry_failed()} failed tasks")
+    elif args.command == 'export':
+        for key, result in queue.results(args.kind).items():
+            print(json.dumps({'key': key, **result}, default=float))
+    print(json.dumps(queue.stats()))
+
+
+if __name__ == "__main__":
+    main()